@@ -6,9 +6,11 @@
 import json
 from pathlib import Path
 
-from sort import sort_actions
-from .utils import DEFAULT_PRIORITY, format_priority, load_json, should_surface_item, format_priority
+from .sort import sort_actions
+from .utils import DEFAULT_PRIORITY, format_priority, load_json, should_surface_item, surfacing_map, format_priority
 from .dashboards.utils import format_minutes
+from .relevance import full_weights, parse_weight
+from .instrument import traced
 
 def jsify_ts(ts):
     """
@@ -19,12 +21,14 @@ def jsify_ts(ts):
         return None
     return [ts["date"], ts["time"]]
 
-def format_actions_for_app(next_actions):
+@traced()
+def format_actions_for_app(next_actions, weights=None):
     """
-    Formats the given next actions for the actions app.
+    Formats the given next actions for the actions app. If relevance weights are given, the app
+    will order the actions it filters by relevance (see `relevance.py`), rather than by date.
     """
 
-    next_actions_map = {action["id"]: action for action in next_actions}
+    next_actions_map = surfacing_map(next_actions)
 
     # Filter and sort first to avoid having to duplicate sort logic with weird JS indices
     filtered = []
@@ -95,7 +99,7 @@ def format_actions_for_app(next_actions):
 
         html += "</pre>"
         # Minimal format to reduce data needs
-        formatted_actions.append([html, jsify_ts(action.get("scheduled")), jsify_ts(action.get("deadline")), action_contexts, action_people, action["focus"], action["time"], action["keyword"]])
+        formatted_actions.append([html, jsify_ts(action.get("scheduled")), jsify_ts(action.get("deadline")), action_contexts, action_people, action["focus"], action["time"], action["keyword"], action.get("priority") or DEFAULT_PRIORITY])
 
     # formatted_actions.sort(
     #     key=lambda item:
@@ -109,8 +113,9 @@ def format_actions_for_app(next_actions):
     #             item[0] # This is the HTML, not the title, but the first thing is the title
     #         )
     # )
-    return [list(contexts.keys()), list(people.keys()), formatted_actions]
+    return [list(contexts.keys()), list(people.keys()), formatted_actions, weights]
 
+@traced()
 def produce_actions_app(data):
     """
     Produces a self-contained HTML string for the actions app, implanting the given data.
@@ -130,9 +135,18 @@ def produce_actions_app(data):
 
     return html
 
-def main_cli(_):
-    action_items = load_json()
-    data = format_actions_for_app(action_items)
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Produce the actions app from next actions.", prog="actions_app")
+    parser.add_argument("--ndjson", action="store_true", help="Read one JSON object per line.")
+    parser.add_argument("--rank", action="store_true", help="Order filtered actions by relevance rather than by date (see `relevance.py`).")
+    parser.add_argument("-w", "--weight", action="append", dest="weights", type=parse_weight, help="Set a relevance weight as `name=value` (implies `--rank`).")
+
+    args = parser.parse_args(args)
+
+    action_items = list(load_json(args.ndjson))
+    weights = full_weights(args.weights or []) if args.rank or args.weights else None
+    data = format_actions_for_app(action_items, weights)
     html = produce_actions_app(data)
 
     print(html)
@@ -1,4 +1,5 @@
-const [CONTEXTS, PEOPLE, actions] = JSON.parse(
+// `WEIGHTS` are the relevance weights, or `null` to keep the actions in date order
+const [CONTEXTS, PEOPLE, actions, WEIGHTS] = JSON.parse(
     document.getElementById("actionsData").textContent.trim(),
 );
 
@@ -134,6 +135,63 @@ const parseTimeStr = (timeStr) => {
     return total_minutes;
 };
 
+// Same as `relevance.py:relevance_scorer`, which this must match exactly.
+const relevance = (
+    date,
+    contexts,
+    people,
+    maxTime,
+    maxFocus,
+    deadline,
+    ctxs,
+    actionPeople,
+    focus,
+    time,
+    priority,
+) => {
+    const priorityScore = 1 / Math.max(priority, 1);
+
+    let deadlineScore = 0;
+    if (deadline) {
+        const [year, month, day] = deadline[0].split("-").map(Number);
+        const days = Math.round(
+            (Date.UTC(year, month - 1, day) -
+                Date.UTC(date.getFullYear(), date.getMonth(), date.getDate())) /
+                (1000 * 60 * 60 * 24),
+        );
+        deadlineScore = days <= 0 ? 1 : 1 / (1 + days);
+    }
+
+    let slackScore = 0;
+    if (maxTime && time !== null) {
+        slackScore = time / maxTime;
+    }
+
+    let focusScore = 0;
+    if (maxFocus !== null && focus !== null) {
+        focusScore = 1 - (maxFocus - focus) / 3;
+    }
+
+    let matchScore = 0;
+    const availableCount = (contexts ? contexts.size : 0) +
+        (people ? people.size : 0);
+    if (availableCount) {
+        // Names are counted once, however many times an action lists them
+        const matched =
+            (contexts
+                ? new Set(ctxs.filter((idx) => contexts.has(idx))).size
+                : 0) +
+            (people
+                ? new Set(actionPeople.filter((idx) => people.has(idx))).size
+                : 0);
+        matchScore = matched / availableCount;
+    }
+
+    return WEIGHTS.priority * priorityScore + WEIGHTS.deadline * deadlineScore +
+        WEIGHTS.slack * slackScore + WEIGHTS.focus * focusScore +
+        WEIGHTS.match * matchScore;
+};
+
 // Same as `filter.py:filter_next_actions`.
 const filter = (date, contextsArr, peopleArr, maxTimeStr, maxFocus, ty) => {
     date.setHours(0, 0, 0, 0);
@@ -160,6 +218,7 @@ const filter = (date, contextsArr, peopleArr, maxTimeStr, maxFocus, ty) => {
             focus,
             time,
             keyword,
+            priority,
         ] of actions
     ) {
         if (ty == "tasks" && keyword != "TODO") {
@@ -236,10 +295,29 @@ const filter = (date, contextsArr, peopleArr, maxTimeStr, maxFocus, ty) => {
             );
             fullHtml = fullHtml.replace("{{ deadline }}", deadlineReadable);
         }
-        filtered.push(fullHtml);
+        const score = WEIGHTS
+            ? relevance(
+                date,
+                contexts,
+                people,
+                maxTime,
+                maxFocus,
+                deadline,
+                ctxs,
+                actionPeople,
+                focus,
+                time,
+                priority,
+            )
+            : 0;
+        filtered.push([score, fullHtml]);
     }
 
-    return filtered;
+    // The actions are already in date order, which breaks ties (`sort` is stable)
+    if (WEIGHTS) {
+        filtered.sort((a, b) => b[0] - a[0]);
+    }
+    return filtered.map(([_score, html]) => html);
 };
 
 // Displays the given list of HTML for actions on the page.
@@ -0,0 +1,78 @@
+# Benchmarks filtering next actions from a synthetic vault with the plain loop in `filter.py` and
+# with the NumPy columns in `columnar.py`, checking the two give exactly the same results for a
+# spread of queries. The vault is expanded as far as the furthest query first (repeats are computed
+# locally), so the next actions are what a real run would filter.
+
+import time
+from datetime import datetime, timedelta
+from collections import Counter
+from .vault import generate_vault, CONTEXTS
+from ..columnar import NextActionColumns
+from ..filter import filter_next_actions
+from ..get import expand_action_items, split_timestamps
+from ..next_actions import filter_to_next_actions
+from ..utils import datetime_to_epoch
+
+# How far past the given date the furthest query looks
+LOOKAHEAD = timedelta(days=14)
+
+def filter_queries(today, people):
+    """
+    Gets the filters to benchmark for the given date and people (some of those in the vault), as
+    arguments to `filter_next_actions` after the next actions themselves.
+    """
+
+    until = datetime.combine(today, datetime.max.time())
+    later = until + LOOKAHEAD
+    return [
+        (until, [], [], None, None, "all"),
+        (later, [], [], None, None, "tasks"),
+        (until, ["home"], [], None, None, "all"),
+        (until, CONTEXTS[:3], [], 30, 1, "all"),
+        (later, [], people, None, None, "all"),
+        (until, CONTEXTS, people, 60, 2, "problems"),
+    ]
+
+def best_time(fn, repeats):
+    """
+    Runs the given function the given number of times, returning the fastest time (in seconds) and
+    the last result.
+    """
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark filtering next actions with and without NumPy columns.", prog="filtering")
+    parser.add_argument("-n", "--nodes", type=int, default=250000, help="The number of action items to generate.")
+    parser.add_argument("-d", "--date", type=str, help="The date to centre the vault on and filter from (default: today).")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="The seed to generate from.")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="How many times to run each filter (the best time is reported).")
+
+    args = parser.parse_args(args)
+    today = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else datetime.now().date()
+
+    items, _, _ = generate_vault(args.nodes, today, args.seed)
+    until = datetime.combine(today, datetime.max.time()) + LOOKAHEAD
+    next_actions = filter_to_next_actions(list(expand_action_items(split_timestamps(items), until, None, 1)))
+    build_time, columns = best_time(lambda: NextActionColumns(next_actions), 1)
+    print(f"{len(next_actions)} next actions from {args.nodes} action items (expanded until {until:%Y-%m-%d}), columns built in {build_time * 1000:.1f}ms")
+
+    print(f"{'query':<6} {'results':>8} {'loop':>10} {'columns':>10} {'mask only':>10}")
+    # The people most often needed, so people filters have something to find
+    people_counts = Counter(person for item in next_actions for person, _ in item["people"] or [])
+    people = [person for person, _ in people_counts.most_common(20)]
+
+    for i, query in enumerate(filter_queries(today, people)):
+        loop_time, expected = best_time(lambda: filter_next_actions(next_actions, *query), args.repeats)
+        columns_time, actual = best_time(lambda: filter_next_actions(columns, *query), args.repeats)
+        mask_time, _ = best_time(lambda: columns.mask(datetime_to_epoch(query[0]), *query[1:]), args.repeats)
+        if [item["id"] for item in actual] != [item["id"] for item in expected]:
+            raise Exception(f"Columnar filtering gave different results for query {i}: {query}")
+
+        print(f"{i:<6} {len(expected):>8} {loop_time * 1000:>8.2f}ms {columns_time * 1000:>8.2f}ms {mask_time * 1000:>8.3f}ms")
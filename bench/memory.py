@@ -0,0 +1,68 @@
+# Measures the memory `get_normalised_action_items` needs for a synthetic vault of a given size,
+# and checks it against a budget. This runs everything in one process with `tracemalloc`, so it
+# counts exactly what fetching and normalising allocate (not the interpreter or imports), which
+# makes it stable enough to fail on when a change blows the budget.
+
+import os
+import sys
+import tracemalloc
+from datetime import date, datetime, timedelta
+from .stub import start_stub
+from .. import cache
+from ..get import get_normalised_action_items, DEFAULT_WORKERS
+
+# How far ahead of the vault's date to expand repeats (the same as `actions`)
+EXPAND_DAYS = 14
+
+def measure_normalise(size, today=None, seed=0, opts=["body"], workers=DEFAULT_WORKERS):
+    """
+    Measures fetching and normalising a synthetic vault of the given size from a local stub,
+    returning a dictionary of the number of `items` produced, and the `peak` and `retained` memory
+    allocated while doing so (in bytes). The snapshot cache is bypassed, so every run does the same
+    work.
+    """
+
+    today = today or date.today()
+    server, stub = start_stub(size, today, seed)
+    # Encode the stub's response up front, so that isn't counted
+    stub.action_items({"body": "body" in opts})
+
+    previous_api = os.environ.get("STARLING_API")
+    previous_cache = cache.CACHE_ENABLED
+    os.environ["STARLING_API"] = f"http://127.0.0.1:{server.server_port}/"
+    cache.CACHE_ENABLED = False
+    try:
+        until = datetime.combine(today + timedelta(days=EXPAND_DAYS), datetime.max.time())
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        items = get_normalised_action_items(until, opts, workers=workers)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        server.shutdown()
+        cache.CACHE_ENABLED = previous_cache
+        if previous_api is None:
+            del os.environ["STARLING_API"]
+        else:
+            os.environ["STARLING_API"] = previous_api
+
+    return {"items": len(items), "peak": peak - base, "retained": current - base}
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Measure the memory needed to normalise a synthetic vault, optionally failing if it's over budget.", prog="memory")
+    parser.add_argument("-n", "--nodes", type=int, default=10000, help="The number of action items to generate.")
+    parser.add_argument("-d", "--date", type=str, help="The date to centre the vault on and expand from (default: today).")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="The seed to generate from.")
+    parser.add_argument("-b", "--budget", type=float, help="The most peak memory allowed, in MiB (exits with an error if it's exceeded).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
+
+    args = parser.parse_args(args)
+    today = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+
+    result = measure_normalise(args.nodes, today, args.seed, workers=args.workers)
+    peak_mib = result["peak"] / 1024 / 1024
+    print(f"Normalised {args.nodes} action items into {result['items']} occurrences: peak {peak_mib:.1f} MiB, retained {result['retained'] / 1024 / 1024:.1f} MiB")
+
+    if args.budget is not None and peak_mib > args.budget:
+        sys.exit(f"Peak memory of {peak_mib:.1f} MiB is over the budget of {args.budget:.1f} MiB")
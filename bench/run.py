@@ -0,0 +1,135 @@
+# Benchmarks every composite against a synthetic vault served by the local Starling stub. Each command
+# is run as its own process, exactly as a user would run it, once with an empty cache and then again
+# with the snapshot cache warm, and we report wall time, peak memory, and how many HTTP requests it
+# made to Starling.
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from .stub import start_stub
+
+# The entrypoint the commands are run through
+MAIN_PATH = Path(__file__).resolve().parent.parent / "main.py"
+
+def composite_commands(today):
+    """
+    Gets the commands to benchmark for the given date, which exercise every composite.
+    """
+
+    start = today.isoformat()
+    end = (today + timedelta(days=7)).isoformat()
+    return [
+        ["day", "-d", start],
+        ["week", "-d", start],
+        ["past", "-d", start],
+        ["cal", f"{start}:{end}"],
+        ["actions", "-d", start],
+        ["actions", "-d", start, "-c", "home"],
+        ["upcoming", "-d", start, "-u", end],
+        ["urgent", "-d", start],
+        ["waiting", "-d", start],
+        ["tickles", "-d", start],
+        ["dates", "-d", start, "-u", end],
+        ["prepapp", "-u", start],
+        ["digest", start],
+    ]
+
+def run_command(argv, env):
+    """
+    Runs the given `main.py` arguments in a fresh process with the given environment, returning
+    `(exit_code, wall_secs, peak_rss_bytes, stderr)`.
+    """
+
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, str(MAIN_PATH), *argv], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = proc.stderr.read()
+    proc.stderr.close()
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    # `ru_maxrss` is in kilobytes on Linux
+    return proc.returncode, wall, usage.ru_maxrss * 1024, stderr.decode(errors="replace")
+
+def benchmark(size, today, seed, repeats, commands=None):
+    """
+    Benchmarks the given commands (by default every composite) against a vault of the given size,
+    returning a list of results for each command as dictionaries.
+    """
+
+    server, stub = start_stub(size, today, seed)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Nothing here should touch the real environment's caches or journals
+            env = {
+                **os.environ,
+                "STARLING_API": f"http://127.0.0.1:{server.server_port}/",
+                "ACE_MAIN_DIR": tmp,
+                "ACE_JOURNALS_DIR": os.path.join(tmp, "journals"),
+                "COLUMNS": "120",
+            }
+
+            for i, argv in enumerate(commands or composite_commands(today)):
+                # Each command gets its own cache, so the first run is always cold
+                env["XDG_CACHE_HOME"] = os.path.join(tmp, f"cache-{i}")
+                result = {"command": " ".join(argv), "cold": None, "warm": None, "rss": 0, "requests": {}, "error": None}
+
+                for run in range(repeats):
+                    stub.reset_counts()
+                    code, wall, rss, stderr = run_command(argv, env)
+                    if code != 0:
+                        result["error"] = stderr.strip().splitlines()[-1] if stderr.strip() else f"exited with {code}"
+                        break
+
+                    result["rss"] = max(result["rss"], rss)
+                    if run == 0:
+                        result["cold"] = wall
+                        result["requests"] = dict(stub.reset_counts())
+                    else:
+                        result["warm"] = wall if result["warm"] is None else min(result["warm"], wall)
+
+                results.append(result)
+    finally:
+        server.shutdown()
+
+    return results
+
+def print_results(results, size):
+    """
+    Prints a table of the given benchmark results.
+    """
+
+    print(f"Vault of {size} action items (cold: empty cache; warm: best of the rest; requests: cold run)\n")
+    print(f"{'command':<40} {'cold':>8} {'warm':>8} {'peak rss':>10}  requests")
+    for result in results:
+        if result["error"]:
+            print(f"{result['command']:<40} failed: {result['error']}")
+            continue
+
+        warm = f"{result['warm']:.2f}s" if result["warm"] is not None else "-"
+        requests = ", ".join(f"{endpoint} {count}" for endpoint, count in sorted(result["requests"].items())) or "none"
+        print(f"{result['command']:<40} {result['cold']:>7.2f}s {warm:>8} {result['rss'] / 1024 / 1024:>7.0f}MiB  {requests}")
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark every composite against a synthetic vault on a local Starling stub.", prog="run")
+    parser.add_argument("-n", "--nodes", type=int, default=10000, help="The number of action items to generate.")
+    parser.add_argument("-d", "--date", type=str, help="The date to centre the vault on and run the commands for (default: today).")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="The seed to generate from.")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="How many times to run each command (the first is cold).")
+    parser.add_argument("commands", nargs="*", help="Only benchmark the composites with these names.")
+
+    args = parser.parse_args(args)
+    today = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else date.today()
+
+    commands = composite_commands(today)
+    if args.commands:
+        commands = [argv for argv in commands if argv[0] in args.commands]
+
+    results = benchmark(args.nodes, today, args.seed, args.repeats, commands)
+    print_results(results, args.nodes)
@@ -0,0 +1,154 @@
+# A local stand-in for the Starling server, serving a synthetic vault from `vault.py`. This implements
+# just the endpoints the scripts use (with the same conditional requests as the real action items
+# index), and counts every request it gets, so benchmarks can report how much HTTP each command does.
+
+import json
+import sys
+import threading
+import urllib.parse
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .vault import generate_vault
+from ..repeater import next_timestamp
+
+# The vault only changes when the stub is restarted, so one tag is enough
+ETAG = '"bench-vault"'
+
+class StarlingStub:
+    """
+    The data behind the stub server: the synthetic vault, pre-encoded for each set of options the
+    index is requested with, and counters of the requests made for each endpoint.
+    """
+
+    def __init__(self, items, nodes, roots):
+        self.items = items
+        self.nodes = {**nodes, **{item["id"]: item for item in items}}
+        self.roots = roots
+        self.encoded = {}
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def count(self, endpoint):
+        with self.lock:
+            self.counts[endpoint] += 1
+
+    def reset_counts(self):
+        """
+        Resets the request counters, returning what they were.
+        """
+
+        with self.lock:
+            counts = self.counts
+            self.counts = Counter()
+        return counts
+
+    def action_items(self, opts):
+        """
+        Gets the encoded action items for the given request options, leaving out bodies unless they
+        were asked for, as Starling does.
+        """
+
+        key = bool(opts.get("body"))
+        if key not in self.encoded:
+            if key:
+                items = self.items
+            else:
+                items = [{**item, "body": None} for item in self.items]
+            self.encoded[key] = json.dumps(items).encode()
+        return self.encoded[key]
+
+def make_handler(stub):
+    """
+    Creates a request handler class serving from the given stub.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Send each response in one write, or every request pays for Nagle's algorithm meeting
+        # delayed ACKs (40ms each, which would dwarf everything we want to measure)
+        wbufsize = -1
+
+        def send_body(self, status, body, headers={}):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            length = int(self.headers.get("Content-Length", 0))
+            opts = json.loads(self.rfile.read(length)) if length else {}
+            path = urllib.parse.unquote(self.path.lstrip("/"))
+
+            if path == "index/action_items/nodes":
+                stub.count("index")
+                if self.headers.get("If-None-Match") == ETAG:
+                    self.send_body(304, b"", {"ETag": ETAG})
+                else:
+                    self.send_body(200, stub.action_items(opts), {"ETag": ETAG})
+            elif path == "utils/next-timestamp":
+                stub.count("next-timestamp")
+                opts.pop("active", None)
+                next_ts = next_timestamp(opts)
+                if next_ts is None:
+                    self.send_body(400, b"unsupported repeater")
+                else:
+                    self.send_body(200, json.dumps(next_ts).encode())
+            elif path.startswith("root-id/"):
+                stub.count("root-id")
+                root_id = stub.roots.get(path.removeprefix("root-id/"))
+                if root_id is None:
+                    self.send_body(404, b"no such file")
+                else:
+                    self.send_body(200, json.dumps(root_id).encode())
+            elif path.startswith("node/"):
+                stub.count("node")
+                node = stub.nodes.get(path.removeprefix("node/"))
+                if node is None:
+                    self.send_body(404, b"no such node")
+                else:
+                    self.send_body(200, json.dumps(node).encode())
+            else:
+                stub.count("other")
+                self.send_body(404, b"unknown endpoint")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start_stub(size, today=None, seed=0, port=0):
+    """
+    Starts the stub server on a background thread with a synthetic vault of the given size, returning
+    `(server, stub)`. With a port of 0, a free one is picked (see `server.server_port`).
+    """
+
+    stub = StarlingStub(*generate_vault(size, today, seed))
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve a synthetic vault as a local Starling server.", prog="stub")
+    parser.add_argument("-n", "--nodes", type=int, default=1000, help="The number of action items to generate.")
+    parser.add_argument("-d", "--date", type=str, help="The date to centre the vault's timestamps around (default: today).")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="The seed to generate from.")
+    parser.add_argument("-p", "--port", type=int, default=3000, help="The port to serve on.")
+
+    args = parser.parse_args(args)
+    today = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+
+    server, stub = start_stub(args.nodes, today, args.seed, args.port)
+    print(f"Serving {len(stub.items)} action items on http://127.0.0.1:{server.server_port}/ (set `$STARLING_API` to this)", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"Requests: {dict(stub.counts)}", file=sys.stderr)
@@ -0,0 +1,304 @@
+# Generates synthetic vaults in the same shape as Starling's `/index/action_items/nodes` output, for
+# benchmarking the scripts at any scale without a real vault. Everything is seeded, so the same
+# arguments always give the same vault.
+
+import random
+import uuid
+from datetime import date, datetime, timedelta
+from ..goals import DAILY_SURFACES_ID
+from ..utils import dump_json
+
+WORDS = [
+    "review", "draft", "plan", "call", "email", "fix", "write", "read", "book", "pay", "order",
+    "clean", "prepare", "research", "update", "organise", "submit", "check", "finish", "outline",
+    "budget", "report", "garden", "car", "taxes", "essay", "website", "server", "kitchen", "trip",
+    "meeting", "lecture", "paper", "notes", "invoice", "presentation", "backup", "library",
+]
+NAMES = ["Alice", "Bob", "Carol", "Dave", "Erin", "Frank", "Grace", "Heidi", "Ivan", "Judy", "Mallory", "Niaj", "Olivia", "Peggy", "Rupert", "Sybil", "Trent", "Victor", "Walter"]
+CONTEXTS = ["home", "work", "computer", "phone", "errands", "uni"]
+FOCUSES = ["min", "low", "med", "high"]
+TIMES = ["5m", "15m", "30m", "45m", "1hr", "1hr 30m", "2hr"]
+LOCATIONS = ["Office", "Library", "Cafe", "Room 101", None, None]
+
+# How often each kind of thing appears (projects and people produce several nodes each)
+KIND_WEIGHTS = {
+    "project": 12,
+    "task": 20,
+    "problem": 5,
+    "event": 14,
+    "person": 4,
+    "tickle": 8,
+    "daily_note": 8,
+    "waiting": 8,
+    "done": 12,
+}
+
+def make_id(rng):
+    """
+    Makes a deterministic UUID from the given random generator.
+    """
+
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def make_title(rng, words=3):
+    """
+    Makes a random title.
+    """
+
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, words))).capitalize()
+
+def make_body(rng):
+    """
+    Makes a random Markdown body, which is often empty.
+    """
+
+    if rng.random() < 0.4:
+        return ""
+    lines = [f"- {make_title(rng, 6)}" for _ in range(rng.randint(1, 4))]
+    if rng.random() < 0.5:
+        lines.insert(0, f"Some notes about {make_title(rng).lower()}.\n")
+    return "\n".join(lines)
+
+def make_timestamp(day, time=None, end_time=None, repeater=None, active=True):
+    """
+    Makes an Orgish timestamp on the given date, with an optional time span and repeater.
+    """
+
+    return {
+        "start": {"date": day.isoformat(), "time": time},
+        "end": {"date": day.isoformat(), "time": end_time} if end_time else None,
+        "repeater": repeater,
+        "active": active,
+    }
+
+def random_time(rng):
+    """
+    Makes a random start and end time on the hour or half hour, in the daytime.
+    """
+
+    start = rng.randint(16, 38) * 30
+    end = start + rng.choice([30, 60, 90, 120])
+    return f"{start // 60:02d}:{start % 60:02d}:00", f"{min(end // 60, 23):02d}:{end % 60:02d}:00"
+
+def make_node(rng, title_path, path, keyword=None, parent_id=None, parent_tags=(), tags=(), properties=None, timestamps=(), scheduled=None, deadline=None, closed=None, priority=None):
+    """
+    Makes a single node in the shape Starling gives them with metadata and children (the children are
+    filled in afterwards).
+    """
+
+    return {
+        "id": make_id(rng),
+        "parent_id": parent_id,
+        "title": list(title_path),
+        "body": make_body(rng),
+        "tags": list(tags),
+        "parent_tags": list(parent_tags),
+        "path": path,
+        "children": [],
+        "metadata": {
+            "keyword": keyword,
+            "priority": priority,
+            "properties": properties or {},
+            "timestamps": list(timestamps),
+            "scheduled": scheduled,
+            "deadline": deadline,
+            "closed": closed,
+        },
+    }
+
+def add_child(parent, child):
+    """
+    Links the given child to its parent.
+    """
+
+    child["parent_id"] = parent["id"]
+    parent["children"].append([child["id"], child["title"][-1]])
+
+def people_property(rng, people):
+    """
+    Makes a `PEOPLE` property linking to some of the given people, or `None` (most of the time).
+    """
+
+    if not people or rng.random() < 0.7:
+        return None
+    chosen = rng.sample(people, rng.randint(1, min(2, len(people))))
+    return ", ".join(f"[(Person) {name}]({id})" for name, id in chosen)
+
+def planning(rng, today):
+    """
+    Makes random scheduled and deadline timestamps (either can be absent), with the deadline always
+    on or after the scheduled date.
+    """
+
+    scheduled = None
+    deadline = None
+    if rng.random() < 0.35:
+        scheduled_day = today + timedelta(days=rng.randint(-20, 40))
+        repeater = rng.choice([None, None, None, "+1w", ".+2d", "++1m"])
+        scheduled = make_timestamp(scheduled_day, repeater=repeater)
+        if rng.random() < 0.4:
+            deadline = make_timestamp(scheduled_day + timedelta(days=rng.randint(0, 20)), "17:00:00")
+    elif rng.random() < 0.25:
+        deadline = make_timestamp(today + timedelta(days=rng.randint(-10, 40)), rng.choice([None, "12:00:00"]))
+    return scheduled, deadline
+
+def make_task(rng, today, title_path, path, people, keyword="TODO"):
+    """
+    Makes a task (or problem), which might have planning timestamps or a work block.
+    """
+
+    properties = {}
+    if keyword == "TODO":
+        properties["TIME"] = rng.choice(TIMES)
+        properties["FOCUS"] = rng.choice(FOCUSES)
+    people_prop = people_property(rng, people)
+    if people_prop:
+        properties["PEOPLE"] = people_prop
+
+    scheduled, deadline = planning(rng, today)
+    timestamps = []
+    if rng.random() < 0.1:
+        # A work block for this task
+        start, end = random_time(rng)
+        timestamps.append(make_timestamp(today + timedelta(days=rng.randint(-5, 20)), start, end))
+
+    return make_node(
+        rng, title_path, path,
+        keyword=keyword,
+        tags=rng.sample(CONTEXTS, rng.choice([0, 1, 1, 1, 2])),
+        properties=properties,
+        timestamps=timestamps,
+        scheduled=scheduled,
+        deadline=deadline,
+        priority=rng.choice([None] * 8 + ["1", "2", "3"]),
+    )
+
+def generate_vault(size, today=None, seed=0):
+    """
+    Generates a synthetic vault of roughly the given number of action items (projects and people
+    produce several at once, so this may overshoot slightly), with dates around the given day. This
+    returns `(items, nodes, roots)`, where `items` is what the action items index would give,
+    `nodes` maps the IDs of extra nodes which aren't action items (e.g. the roots of people's files)
+    to those nodes, and `roots` maps file paths to the IDs of their root nodes.
+    """
+
+    rng = random.Random(seed)
+    today = today or date.today()
+    items = []
+    nodes = {}
+    roots = {}
+    people = []
+
+    kinds = list(KIND_WEIGHTS)
+    weights = list(KIND_WEIGHTS.values())
+    counter = 0
+    while len(items) < size:
+        kind = rng.choices(kinds, weights)[0]
+        counter += 1
+
+        if kind == "project":
+            path = f"projects/{counter}.md"
+            project = make_node(rng, [make_title(rng)], path, keyword="PROJ", priority=rng.choice([None, None, "2", "3"]))
+            project["metadata"]["scheduled"], project["metadata"]["deadline"] = planning(rng, today)
+            items.append(project)
+
+            for _ in range(rng.randint(2, 8)):
+                keyword = "PROB" if rng.random() < 0.15 else "TODO"
+                task = make_task(rng, today, [*project["title"], make_title(rng)], path, people, keyword)
+                add_child(project, task)
+                items.append(task)
+
+            # Some projects have subprojects
+            if rng.random() < 0.25:
+                subproject = make_node(rng, [*project["title"], make_title(rng)], path, keyword="PROJ")
+                add_child(project, subproject)
+                items.append(subproject)
+                for _ in range(rng.randint(1, 4)):
+                    task = make_task(rng, today, [*subproject["title"], make_title(rng)], path, people)
+                    add_child(subproject, task)
+                    items.append(task)
+        elif kind in ("task", "problem"):
+            items.append(make_task(rng, today, [make_title(rng)], "inbox.md", people, "TODO" if kind == "task" else "PROB"))
+        elif kind == "event":
+            start, end = random_time(rng)
+            day = today + timedelta(days=rng.randint(-30, 30))
+            repeater = rng.choice([None, None, None, "+1w", "+1d", "+2w", "++1w", "+1m"])
+            timestamps = [make_timestamp(day, start, end, repeater)]
+            if rng.random() < 0.1:
+                timestamps.append(make_timestamp(day + timedelta(days=rng.randint(1, 14)), start, end))
+            if rng.random() < 0.05:
+                timestamps.append(make_timestamp(day, start, end, active=False))
+
+            properties = {}
+            location = rng.choice(LOCATIONS)
+            if location:
+                properties["LOCATION"] = location
+            people_prop = people_property(rng, people)
+            if people_prop:
+                properties["PEOPLE"] = people_prop
+            items.append(make_node(rng, [make_title(rng)], "calendar.md", properties=properties, timestamps=timestamps))
+        elif kind == "person":
+            name = f"{rng.choice(NAMES)} {counter}"
+            path = f"people/{counter}.md"
+            root = make_node(rng, [f"(Person) {name}"], path)
+            nodes[root["id"]] = root
+            roots[path] = root["id"]
+            people.append((name, root["id"]))
+
+            for title in rng.sample(["Birthday", "Anniversary", "Graduation", "Name day"], rng.randint(1, 2)):
+                day = date(today.year - rng.randint(0, 40), rng.randint(1, 12), rng.randint(1, 28))
+                person_date = make_node(
+                    rng, [*root["title"], title], path,
+                    parent_tags=["person_dates"],
+                    properties={"ADVANCE": rng.choice(["1w", "2w", "3d", "1w 2d"])},
+                    timestamps=[make_timestamp(day, repeater="+1y")],
+                )
+                person_date["parent_id"] = root["id"]
+                items.append(person_date)
+        elif kind == "tickle":
+            day = today + timedelta(days=rng.randint(-10, 60))
+            items.append(make_node(rng, ["Tickles", make_title(rng)], "tickles.md", parent_tags=["tickles"], timestamps=[make_timestamp(day)]))
+        elif kind == "daily_note":
+            day = today + timedelta(days=rng.randint(-10, 30))
+            items.append(make_node(rng, ["Daily notes", make_title(rng)], "daily.md", parent_tags=["daily_notes"], timestamps=[make_timestamp(day)]))
+        elif kind == "waiting":
+            sent = today - timedelta(days=rng.randint(0, 30))
+            scheduled, deadline = planning(rng, today)
+            items.append(make_node(
+                rng, ["Waiting for", make_title(rng)], "waiting.md",
+                parent_tags=["waiting"],
+                properties={"SENT": sent.isoformat(), **({"PEOPLE": people_property(rng, people)} if people and rng.random() < 0.5 else {})},
+                scheduled=scheduled,
+                deadline=deadline,
+            ))
+        else:
+            closed_day = today - timedelta(days=rng.randint(0, 100))
+            items.append(make_node(rng, [make_title(rng)], "inbox.md", keyword="DONE", closed=make_timestamp(closed_day, "12:00:00", active=False)))
+
+    # The node the goals script surfaces every day
+    nodes[DAILY_SURFACES_ID] = {
+        "id": DAILY_SURFACES_ID,
+        "parent_id": None,
+        "title": ["Daily surfaces"],
+        "body": "- Drink water\n- Go for a walk",
+        "tags": [],
+        "parent_tags": [],
+        "path": "surfaces.md",
+        "children": [],
+        "metadata": None,
+    }
+
+    return items, nodes, roots
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a synthetic vault in the same shape as Starling's action items.", prog="vault")
+    parser.add_argument("-n", "--nodes", type=int, default=1000, help="The number of action items to generate.")
+    parser.add_argument("-d", "--date", type=str, help="The date to centre the vault's timestamps around (default: today).")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="The seed to generate from.")
+
+    args = parser.parse_args(args)
+    today = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+
+    items, _, _ = generate_vault(args.nodes, today, args.seed)
+    dump_json(items)
@@ -0,0 +1,167 @@
+# A persistent on-disk cache of snapshots of the action items index, which lets repeated dashboard
+# invocations avoid refetching the whole vault from Starling. Snapshots are keyed by the options
+# they were requested with, and are revalidated with the server's `ETag`/`Last-Modified` headers
+# if it gives us them, or expire after a TTL otherwise.
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from .utils import starling_api
+
+# How long a snapshot without any validators from the server will be trusted for, in seconds
+DEFAULT_TTL = 60
+# This can be disabled globally with `main.py --no-cache`
+CACHE_ENABLED = True
+
+def cache_dir():
+    """
+    Gets the directory snapshots are stored in, under `$XDG_CACHE_HOME`.
+    """
+
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "scheduling-scripts"
+
+def cache_ttl():
+    """
+    Gets the TTL for snapshots without validators, which can be overridden with
+    `$SCHEDULING_SCRIPTS_CACHE_TTL`.
+    """
+
+    ttl = os.environ.get("SCHEDULING_SCRIPTS_CACHE_TTL")
+    try:
+        return int(ttl) if ttl else DEFAULT_TTL
+    except ValueError:
+        raise ValueError(f"Invalid cache TTL: {ttl}")
+
+def snapshot_path(opts):
+    """
+    Gets the path of the snapshot for the given request options to the current Starling server (so
+    snapshots from different servers never get mixed up).
+    """
+
+    request = {"api": starling_api().rstrip("/"), "opts": opts}
+    key = hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()[:16]
+    return cache_dir() / f"{key}.json"
+
+def load_snapshot(opts):
+    """
+    Loads the snapshot for the given request options, if there is one. Corrupt snapshots are
+    treated as absent.
+    """
+
+    if not CACHE_ENABLED:
+        return None
+
+    path = snapshot_path(opts)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_snapshot(opts, data, headers):
+    """
+    Saves the given data as the snapshot for the given request options, along with any validators
+    in the given response headers.
+    """
+
+    if not CACHE_ENABLED:
+        return
+
+    path = snapshot_path(opts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    snapshot = {
+        "opts": opts,
+        "created": time.time(),
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "data": data,
+    }
+
+    # Write atomically so concurrent invocations never see a partial snapshot
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def snapshot_is_fresh(snapshot):
+    """
+    Determines whether or not the given snapshot can be used without asking the server. This is only
+    the case for snapshots without validators, which are trusted until their TTL runs out.
+    """
+
+    if snapshot["etag"] or snapshot["last_modified"]:
+        return False
+    return time.time() - snapshot["created"] < cache_ttl()
+
+def conditional_headers(snapshot):
+    """
+    Produces the headers needed to ask the server whether or not the given snapshot is still valid.
+    """
+
+    headers = {}
+    if snapshot and snapshot["etag"]:
+        headers["If-None-Match"] = snapshot["etag"]
+    if snapshot and snapshot["last_modified"]:
+        headers["If-Modified-Since"] = snapshot["last_modified"]
+    return headers
+
+def clear_snapshots():
+    """
+    Deletes all cached snapshots, returning how many there were.
+    """
+
+    count = 0
+    for path in cache_dir().glob("*.json"):
+        path.unlink()
+        count += 1
+    return count
+
+def describe_snapshots():
+    """
+    Describes every cached snapshot, giving its options, age, size, and validators.
+    """
+
+    descriptions = []
+    for path in sorted(cache_dir().glob("*.json")):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            descriptions.append({"path": str(path), "corrupt": True})
+            continue
+
+        descriptions.append({
+            "path": str(path),
+            "opts": snapshot["opts"],
+            "created": datetime.fromtimestamp(snapshot["created"]).isoformat(timespec="seconds"),
+            "items": len(snapshot["data"]),
+            "bytes": path.stat().st_size,
+            "etag": snapshot["etag"],
+            "last_modified": snapshot["last_modified"],
+        })
+
+    return descriptions
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or clear the action items snapshot cache.", prog="cache")
+    parser.add_argument("action", choices=["info", "clear"], help="Whether to describe the cached snapshots or delete them.")
+
+    args = parser.parse_args(args)
+    if args.action == "clear":
+        count = clear_snapshots()
+        print(f"Cleared {count} snapshot(s) from {cache_dir()}.")
+    else:
+        descriptions = describe_snapshots()
+        if not descriptions:
+            print(f"No snapshots in {cache_dir()}.")
+        for desc in descriptions:
+            if desc.get("corrupt"):
+                print(f"{desc['path']} (corrupt)")
+                continue
+            validator = f"ETag {desc['etag']}" if desc["etag"] else f"Last-Modified {desc['last_modified']}" if desc["last_modified"] else f"TTL {cache_ttl()}s"
+            print(f"{desc['path']}\n  Options: {json.dumps(desc['opts'], sort_keys=True)}\n  Created: {desc['created']}\n  Items: {desc['items']} ({desc['bytes']} bytes)\n  Validated by: {validator}")
@@ -1,51 +1,71 @@
 # Filters the given action items to a list of calendar events and scheduled work blocks.
 
-from .utils import associated_people, dump_json, load_json, parse_range_str, timestamp_to_datetime, body_for_proj
+from .utils import associated_people, dump_json, load_json, parse_range_str, datetime_to_epoch, timestamp_to_epochs
+from .index import ItemIndex, IntervalIndex, hierarchy_index, timed_items
+from .instrument import traced
 
 def ts_in_range(ts, range_start, range_end):
     """
     Determines if the given timestamp is in the given range.
     """
 
-    ts_start, ts_end = timestamp_to_datetime(ts)
-    ts_end = ts_end or ts_start
+    ts_start, ts_end = timestamp_to_epochs(ts)
+    range_start = datetime_to_epoch(range_start) if range_start else None
+    return span_in_range(ts_start, ts_end or ts_start, range_start, datetime_to_epoch(range_end))
+
+def span_in_range(ts_start, ts_end, range_start, range_end):
+    """
+    Determines if the given timestamp span overlaps the given range, all in the compact integer
+    form from `utils.parse_epoch`.
+    """
+
     return (range_start and ts_start <= range_end and ts_end >= range_start) or (not range_start and ts_start <= range_end)
 
+@traced()
 def filter_to_calendar(action_items, range_start, range_end):
     """
     Filters the given action items to events and scheduled work blocks in the given datetime range.
     If you want to filter between days, make sure `range_end` has a time ending at 23:59.
+
+    The action items can be given as an `ItemIndex`, in which case an interval index over its
+    pre-parsed timestamps will be built on the first query and reused for any later ones.
     """
-    action_items_map = {item["id"]: item for item in action_items}
+    hierarchy = hierarchy_index(action_items)
+    start_epoch = datetime_to_epoch(range_start) if range_start else None
+    end_epoch = datetime_to_epoch(range_end)
 
-    # Get all the items with a timestamp, and insert them as many times as they have timestamps
-    cals = []
-    for item in action_items:
-        # Strip out dates associated with people (e.g. birthdays), daily info items, and tickles
-        if "person_dates" in item["parent_tags"] or "tickles" in item["parent_tags"] or "daily_notes" in item["parent_tags"]: continue
+    # Get all the items with a timestamp in the range (this strips out dates associated with
+    # people, daily info items, and tickles)
+    if isinstance(action_items, ItemIndex):
+        intervals = action_items.cached("calendar", lambda: IntervalIndex(action_items.timed))
+        in_range = intervals.overlapping(start_epoch, end_epoch)
+    else:
+        in_range = [item for ts_start, ts_end, item in timed_items(action_items) if span_in_range(ts_start, ts_end, start_epoch, end_epoch)]
 
+    # Insert items as many times as they have timestamps
+    cals = []
+    for item in in_range:
         ts = item["metadata"]["timestamp"]
-        if ts and ts_in_range(ts, range_start, range_end):
-            # If a project is scheduled, assemble a body of the project's tasks (which will
-            # all be action items we should have, so we can get them by their IDs)
-            # TODO: Isn't this done for us by `next_actions.py`?
-            if item["metadata"]["keyword"] == "PROJ":
-                body = body_for_proj(item, action_items_map)
-            else:
-                body = item["body"] or ""
+        # If a project is scheduled, assemble a body of the project's tasks (which will
+        # all be action items we should have, so we can get them by their IDs)
+        # TODO: Isn't this done for us by `next_actions.py`?
+        if item["metadata"]["keyword"] == "PROJ":
+            body = hierarchy.project_body(item)
+        else:
+            body = item["body"] or ""
 
-            cal_item = {
-                "id": item["id"],
-                "title": item["title"][-1],
-                "body": body.strip(),
-                "location": item["metadata"]["properties"].get("LOCATION"),
-                "people": associated_people(item),
-                "start": ts["start"],
-                "end": ts["end"],
-                # Never used for events proper, but allows displaying problems nicely
-                "keyword": item["metadata"]["keyword"],
-            }
-            cals.append(cal_item)
+        cal_item = {
+            "id": item["id"],
+            "title": item["title"][-1],
+            "body": body.strip(),
+            "location": item["metadata"]["properties"].get("LOCATION"),
+            "people": associated_people(item),
+            "start": ts["start"],
+            "end": ts["end"],
+            # Never used for events proper, but allows displaying problems nicely
+            "keyword": item["metadata"]["keyword"],
+        }
+        cals.append(cal_item)
 
     # Sort by start date, then start time, then title
     cals.sort(key=lambda x: (x["start"]["date"], x["start"]["time"] or "00:00", x["title"]))
@@ -56,9 +76,11 @@ def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Convert action items to calendar events.", prog="cal")
     parser.add_argument("range", type=str, help="The range of dates to return events for (`start:end`).")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line (this buffers everything before writing, as the results are sorted).")
 
     args = parser.parse_args(args)
     range_start, range_end = parse_range_str(args.range)
 
-    action_items = load_json()
-    dump_json(filter_to_calendar(action_items, range_start, range_end))
+    # We need to look up projects' children, so this has to buffer everything
+    action_items = list(load_json(args.ndjson))
+    dump_json(filter_to_calendar(action_items, range_start, range_end), args.ndjson)
@@ -0,0 +1,209 @@
+# Records every outbound HTTP request (to Starling and Google) to a compressed cassette file, and
+# replays them later without touching the network, so commands can be benchmarked and regression
+# tested against real vault data offline. This is enabled with `main.py --record <path>` or
+# `main.py --replay <path>`, and works by mounting a transport adapter on the `requests` sessions
+# everything goes through, so nothing else needs to know about it.
+#
+# Requests are matched on their method, path (so a cassette can be replayed with a different
+# `$STARLING_API`), and a hash of their body. Identical requests are served
+# in the order they were recorded (repeating the last one if there are more of them on replay), and
+# requests whose bodies can never match (e.g. signed Google token requests, which contain the time)
+# fall back to the next one recorded for the same method and path. Cassettes hold full response
+# bodies, so they'll contain vault data and short-lived Google access tokens: treat them like the
+# vault itself.
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+import urllib.parse
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+CASSETTE_VERSION = 1
+
+# Either `None`, `"record"`, or `"replay"`
+MODE = None
+# The file being recorded to or replayed from
+PATH = None
+# The latency to inject before each replayed response, in seconds, or `"recorded"` to wait as long
+# as the original request took
+LATENCY = 0
+
+# Recorded interactions, in order
+_interactions = []
+# On replay, interactions by `(method, path, body_hash)` and `(method, path)`, each with how many
+# of them have been served
+_by_request = {}
+_by_path = {}
+_lock = threading.Lock()
+
+def body_hash(body):
+    """
+    Hashes the given request body (which may be `None`, text, or bytes).
+    """
+
+    if body is None:
+        body = b""
+    elif isinstance(body, str):
+        body = body.encode()
+    return hashlib.sha256(body).hexdigest()
+
+def request_path(url):
+    """
+    Gets the path and query of the given URL, which is what requests are matched on.
+    """
+
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+def parse_latency(latency):
+    """
+    Parses a replay latency given on the command line, in milliseconds, or `recorded`.
+    """
+
+    if latency == "recorded":
+        return latency
+    try:
+        return float(latency) / 1000
+    except ValueError:
+        raise ValueError(f"Invalid replay latency '{latency}' (expected milliseconds or 'recorded')")
+
+def start_recording(path):
+    """
+    Starts recording all requests, to be written to the given path when we exit.
+    """
+
+    global MODE, PATH
+    MODE = "record"
+    PATH = path
+    _interactions.clear()
+    atexit.register(save)
+
+def start_replay(path):
+    """
+    Starts replaying the requests recorded in the given cassette.
+    """
+
+    global MODE, PATH
+    with gzip.open(path, "rt") as f:
+        cassette = json.load(f)
+    if cassette.get("version") != CASSETTE_VERSION:
+        raise Exception(f"Unsupported cassette version in {path}: {cassette.get('version')}")
+
+    MODE = "replay"
+    PATH = path
+    _by_request.clear()
+    _by_path.clear()
+    for interaction in cassette["interactions"]:
+        path = request_path(interaction["url"])
+        _by_request.setdefault((interaction["method"], path, interaction["body_sha256"]), [0, []])[1].append(interaction)
+        _by_path.setdefault((interaction["method"], path), [0, []])[1].append(interaction)
+
+def save():
+    """
+    Writes everything recorded to the cassette, if we're recording.
+    """
+
+    if MODE != "record":
+        return
+
+    with _lock:
+        cassette = {"version": CASSETTE_VERSION, "interactions": list(_interactions)}
+    with gzip.open(PATH, "wt") as f:
+        json.dump(cassette, f)
+
+def next_interaction(queues, key):
+    """
+    Gets the next interaction to serve from the queue under the given key, if there is one. Once a
+    queue is used up, its last interaction is served again.
+    """
+
+    queue = queues.get(key)
+    if queue is None:
+        return None
+
+    served, interactions = queue
+    queue[0] = served + 1
+    return interactions[min(served, len(interactions) - 1)]
+
+def replay_response(request):
+    """
+    Builds the recorded response to the given request.
+    """
+
+    path = request_path(request.url)
+    with _lock:
+        interaction = next_interaction(_by_request, (request.method, path, body_hash(request.body)))
+        if interaction is None:
+            interaction = next_interaction(_by_path, (request.method, path))
+    if interaction is None:
+        raise Exception(f"No recorded response for {request.method} {request.url} in {PATH}")
+
+    delay = interaction["elapsed"] if LATENCY == "recorded" else LATENCY
+    if delay:
+        time.sleep(delay)
+
+    response = Response()
+    response.status_code = interaction["status"]
+    response.reason = interaction["reason"]
+    response.headers = CaseInsensitiveDict(interaction["headers"])
+    response._content = base64.b64decode(interaction["body"])
+    response.encoding = None
+    response.url = request.url
+    response.request = request
+    return response
+
+class CassetteAdapter(BaseAdapter):
+    """
+    A transport adapter that records everything sent through the given adapter, or replays recorded
+    responses without sending anything.
+    """
+
+    def __init__(self, inner):
+        super().__init__()
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        if MODE == "replay":
+            return replay_response(request)
+
+        start = time.perf_counter()
+        response = self.inner.send(request, **kwargs)
+        interaction = {
+            "method": request.method,
+            "url": request.url,
+            "body_sha256": body_hash(request.body),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": CaseInsensitiveDict(response.headers),
+            # This reads the whole body, which is fine for everything we request
+            "body": base64.b64encode(response.content).decode(),
+            "elapsed": time.perf_counter() - start,
+        }
+        # The body has already been decoded, so it mustn't be decoded again on replay
+        interaction["headers"].pop("Content-Encoding", None)
+        interaction["headers"].pop("Transfer-Encoding", None)
+        interaction["headers"]["Content-Length"] = str(len(response.content))
+        interaction["headers"] = dict(interaction["headers"])
+        with _lock:
+            _interactions.append(interaction)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+def mount(session):
+    """
+    Mounts the cassette on the given session if we're recording or replaying, wrapping whatever
+    adapters it already has.
+    """
+
+    if MODE is None:
+        return
+    for prefix, adapter in list(session.adapters.items()):
+        session.mount(prefix, CassetteAdapter(adapter))
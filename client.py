@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Thin client for the daemon started with `main.py serve`. This forwards its arguments to the daemon
+# exactly as they would be given to `main.py` (e.g. `client.py day -d tmrw`), and streams back the
+# rendered output. This deliberately imports nothing but the standard library, so it starts far
+# faster than `main.py` itself.
+
+import json
+import os
+import shutil
+import socket
+import struct
+import sys
+
+# Every message is a one-byte kind, a four-byte big-endian length, and then that many bytes
+FRAME_HEADER = struct.Struct(">cI")
+# Kinds of messages: a request from the client (followed by its stdin, if it has any), output on
+# stdout/stderr, and the exit code
+FRAME_REQUEST = b"r"
+FRAME_STDIN = b"i"
+FRAME_STDOUT = b"o"
+FRAME_STDERR = b"e"
+FRAME_EXIT = b"x"
+
+def default_socket_path():
+    """
+    Gets the path of the daemon's socket, which can be overridden with `$SCHEDULING_SCRIPTS_SOCKET`,
+    and is otherwise under `$XDG_RUNTIME_DIR` (or the temporary directory).
+    """
+
+    path = os.environ.get("SCHEDULING_SCRIPTS_SOCKET")
+    if path:
+        return path
+
+    base = os.environ.get("XDG_RUNTIME_DIR") or f"/tmp/scheduling-scripts-{os.getuid()}"
+    return os.path.join(base, "scheduling-scripts.sock")
+
+def write_frame(sock, kind, payload):
+    """
+    Sends a single message of the given kind with the given payload (bytes) over the socket.
+    """
+
+    sock.sendall(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+def read_exact(sock, size):
+    """
+    Reads exactly the given number of bytes from the socket, returning `None` if it closes first.
+    """
+
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            return None
+        buf.extend(chunk)
+    return bytes(buf)
+
+def read_frame(sock):
+    """
+    Reads a single message from the socket as `(kind, payload)`, returning `None` if it closes first.
+    """
+
+    header = read_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    kind, size = FRAME_HEADER.unpack(header)
+    payload = read_exact(sock, size)
+    if payload is None:
+        return None
+    return kind, payload
+
+def run_remote(argv, socket_path=None):
+    """
+    Runs the given `main.py` arguments in the daemon, writing its output to our stdout and stderr as
+    it comes in, and returning its exit code. Our stdin is forwarded (as bytes, so binary formats
+    work too) if it isn't a terminal, so the raw scripts can still be piped into.
+    """
+
+    stdin = None if sys.stdin is None or sys.stdin.isatty() else sys.stdin.buffer.read()
+    request = {
+        "argv": argv,
+        "stdin": stdin is not None,
+        "tty": sys.stdout.isatty(),
+        "width": shutil.get_terminal_size().columns if sys.stdout.isatty() else None,
+    }
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path or default_socket_path())
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise Exception("The daemon isn't running (start it with `main.py serve`)")
+        write_frame(sock, FRAME_REQUEST, json.dumps(request).encode())
+        if stdin is not None:
+            write_frame(sock, FRAME_STDIN, stdin)
+
+        while True:
+            frame = read_frame(sock)
+            if frame is None:
+                raise Exception("The daemon closed the connection unexpectedly")
+
+            kind, payload = frame
+            if kind == FRAME_STDOUT:
+                sys.stdout.buffer.write(payload)
+                sys.stdout.buffer.flush()
+            elif kind == FRAME_STDERR:
+                sys.stderr.buffer.write(payload)
+                sys.stderr.buffer.flush()
+            elif kind == FRAME_EXIT:
+                return int(payload)
+
+if __name__ == "__main__":
+    sys.exit(run_remote(sys.argv[1:]))
@@ -0,0 +1,252 @@
+# The interchange formats the raw scripts can read and write. JSON is always the default, but for
+# large sets of action items the binary formats here are much cheaper to encode and decode at every
+# stage of a pipeline. These need optional packages (`msgpack` for MessagePack, `cbor2` for CBOR),
+# and are written after a short magic header, so readers detect them automatically (JSON can never
+# start with a null byte).
+
+import gc
+import io
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+# The format to write output in, which can be set with `main.py --format <name>`
+OUTPUT_FORMAT = "json"
+# Binary output starts with this, then the format's name and a newline
+MAGIC_PREFIX = b"\x00SS"
+
+# When `main.py pipe` runs several raw stages in one process, each stage's output is handed straight
+# to the next as Python objects, rather than being encoded. While `FUSING` is set, output goes into
+# `FUSED_OUTPUT`, and if `FUSED_INPUT` is set, input is taken from there. Both hold
+# `(data, stream)`, where `stream` says whether the data is a (possibly lazy) stream of items.
+FUSING = False
+FUSED_INPUT = None
+FUSED_OUTPUT = None
+
+def msgpack_codec():
+    """
+    Creates the codec for MessagePack.
+    """
+
+    try:
+        import msgpack
+    except ImportError:
+        raise Exception("The MessagePack format needs the `msgpack` package installed")
+
+    def dump_stream(items, f):
+        packer = msgpack.Packer()
+        for item in items:
+            f.write(packer.pack(item))
+            f.flush()
+
+    return {
+        "dump": lambda data, f: f.write(msgpack.packb(data)),
+        "load": lambda f: msgpack.unpackb(f.read()),
+        "dump_stream": dump_stream,
+        "load_stream": lambda f: iter(msgpack.Unpacker(f)),
+    }
+
+def cbor_codec():
+    """
+    Creates the codec for CBOR.
+    """
+
+    try:
+        import cbor2
+    except ImportError:
+        raise Exception("The CBOR format needs the `cbor2` package installed")
+
+    def dump_stream(items, f):
+        encoder = cbor2.CBOREncoder(f)
+        for item in items:
+            encoder.encode(item)
+            f.flush()
+
+    def load_stream(f):
+        decoder = cbor2.CBORDecoder(f)
+        while f.peek(1):
+            yield decoder.decode()
+
+    return {
+        "dump": cbor2.dump,
+        "load": cbor2.load,
+        "dump_stream": dump_stream,
+        "load_stream": load_stream,
+    }
+
+# The binary formats, by name, each with a function to set them up (so their packages are only
+# imported when they're used)
+CODECS = {
+    "msgpack": msgpack_codec,
+    "cbor": cbor_codec,
+}
+FORMATS = ["json", *CODECS]
+
+def set_output_format(name):
+    """
+    Sets the format all output will be written in.
+    """
+
+    if name not in FORMATS:
+        raise ValueError(f"Unknown format '{name}' (expected one of: {', '.join(FORMATS)})")
+
+    global OUTPUT_FORMAT
+    OUTPUT_FORMAT = name
+
+def read_header(f):
+    """
+    Reads the magic header from the start of the given binary stream if there is one, returning
+    the name of the format it gives, or `None` for plain JSON (in which case nothing is consumed).
+    """
+
+    if not hasattr(f, "peek") or f.peek(1)[:1] != MAGIC_PREFIX[:1]:
+        return None
+
+    header = f.readline()
+    if not header.startswith(MAGIC_PREFIX):
+        raise ValueError("Input starts with a null byte, but doesn't have a valid format header")
+    name = header[len(MAGIC_PREFIX):].strip().decode()
+    if name not in CODECS:
+        raise ValueError(f"Input is in an unknown format: {name}")
+    return name
+
+@contextmanager
+def paused_gc():
+    """
+    Pauses the garbage collector while decoding. Decoding a big input allocates millions of objects
+    but can never create a reference cycle, so the collections it would otherwise set off are pure
+    overhead (roughly doubling the time taken).
+    """
+
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def read_input(stream=False):
+    """
+    Reads data from stdin, in whatever format it was written in. If `stream` is set, this will
+    lazily yield each item of a stream (one per line for JSON), rather than reading one big object.
+    """
+
+    global FUSED_INPUT
+    if FUSED_INPUT is not None:
+        data, was_stream = FUSED_INPUT
+        FUSED_INPUT = None
+        # Unlike with real pipes, it doesn't matter if only one side is streaming
+        if stream:
+            return iter(data)
+        return list(data) if was_stream else data
+
+    buffer = getattr(sys.stdin, "buffer", None)
+    name = read_header(buffer) if buffer is not None else None
+    if name:
+        codec = CODECS[name]()
+        if stream:
+            return codec["load_stream"](buffer)
+        with paused_gc():
+            return codec["load"](buffer)
+
+    if stream:
+        return (json.loads(line) for line in sys.stdin if line.strip())
+    with paused_gc():
+        return json.loads(sys.stdin.read())
+
+def write_output(data, stream=False):
+    """
+    Writes the given data to stdout in the current output format. If `stream` is set, the data can
+    be any iterable, and each element will be written as soon as it's produced (one per line for
+    JSON).
+    """
+
+    global FUSED_OUTPUT
+    if FUSING:
+        FUSED_OUTPUT = (data, stream)
+        return
+
+    if OUTPUT_FORMAT == "json":
+        if stream:
+            # Flush each line, so the next stage of a pipeline can start on it straight away
+            for item in data:
+                sys.stdout.write(json.dumps(item, ensure_ascii=False))
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+        else:
+            json.dump(data, sys.stdout, ensure_ascii=False)
+        return
+
+    buffer = getattr(sys.stdout, "buffer", None)
+    if buffer is None:
+        raise Exception(f"Can't write {OUTPUT_FORMAT} here, as stdout isn't binary")
+
+    codec = CODECS[OUTPUT_FORMAT]()
+    # Anything already written as text has to come first
+    sys.stdout.flush()
+    buffer.write(MAGIC_PREFIX + OUTPUT_FORMAT.encode() + b"\n")
+    if stream:
+        codec["dump_stream"](data, buffer)
+    else:
+        codec["dump"](data, buffer)
+    buffer.flush()
+
+def scale_corpus(items, size):
+    """
+    Repeats the given items (with new IDs) until there are the given number of them.
+    """
+
+    if not items:
+        raise ValueError("Can't build a corpus from no items")
+    return [{**items[i % len(items)], "id": f"{items[i % len(items)]['id']}-{i}"} for i in range(size)]
+
+def benchmark_format(name, corpus):
+    """
+    Times one pipeline hop in the given format for the given corpus (encoding it as a stage would
+    write it, and decoding it as the next stage would read it), returning
+    `(encode_secs, decode_secs, bytes)`.
+    """
+
+    if name == "json":
+        start = time.perf_counter()
+        encoded = json.dumps(corpus, ensure_ascii=False).encode()
+        encoded_at = time.perf_counter()
+        with paused_gc():
+            json.loads(encoded.decode())
+        decoded_at = time.perf_counter()
+    else:
+        codec = CODECS[name]()
+        f = io.BytesIO()
+        start = time.perf_counter()
+        codec["dump"](corpus, f)
+        encoded = f.getvalue()
+        encoded_at = time.perf_counter()
+        with paused_gc():
+            codec["load"](io.BufferedReader(io.BytesIO(encoded)))
+        decoded_at = time.perf_counter()
+
+    return encoded_at - start, decoded_at - encoded_at, len(encoded)
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the cost of one pipeline hop in each interchange format, using action items from stdin.", prog="bench_codecs")
+    parser.add_argument("-n", "--items", type=int, default=50000, help="The number of items to scale the input up to.")
+    parser.add_argument("-r", "--repeats", type=int, default=3, help="How many times to run each format (the best is reported).")
+
+    args = parser.parse_args(args)
+    corpus = scale_corpus(read_input(), args.items)
+
+    print(f"One hop with {len(corpus)} items (best of {args.repeats}):")
+    for name in FORMATS:
+        try:
+            results = [benchmark_format(name, corpus) for _ in range(args.repeats)]
+        except Exception as err:
+            print(f"  {name}: unavailable ({err})")
+            continue
+
+        encode = min(result[0] for result in results)
+        decode = min(result[1] for result in results)
+        size = results[0][2]
+        print(f"  {name}: encode {encode * 1000:.0f}ms, decode {decode * 1000:.0f}ms, total {(encode + decode) * 1000:.0f}ms, {size / 1024 / 1024:.1f} MiB")
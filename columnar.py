@@ -0,0 +1,151 @@
+# A columnar form of next actions for filtering large numbers of them at once. Each field the
+# filters look at is held as a NumPy array (or, for contexts and people, as words of the bitmasks
+# from `interning.py`), so a filter becomes a handful of vectorised comparisons rather than a
+# Python loop over dictionaries. Building the columns is still a pass over every next action, so
+# this pays off when the same next actions are filtered repeatedly (e.g. by the daemon, or in a
+# benchmark).
+#
+# This needs the optional `numpy` package, which is only imported once columns are built, and
+# `filter.filter_next_actions` accepts these in place of a list of next actions, giving exactly the
+# same results.
+
+from .interning import CONTEXTS, PEOPLE, context_mask, people_mask
+from .utils import SECONDS_PER_DAY, should_surface_item, surfacing_map, ts_epoch
+
+# Codes for the keywords the filters care about, anything else gets `OTHER_KEYWORD`
+KEYWORD_CODES = {"TODO": 0, "PROB": 1, "PROJ": 2}
+OTHER_KEYWORD = 3
+# Each word of a bitmask column holds this many names
+BITS_PER_WORD = 64
+
+def import_numpy():
+    """
+    Imports NumPy, which is an optional dependency.
+    """
+
+    try:
+        import numpy
+    except ImportError:
+        raise Exception("Columnar filtering needs the `numpy` package installed")
+    # We need `bitwise_count`
+    if not hasattr(numpy, "bitwise_count"):
+        raise Exception(f"Columnar filtering needs NumPy 2.0 or later (found {numpy.__version__})")
+    return numpy
+
+class NameBitmasks:
+    """
+    The given bitmasks of names (e.g. contexts) from a `NameTable` in `interning.py`, held as a
+    `(words, items)` array of 64-bit words, so there can be any number of distinct names. Only items
+    with names get a column, as most items have no people.
+    """
+
+    def __init__(self, np, table, item_masks):
+        self.np = np
+        self.table = table
+        self.size = len(item_masks)
+
+        # The positions of the items with names, and how many names each has (as many as the table
+        # holds, which can be hundreds for people)
+        self.named = np.fromiter((i for i, mask in enumerate(item_masks) if mask), dtype=np.intp)
+        self.counts = np.fromiter((item_masks[i].bit_count() for i in self.named), dtype=np.uint16, count=len(self.named))
+
+        words = max((max(item_masks, default=0).bit_length() + BITS_PER_WORD - 1) // BITS_PER_WORD, 1)
+        word_bits = 2 ** BITS_PER_WORD - 1
+        self.masks = np.zeros((words, len(self.named)), dtype=np.uint64)
+        for column, i in enumerate(self.named):
+            # Items only have a few names, so only set the words they're in
+            mask = item_masks[i]
+            word = 0
+            while mask:
+                if mask & word_bits:
+                    self.masks[word, column] = mask & word_bits
+                mask >>= BITS_PER_WORD
+                word += 1
+
+    def all_within(self, names):
+        """
+        Gets a boolean array of which items have at least one name, and only names among those
+        given. This is the same as each item's names being an AND list that must all be available.
+        """
+
+        # Rather than checking every word for names that aren't available (there can be hundreds of
+        # people), count how many of the available names each item has, which only looks at the
+        # words those names are in
+        np = self.np
+        available = self.table.mask(names)
+        found = np.zeros(len(self.named), dtype=np.uint16)
+        word = 0
+        while available and word < self.masks.shape[0]:
+            word_mask = available & (2 ** BITS_PER_WORD - 1)
+            if word_mask:
+                found += np.bitwise_count(self.masks[word] & np.uint64(word_mask)).astype(np.uint16)
+            available >>= BITS_PER_WORD
+            word += 1
+
+        within = np.zeros(self.size, dtype=bool)
+        within[self.named] = found == self.counts
+        return within
+
+class NextActionColumns:
+    """
+    The given next actions (which must be a list, as from `next_actions.py`) in columnar form. This
+    can be iterated over to get the original next actions, in their original order.
+    """
+
+    def __init__(self, next_actions):
+        np = import_numpy()
+        self.np = np
+        self.items = next_actions
+
+        items_map = surfacing_map(next_actions)
+        n = len(next_actions)
+        no_scheduled = np.iinfo(np.int64).min
+        # Missing times and focuses sort after every real one, so problems never pass a maximum
+        # (and, as in the loop, neither do zero values)
+        self.surface = np.fromiter((should_surface_item(item, items_map) for item in next_actions), dtype=bool, count=n)
+        self.keyword = np.fromiter((KEYWORD_CODES.get(item["keyword"], OTHER_KEYWORD) for item in next_actions), dtype=np.int8, count=n)
+        self.scheduled_day = np.fromiter(
+            (ts_epoch(item["scheduled"]) // SECONDS_PER_DAY * SECONDS_PER_DAY if item["scheduled"] else no_scheduled for item in next_actions),
+            dtype=np.int64, count=n,
+        )
+        self.time = np.fromiter((item["time"] or float("inf") for item in next_actions), dtype=np.float64, count=n)
+        self.focus = np.fromiter((item["focus"] or float("inf") for item in next_actions), dtype=np.float64, count=n)
+        self.contexts = NameBitmasks(np, CONTEXTS, [context_mask(item) for item in next_actions])
+        self.people = NameBitmasks(np, PEOPLE, [people_mask(item) for item in next_actions])
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def mask(self, until_epoch, contexts, people, max_time, max_focus, ty):
+        """
+        Gets a boolean array of which next actions pass `filter.filter_next_actions` with the given
+        arguments (with `until` in the compact form from `utils.parse_epoch`).
+        """
+
+        mask = self.surface & (self.keyword != KEYWORD_CODES["PROJ"])
+        mask &= self.scheduled_day <= until_epoch
+        if ty == "tasks":
+            mask &= self.keyword == KEYWORD_CODES["TODO"]
+        elif ty == "problems":
+            mask &= self.keyword == KEYWORD_CODES["PROB"]
+
+        if contexts:
+            mask &= self.contexts.all_within(contexts)
+        if people:
+            mask &= self.people.all_within(people)
+        if max_time is not None:
+            mask &= self.time <= max_time
+        if max_focus is not None:
+            mask &= self.focus <= max_focus
+
+        return mask
+
+    def select(self, mask):
+        """
+        Gets the next actions picked out by the given boolean array, in their original order.
+        """
+
+        return [self.items[i] for i in self.np.flatnonzero(mask)]
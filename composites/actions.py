@@ -5,8 +5,11 @@ from rich import print as rich_print
 from ..dashboards.actions import display_actions
 from ..next_actions import filter_to_next_actions
 from ..filter import filter_next_actions
-from ..get import get_normalised_action_items
-from ..utils import validate_time, validate_focus
+from ..columnar import NextActionColumns
+from ..relevance import full_weights, parse_weight
+from ..get import get_normalised_action_items, DEFAULT_WORKERS
+from ..utils import validate_time, validate_focus, non_negative_int
+from ..instrument import span
 
 # By default, expand everything two weeks from the given date
 EXPAND_ADVANCE_DAYS = 14
@@ -23,6 +26,12 @@ def main_cli(args):
     ty_group = parser.add_mutually_exclusive_group()
     ty_group.add_argument("--problems", action="store_true", help="Only show problems.")
     ty_group.add_argument("--tasks", action="store_true", help="Only show tasks.")
+    parser.add_argument("--limit", type=non_negative_int, help="The most results to show.")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="The number of results to skip (e.g. to get the next page).")
+    parser.add_argument("--rank", action="store_true", help="Order by relevance rather than by date (see `relevance.py`).")
+    parser.add_argument("-w", "--weight", action="append", dest="weights", type=parse_weight, help="Set a relevance weight as `name=value` (implies `--rank`).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
+    parser.add_argument("--columnar", action="store_true", help="Filter with NumPy arrays (needs `numpy`).")
 
     args = parser.parse_args(args)
     date = datetime.strptime(args.date, "%Y-%m-%d") if args.date else datetime.now()
@@ -32,10 +41,14 @@ def main_cli(args):
     time = validate_time(args.time, "INPUT") if args.time else None
     focus = validate_focus(args.focus, "INPUT") if args.focus else None
     ty = "problems" if args.problems else "tasks" if args.tasks else "all"
+    weights = full_weights(args.weights or []) if args.rank or args.weights else None
 
-    action_items = get_normalised_action_items(until, ["body"])
+    action_items = get_normalised_action_items(until, ["body"], workers=args.workers)
     next_actions = filter_to_next_actions(action_items)
-    filtered = filter_next_actions(next_actions, until, args.contexts or [], args.people or [], time, focus, ty)
+    if args.columnar:
+        next_actions = NextActionColumns(next_actions)
+    filtered = filter_next_actions(next_actions, until, args.contexts or [], args.people or [], time, focus, ty, args.limit, args.offset, weights, date)
 
     display = display_actions(filtered, date.date())
-    rich_print(display)
+    with span("render"):
+        rich_print(display)
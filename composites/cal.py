@@ -6,9 +6,11 @@ from ..gcal import upload_to_gcal
 from ..ical import cal_to_ics
 from ..cal import filter_to_calendar
 from ..daily_notes import filter_to_daily_notes, daily_notes_to_cal
-from ..get import get_normalised_action_items
+from ..get import iter_normalised_action_items, DEFAULT_WORKERS
+from ..index import ItemIndex
 from ..dashboards.cal import display_calendar
 from ..utils import parse_range_str
+from ..instrument import span
 
 def main_cli(args):
     import argparse
@@ -21,11 +23,12 @@ def main_cli(args):
     output_group.add_argument("--text", default=True, action="store_true", help="Output to rich text.")
     output_group.add_argument("--ics", action="store_true", help="Output in iCalendar format.")
     output_group.add_argument("--gcal", action="store_true", help="Upload to Google Calendar.")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     range_start, range_end = parse_range_str(args.range)
 
-    action_items = get_normalised_action_items(range_end, ["body"])
+    action_items = ItemIndex(iter_normalised_action_items(range_end, ["body"], since=range_start, workers=args.workers))
     cal_items = filter_to_calendar(action_items, range_start, range_end)
     daily_notes = filter_to_daily_notes(action_items, range_start, range_end)
 
@@ -39,4 +42,5 @@ def main_cli(args):
         print("Calendar items uploaded successfully!")
     elif args.text: # Check last because default
         cal_display = display_calendar(cal_items, daily_notes)
-        rich_print(cal_display)
+        with span("render"):
+            rich_print(cal_display)
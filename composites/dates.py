@@ -4,13 +4,15 @@ from datetime import datetime
 from rich import print as rich_print
 from ..dates import filter_to_dates
 from ..dashboards.dates import display_dates
-from ..get import get_normalised_action_items
+from ..get import iter_normalised_action_items, DEFAULT_WORKERS
+from ..instrument import span
 
 def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Return a dashboard of important dates.", prog="dates")
     parser.add_argument("-d", "--date", type=str, help="The current date.")
     parser.add_argument("-u", "--until", type=str, help="The cutoff date to surface dates (same as the current date by default).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     date = datetime.strptime(args.date, "%Y-%m-%d") if args.date else datetime.now()
@@ -18,8 +20,9 @@ def main_cli(args):
     until = datetime.strptime(args.until, "%Y-%m-%d") if args.until else date
     until.replace(hour=23, minute=59, second=59)
 
-    action_items = get_normalised_action_items(until, ["body"])
+    action_items = iter_normalised_action_items(until, ["body"], workers=args.workers)
     dates = filter_to_dates(action_items, until)
 
     display = display_dates(dates, date.date())
-    rich_print(display)
+    with span("render"):
+        rich_print(display)
@@ -8,7 +8,8 @@ from ..daily_notes import filter_to_daily_notes
 from ..next_actions import filter_to_next_actions
 from ..upcoming import filter_to_upcoming
 from ..urgent import filter_to_urgent
-from ..get import get_normalised_action_items
+from ..get import iter_normalised_action_items, DEFAULT_WORKERS
+from ..index import ItemIndex
 
 DIGEST_SCRIPT_PROMPT = "You are a fun assistant in part of a pipeline to deliver a spoken daily digest to me, a founder. You will be given the raw Markdown of a daily digest file containing events, daily notes (i.e. things to remember), goals for the day, week, and general goals that are shown every day, and urgent actions that need to be done during the day (which might include problems/projects to be worked on). You should provide a script version of this that can be spoken fluently by a text-to-speech engine. Make sure to include all the detail of the daily digest and not change anything, just reformat it so it can be spoken fluently. You should open with a cheerful \"Good morning\" or similar, and close with a positive message to have a great day."
 TTS_VOICE = "nova"
@@ -18,6 +19,7 @@ def main_cli(args):
     parser = argparse.ArgumentParser(description="Return a digest for the given day.", prog="digest")
     parser.add_argument("date", type=str, help="The date.")
     parser.add_argument("-a", "--audio", type=str, help="Output the digest as an AI-generated audio file to the given path (requires `$OPENAI_API_KEY`).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     if args.date == "tmrw" or args.date == "tomorrow":
@@ -30,7 +32,7 @@ def main_cli(args):
     date.replace(hour=0, minute=0, second=0)
     until = date.replace(hour=23, minute=59, second=59)
 
-    action_items = get_normalised_action_items(until, ["body"])
+    action_items = ItemIndex(iter_normalised_action_items(until, ["body"], since=date, workers=args.workers))
     cal_items = filter_to_calendar(action_items, date, until)
     daily_notes = filter_to_daily_notes(action_items, date, until)
     next_actions = filter_to_next_actions(action_items)
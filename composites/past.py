@@ -10,17 +10,20 @@ from ..tickles import filter_to_tickles
 from ..waiting import filter_to_waiting
 from ..cal import filter_to_calendar
 from ..daily_notes import filter_to_daily_notes
-from ..get import get_normalised_action_items
+from ..get import iter_normalised_action_items, DEFAULT_WORKERS
+from ..index import ItemIndex
 from ..dates import filter_to_dates
 from ..upcoming import filter_to_upcoming
 from ..dashboards.cal import display_calendar
 from ..dashboards.actions import display_actions
 from ..dashboards.dates import display_dates
+from ..instrument import span
 
 def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Return a dashboard for everything prior to the given date.", prog="day")
     parser.add_argument("-d", "--date", type=str, help="The date.")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     if args.date == "tmrw" or args.date == "tomorrow":
@@ -32,7 +35,7 @@ def main_cli(args):
 
     until = date.replace(hour=23, minute=59, second=59)
 
-    action_items = get_normalised_action_items(until, ["body"])
+    action_items = ItemIndex(iter_normalised_action_items(until, ["body"], workers=args.workers))
     cal_items = filter_to_calendar(action_items, None, until)
     daily_notes = filter_to_daily_notes(action_items, None, until)
     dates = filter_to_dates(action_items, until)
@@ -50,4 +53,5 @@ def main_cli(args):
     view.add_row(cal_view, tickles_view)
     view.add_row(dates_view, waiting_view)
 
-    rich_print(view)
+    with span("render"):
+        rich_print(view)
@@ -3,20 +3,25 @@
 from datetime import datetime
 from ..actions_app import format_actions_for_app, produce_actions_app, format_actions_for_app
 from ..next_actions import filter_to_next_actions
-from ..get import get_normalised_action_items
+from ..get import get_normalised_action_items, DEFAULT_WORKERS
+from ..relevance import full_weights, parse_weight
 
 def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Prepares the actions app.", prog="prepapp")
     parser.add_argument("-u", "--until", type=str, help="The cutoff date to expand timestamps until.")
+    parser.add_argument("--rank", action="store_true", help="Order filtered actions by relevance rather than by date (see `relevance.py`).")
+    parser.add_argument("-w", "--weight", action="append", dest="weights", type=parse_weight, help="Set a relevance weight as `name=value` (implies `--rank`).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     until = datetime.strptime(args.until, "%Y-%m-%d") if args.until else datetime.now()
     until.replace(hour=23, minute=59, second=59)
+    weights = full_weights(args.weights or []) if args.rank or args.weights else None
 
-    action_items = get_normalised_action_items(until, ["body"])
+    action_items = get_normalised_action_items(until, ["body"], workers=args.workers)
     next_actions = filter_to_next_actions(action_items)
-    data = format_actions_for_app(next_actions)
+    data = format_actions_for_app(next_actions, weights)
     app_html = produce_actions_app(data)
 
     print(app_html)
@@ -5,7 +5,9 @@ from rich import print as rich_print
 from ..upcoming import filter_to_upcoming
 from ..dashboards.actions import display_actions
 from ..next_actions import filter_to_next_actions
-from ..get import get_normalised_action_items
+from ..get import get_normalised_action_items, DEFAULT_WORKERS
+from ..instrument import span
+from ..utils import non_negative_int
 
 # By default, expand everything a week from the given date
 EXPAND_ADVANCE_DAYS = 7
@@ -18,6 +20,9 @@ def main_cli(args):
     ty_group = parser.add_mutually_exclusive_group()
     ty_group.add_argument("--problems", action="store_true", help="Only show problems.")
     ty_group.add_argument("--tasks", action="store_true", help="Only show tasks.")
+    parser.add_argument("--limit", type=non_negative_int, help="The most results to show.")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="The number of results to skip (e.g. to get the next page).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     date = datetime.strptime(args.date, "%Y-%m-%d") if args.date else datetime.now()
@@ -25,9 +30,10 @@ def main_cli(args):
     until.replace(hour=23, minute=59, second=59)
     ty = "problems" if args.problems else "tasks" if args.tasks else "all"
 
-    action_items = get_normalised_action_items(until, ["body"])
+    action_items = get_normalised_action_items(until, ["body"], workers=args.workers)
     next_actions = filter_to_next_actions(action_items)
-    upcoming = filter_to_upcoming(next_actions, until, ty)
+    upcoming = filter_to_upcoming(next_actions, until, ty, args.limit, args.offset)
 
     display = display_actions(upcoming, date.date())
-    rich_print(display)
+    with span("render"):
+        rich_print(display)
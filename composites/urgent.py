@@ -7,7 +7,9 @@ from ..upcoming import filter_to_upcoming
 from ..urgent import filter_to_urgent
 from ..dashboards.actions import display_actions
 from ..next_actions import filter_to_next_actions
-from ..get import get_normalised_action_items
+from ..get import get_normalised_action_items, DEFAULT_WORKERS
+from ..instrument import span
+from ..utils import non_negative_int
 
 # By default, consider everything in the next week urgent
 PROXIMITY_DAYS = 7
@@ -20,6 +22,9 @@ def main_cli(args):
     ty_group = parser.add_mutually_exclusive_group()
     ty_group.add_argument("--problems", action="store_true", help="Only show problems.")
     ty_group.add_argument("--tasks", action="store_true", help="Only show tasks.")
+    parser.add_argument("--limit", type=non_negative_int, help="The most results to show.")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="The number of results to skip (e.g. to get the next page).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     current_date = datetime.strptime(args.date, "%Y-%m-%d") if args.date else datetime.now()
@@ -28,10 +33,11 @@ def main_cli(args):
     cutoff_date.replace(hour=23, minute=59, second=59)
     ty = "problems" if args.problems else "tasks" if args.tasks else "all"
 
-    action_items = get_normalised_action_items(cutoff_date, ["body"])
+    action_items = get_normalised_action_items(cutoff_date, ["body"], workers=args.workers)
     next_actions = filter_to_next_actions(action_items)
     upcoming = filter_to_upcoming(next_actions, cutoff_date, ty)
-    urgent = filter_to_urgent(upcoming, current_date, cutoff_date)
+    urgent = filter_to_urgent(upcoming, current_date, cutoff_date, args.limit, args.offset)
 
     display = display_actions(urgent, current_date.date())
-    rich_print(display)
+    with span("render"):
+        rich_print(display)
@@ -5,7 +5,9 @@ from rich import print as rich_print
 from ..waiting import filter_to_waiting
 from ..upcoming import filter_to_upcoming
 from ..dashboards.actions import display_actions
-from ..get import get_normalised_action_items
+from ..get import iter_normalised_action_items, DEFAULT_WORKERS
+from ..instrument import span
+from ..utils import non_negative_int
 
 # By default, expand everything two weeks from the given date
 EXPAND_ADVANCE_DAYS = 14
@@ -15,15 +17,19 @@ def main_cli(args):
     parser = argparse.ArgumentParser(description="Print a dashboard of waiting-for items.", prog="waiting")
     parser.add_argument("-d", "--date", type=str, help="The current date.")
     parser.add_argument("-u", "--until", type=str, help="The cutoff date to surface items up until.")
+    parser.add_argument("--limit", type=non_negative_int, help="The most results to show.")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="The number of results to skip (e.g. to get the next page).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     date = datetime.strptime(args.date, "%Y-%m-%d") if args.date else datetime.now()
     until = datetime.strptime(args.until, "%Y-%m-%d") if args.until else date + timedelta(days=EXPAND_ADVANCE_DAYS)
     until.replace(hour=23, minute=59, second=59)
 
-    action_items = get_normalised_action_items(until, ["body"])
+    action_items = iter_normalised_action_items(until, ["body"], workers=args.workers)
     waiting_items = filter_to_waiting(action_items)
-    upcoming = filter_to_upcoming(waiting_items, until, "all")
+    upcoming = filter_to_upcoming(waiting_items, until, "all", args.limit, args.offset)
 
     display = display_actions(upcoming, date.date())
-    rich_print(display)
+    with span("render"):
+        rich_print(display)
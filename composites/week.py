@@ -12,16 +12,19 @@ from ..cal import filter_to_calendar
 from ..daily_notes import filter_to_daily_notes
 from ..next_actions import filter_to_next_actions
 from ..upcoming import filter_to_upcoming
-from ..get import get_normalised_action_items
+from ..get import iter_normalised_action_items, DEFAULT_WORKERS
+from ..index import ItemIndex
 from ..dates import filter_to_dates
 from ..dashboards.cal import display_calendar
 from ..dashboards.actions import display_actions
 from ..dashboards.dates import display_dates
+from ..instrument import span
 
 def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Return a dashboard for the given week.", prog="week")
     parser.add_argument("-d", "--date", type=str, help="The date to start the week on.")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
 
     args = parser.parse_args(args)
     if args.date == "tmrw" or args.date == "tomorrow":
@@ -34,7 +37,7 @@ def main_cli(args):
     date.replace(hour=0, minute=0, second=0)
     until = (date + timedelta(days=7)).replace(hour=23, minute=59, second=59)
 
-    action_items = get_normalised_action_items(until, ["body"])
+    action_items = ItemIndex(iter_normalised_action_items(until, ["body"], since=date, workers=args.workers))
     dates = filter_to_dates(action_items, until)
     next_actions = filter_to_next_actions(action_items)
     upcoming = filter_to_upcoming(next_actions, until, "all")
@@ -63,4 +66,5 @@ def main_cli(args):
     view.add_row(dates_view, waiting_view)
     view.add_row(tickles_view, upcoming_view)
 
-    rich_print(view)
+    with span("render"):
+        rich_print(view)
@@ -2,8 +2,11 @@
 
 from datetime import datetime
 import uuid
-from .utils import load_json, dump_json, parse_range_str
+from .utils import load_json, dump_json, parse_range_str, datetime_to_epoch, ts_epoch
+from .index import ItemIndex, IntervalIndex, items_in_category
+from .instrument import traced
 
+@traced()
 def daily_notes_to_cal(daily_notes):
     """
     Converts the given daily notes to a calendar item for each date, allowing them to be placed in
@@ -38,31 +41,69 @@ def daily_notes_to_cal(daily_notes):
 
     return cal_items
 
+def daily_note_date(item):
+    """
+    Validates the timestamp on the given daily note, returning its date in the compact form from
+    `utils.parse_epoch`, or `None` if it doesn't have one.
+    """
+
+    # Daily notes should have a single-date timestamp, anything else is invalid
+    ts = item["metadata"]["timestamp"]
+    if ts and ts["end"]:
+        raise ValueError(f"Daily note {item['id']} has an end timestamp")
+    elif ts and ts["start"]["time"]:
+        raise ValueError(f"Daily note {item['id']} has a time")
+    elif ts:
+        return ts_epoch(ts["start"])
+    else:
+        return None
+
+def daily_notes_intervals(index):
+    """
+    Builds an interval index over the dates of all the daily notes in the given `ItemIndex`.
+    """
+
+    intervals = []
+    for item in index.by_category["daily_notes"]:
+        date = daily_note_date(item)
+        if date is not None:
+            intervals.append((date, date, item))
+    return IntervalIndex(intervals)
+
+@traced()
 def filter_to_daily_notes(action_items, range_start, range_end):
     """
     Filters the given action items to daily notes in the given datetime range. If you want to
     filter between days, make sure `range_end` has a time ending at 23:59.
+
+    This takes a single pass over the action items, so any iterable of them will do. If they're
+    given as an `ItemIndex`, an interval index over the notes' dates will be built on the first
+    query and reused for any later ones.
     """
 
+    start_epoch = datetime_to_epoch(range_start) if range_start else None
+    end_epoch = datetime_to_epoch(range_end)
+
+    if isinstance(action_items, ItemIndex):
+        in_range = action_items.cached("daily_notes", lambda: daily_notes_intervals(action_items)).overlapping(start_epoch, end_epoch)
+    else:
+        in_range = []
+        for item in items_in_category(action_items, "daily_notes"):
+            date = daily_note_date(item)
+            if date is None:
+                continue
+            if (start_epoch is not None and start_epoch <= date <= end_epoch) or (start_epoch is None and date <= end_epoch):
+                in_range.append(item)
+
     filtered = []
-    for item in action_items:
-        if "daily_notes" in item["parent_tags"]:
-            # Daily notes should have a single-date timestamp, anything else is invalid
-            ts = item["metadata"]["timestamp"]
-            if ts and ts["end"]:
-                raise ValueError(f"Daily note {item['id']} has an end timestamp")
-            elif ts and ts["start"]["time"]:
-                raise ValueError(f"Daily note {item['id']} has a time")
-            elif ts:
-                date = datetime.strptime(ts["start"]["date"], "%Y-%m-%d")
-                if (range_start and range_start <= date <= range_end) or (not range_start and date <= range_end):
-                    note_item = {
-                        "id": item["id"],
-                        "title": item["title"][-1],
-                        "body": (item["body"] or "").strip(),
-                        "date": ts["start"]["date"],
-                    }
-                    filtered.append(note_item)
+    for item in in_range:
+        note_item = {
+            "id": item["id"],
+            "title": item["title"][-1],
+            "body": (item["body"] or "").strip(),
+            "date": item["metadata"]["timestamp"]["start"]["date"],
+        }
+        filtered.append(note_item)
 
     # Sort by date
     filtered.sort(key=lambda x: (x["date"], x["title"]))
@@ -73,9 +114,10 @@ def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Extract daily notes from action items.", prog="daily_notes")
     parser.add_argument("range", type=str, help="The range of dates to return daily notes for (`start:end`).")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line (this buffers everything before writing, as the results are sorted).")
 
     args = parser.parse_args(args)
     range_start, range_end = parse_range_str(args.range)
 
-    action_items = load_json()
-    dump_json(filter_to_daily_notes(action_items, range_start, range_end))
+    action_items = load_json(args.ndjson)
+    dump_json(filter_to_daily_notes(action_items, range_start, range_end), args.ndjson)
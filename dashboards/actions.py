@@ -8,7 +8,9 @@ from rich.text import Text
 from rich import print as rich_print
 from .utils import LeftJustifiedHeading, format_date, format_minutes
 from ..utils import DEFAULT_PRIORITY, load_json, format_priority
+from ..instrument import traced
 
+@traced()
 @group()
 def display_actions(actions, current_date):
     """
@@ -72,10 +74,11 @@ def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Display next actions.", prog="actions")
     parser.add_argument("-d", "--date", type=str, required=False, help="The current date for relative date formatting.")
+    parser.add_argument("--ndjson", action="store_true", help="Read one JSON object per line.")
 
     args = parser.parse_args(args)
-    current_date = datetime.strptime(args.date, "%Y-%m-%d") if args.date else datetime.now().date()
+    current_date = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else datetime.now().date()
 
-    actions = load_json()
+    actions = list(load_json(args.ndjson))
     actions_display = display_actions(actions, current_date)
     rich_print(actions_display)
@@ -12,6 +12,7 @@ from rich.text import Text
 from rich.markdown import Markdown
 from rich.padding import Padding
 from .utils import LeftJustifiedHeading
+from ..instrument import traced, count
 
 def split_timestamp(start, end):
     """
@@ -22,6 +23,7 @@ def split_timestamp(start, end):
 
     start_date = datetime.strptime(start["date"], "%Y-%m-%d")
     end_date = datetime.strptime(end["date"], "%Y-%m-%d") if end else start_date
+    count("strptime", 2 if end else 1)
 
     # For every day between the start and end, create a timestamp
     timestamps = []
@@ -42,6 +44,7 @@ def split_timestamp(start, end):
 
     return timestamps
 
+@traced()
 @group()
 def display_calendar(cal_items, daily_notes):
     """
@@ -58,12 +61,14 @@ def display_calendar(cal_items, daily_notes):
 
             # Make a clone for this date and set the timestamps to be actual times
             item_clone = deepcopy(item)
+            count("deepcopy")
             item_clone["start"] = ts["start"]
             item_clone["end"] = ts["end"]
             dates[date]["calendar"].append(item_clone)
 
     for note in daily_notes:
         date = datetime.strptime(note["date"], "%Y-%m-%d")
+        count("strptime")
         if date not in dates:
             dates[date] = { "calendar": [], "daily_notes": [] }
 
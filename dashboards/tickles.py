@@ -8,7 +8,9 @@ from rich.text import Text
 from rich import print as rich_print
 from .utils import LeftJustifiedHeading, format_date
 from ..utils import load_json
+from ..instrument import traced
 
+@traced()
 @group()
 def display_tickles(tickles, current_date):
     """
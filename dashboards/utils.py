@@ -1,6 +1,6 @@
 from rich.text import Text
 from rich.markdown import TextElement
-from datetime import datetime
+from datetime import date
 
 def format_date(date_str, time_str, current_date, connective="on"):
     """
@@ -9,9 +9,9 @@ def format_date(date_str, time_str, current_date, connective="on"):
     This connective should be chosen based on whatever comes before.
     """
 
-    date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    date_obj = date.fromisoformat(date_str)
 
-    days_difference = (date - current_date).days
+    days_difference = (date_obj - current_date).days
     weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
     if days_difference == 0:
@@ -21,13 +21,13 @@ def format_date(date_str, time_str, current_date, connective="on"):
     elif days_difference == -1:
         day_str = "yesterday"
     elif 2 <= days_difference < 7:
-        day_str = f"{connective} {weekdays[date.weekday()]}"
+        day_str = f"{connective} {weekdays[date_obj.weekday()]}"
     elif -7 < days_difference < 0:
-        day_str = f"last {weekdays[date.weekday()]}"
+        day_str = f"last {weekdays[date_obj.weekday()]}"
     elif 0 < days_difference < 14:
-        day_str = f"next {weekdays[date.weekday()]}"
+        day_str = f"next {weekdays[date_obj.weekday()]}"
     else:
-        day_str = f"{connective} {weekdays[date.weekday()]} {date.strftime('%d/%m/%Y')}"
+        day_str = f"{connective} {weekdays[date_obj.weekday()]} {date_obj.strftime('%d/%m/%Y')}"
 
     if time_str:
         day_str += f" at {time_str}"
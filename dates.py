@@ -1,10 +1,12 @@
 # Filters the given action items down to people-related dates and displays them up until
 # a given cutoff date.
 
-import requests
 import urllib.parse
-from datetime import datetime, timedelta
-from .utils import STARLING_API, load_json, dump_json
+from datetime import datetime
+from .utils import load_json, dump_json, datetime_to_epoch, ts_epoch, SECONDS_PER_DAY
+from .index import items_in_category
+from .starling import starling_get
+from .instrument import traced
 
 def get_person_name(filename):
     """
@@ -12,10 +14,10 @@ def get_person_name(filename):
     """
 
     filename = urllib.parse.quote(filename, safe=[])
-    response = requests.get(f"{STARLING_API}/root-id/{filename}")
+    response = starling_get(f"root-id/{filename}")
     if response.status_code == 200:
         root_id = response.json()
-        response = requests.get(f"{STARLING_API}/node/{root_id}", json={"conn_format": "markdown"})
+        response = starling_get(f"node/{root_id}", json={"conn_format": "markdown"})
         if response.status_code == 200:
             data = response.json()
             name = data["title"][-1].removeprefix("(Person) ")
@@ -42,39 +44,43 @@ def parse_advance(advance_str, id):
             raise ValueError(f"Invalid advance string in date {id}: {advance_str}")
     return advance
 
+@traced()
 def filter_to_dates(action_items, until):
     """
     Filters the given action items to important dates about people. This will return all those
     dates whose advance warning periods fall before the given `until` date.
+
+    The action items are only iterated over once, so they can be streamed in, or they can be an
+    `ItemIndex`.
     """
 
+    until = datetime_to_epoch(until)
+
     filtered = []
-    for item in action_items:
-        if "person_dates" in item["parent_tags"]:
-            # Person-related dates should have a single-date timestamp, anything else is invalid
-            ts = item["metadata"]["timestamp"]
-            if ts and ts["end"]:
-                raise ValueError(f"Person-related date {item['id']} has an end timestamp")
-            elif ts and ts["start"]["time"]:
-                raise ValueError(f"Person-related date {item['id']} has a timestamp with a time")
-            elif ts:
-                date = datetime.strptime(ts["start"]["date"], "%Y-%m-%d")
-                # There should also be a property that tells us how long in advance we should be
-                # notified of this date
-                advance = parse_advance(item["metadata"]["properties"].get("ADVANCE"), item["id"])
-                notify_date = date + timedelta(days=-advance)
+    for item in items_in_category(action_items, "person_dates"):
+        # Person-related dates should have a single-date timestamp, anything else is invalid
+        ts = item["metadata"]["timestamp"]
+        if ts and ts["end"]:
+            raise ValueError(f"Person-related date {item['id']} has an end timestamp")
+        elif ts and ts["start"]["time"]:
+            raise ValueError(f"Person-related date {item['id']} has a timestamp with a time")
+        elif ts:
+            # There should also be a property that tells us how long in advance we should be
+            # notified of this date
+            advance = parse_advance(item["metadata"]["properties"].get("ADVANCE"), item["id"])
+            notify_date = ts_epoch(ts["start"]) - advance * SECONDS_PER_DAY
 
-                if notify_date <= until:
-                    tickle_item = {
-                        "id": item["id"],
-                        "title": item["title"][-1],
-                        "body": (item["body"] or "").strip(),
-                        "date": ts["start"]["date"],
-                        # We could just use the first element of the title, but that wouldn't get us
-                        # their ID as well
-                        "person": get_person_name(item["path"]),
-                    }
-                    filtered.append(tickle_item)
+            if notify_date <= until:
+                tickle_item = {
+                    "id": item["id"],
+                    "title": item["title"][-1],
+                    "body": (item["body"] or "").strip(),
+                    "date": ts["start"]["date"],
+                    # We could just use the first element of the title, but that wouldn't get us
+                    # their ID as well
+                    "person": get_person_name(item["path"]),
+                }
+                filtered.append(tickle_item)
 
     # Sort by date
     filtered.sort(key=lambda x: (x["date"], x["title"], x["person"][0]))
@@ -85,9 +91,10 @@ def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Extract people-related dates from action items, up until a given date.", prog="dates")
     parser.add_argument("date", type=str, help="The date to extract people-related dates up until.")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line (this buffers everything before writing, as the results are sorted).")
 
     args = parser.parse_args(args)
     until = datetime.strptime(args.date, "%Y-%m-%d")
 
-    action_items = load_json()
-    dump_json(filter_to_dates(action_items, until))
+    action_items = load_json(args.ndjson)
+    dump_json(filter_to_dates(action_items, until), args.ndjson)
@@ -2,11 +2,15 @@
 # list of available contexts, a maximum focus level, and/or a maximum amount of available time.
 
 from datetime import datetime
-from .utils import dump_json, load_json, validate_time, validate_focus, should_surface_item
+from .utils import dump_json, load_json, validate_time, validate_focus, should_surface_item, surfacing_map, datetime_to_epoch, ts_epoch, SECONDS_PER_DAY, non_negative_int
 from .sort import sort_actions
+from .relevance import full_weights, parse_weight, rank_actions
+from .columnar import NextActionColumns
+from .interning import CONTEXTS, PEOPLE, all_available, context_mask, people_mask
+from .instrument import traced
 
-def filter_next_actions(next_actions, until, contexts, people, max_time, max_focus, ty):
-    # TODO: sorting by relevance, somehow...
+@traced()
+def filter_next_actions(next_actions, until, contexts, people, max_time, max_focus, ty, limit=None, offset=0, weights=None, date=None):
     """
     Filters the given next actions by context, time required, focus required, and people needed.
     This is very different from `filter_to_next_actions`, which turns action items into next
@@ -25,12 +29,36 @@ def filter_next_actions(next_actions, until, contexts, people, max_time, max_foc
 
     The given maximum focus should be a number from 0-3, and tasks requiring more focus than this
     will be filtered out.
+
+    The next actions can also be given as `NextActionColumns`, in which case the same filters are
+    applied to all of them at once.
+
+    If relevance weights are given, the results will be ordered by relevance (see `relevance.py`)
+    as of the given current date (by default, now), otherwise they'll be sorted by date. If a limit
+    and/or offset is given, only that page of the results will be returned.
+    """
+
+    if isinstance(next_actions, NextActionColumns):
+        mask = next_actions.mask(datetime_to_epoch(until), contexts, people, max_time, max_focus, ty)
+        filtered = next_actions.select(mask)
+    else:
+        filtered = filter_action_list(next_actions, until, contexts, people, max_time, max_focus, ty)
+
+    if weights is not None:
+        return rank_actions(filtered, date or datetime.now(), contexts, people, max_time, max_focus, weights, limit, offset)
+    return sort_actions(filtered, limit, offset)
+
+def filter_action_list(next_actions, until, contexts, people, max_time, max_focus, ty):
+    """
+    Filters the given list of next actions for `filter_next_actions`, one by one, leaving them in
+    their original order.
     """
 
-    # We want quick indexing on these
-    contexts = set(contexts)
-    people = set(people)
-    next_actions_map = {item["id"]: item for item in next_actions}
+    # We only need to check items' bitmasks against these (if we're filtering by them at all)
+    available_contexts = CONTEXTS.mask(contexts) if contexts else None
+    available_people = PEOPLE.mask(people) if people else None
+    next_actions_map = surfacing_map(next_actions)
+    until_epoch = datetime_to_epoch(until)
 
     filtered = []
     for item in next_actions:
@@ -44,7 +72,7 @@ def filter_next_actions(next_actions, until, contexts, people, max_time, max_foc
         # sections
         if item["keyword"] == "PROJ": continue
         # Skip anything scheduled after the current date (shouldn't be started yet)
-        if item["scheduled"] and datetime.strptime(item["scheduled"]["date"], "%Y-%m-%d") > until: continue
+        if item["scheduled"] and ts_epoch(item["scheduled"]) // SECONDS_PER_DAY * SECONDS_PER_DAY > until_epoch: continue
 
         if ty == "tasks" and item["keyword"] != "TODO": continue
         if ty == "problems" and item["keyword"] != "PROB": continue
@@ -52,28 +80,8 @@ def filter_next_actions(next_actions, until, contexts, people, max_time, max_foc
         # If we're filtering by context, this item's list of contexts is an AND list, so make sure
         # all of them are available in `contexts`, and exclude items that don't have any
         # of those contexts
-        if contexts:
-            we_have_all = True
-            item_has_one = False
-            for ctx in item["context"]:
-                if ctx not in contexts:
-                    we_have_all = False
-                    break
-                else:
-                    item_has_one = True
-
-            if not we_have_all or not item_has_one: continue
-        if people:
-            we_have_all = True
-            item_has_one = False
-            for person, _ in item["people"]:
-                if person not in people:
-                    we_have_all = False
-                    break
-                else:
-                    item_has_one = True
-
-            if not we_have_all or not item_has_one: continue
+        if available_contexts is not None and not all_available(context_mask(item), available_contexts): continue
+        if available_people is not None and not all_available(people_mask(item), available_people): continue
         # For time and focus, we have a maximum, allow anything up to that. We fall back to
         # infinity for problems, which shouldn't show up in these searches
         if max_time is not None:
@@ -83,12 +91,13 @@ def filter_next_actions(next_actions, until, contexts, people, max_time, max_foc
 
         filtered.append(item)
 
-    return sort_actions(filtered)
+    return filtered
 
 def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Filter next actions.", prog = "filter")
     parser.add_argument("-u", "--until", type=str, required=True, help="The date to show scheduled actions until.")
+    parser.add_argument("-d", "--date", type=str, help="The current date, which deadlines are ranked against with `--rank` (default: today).")
     parser.add_argument("-c", "--context", action="append", dest="contexts", help="Contexts to filter by (list of ORs).")
     parser.add_argument("-p", "--people", action="append", dest="people", help="People to filter by (list of ORs).")
     parser.add_argument("-f", "--focus", type=str, help="Maximum focus to filter by.")
@@ -96,12 +105,23 @@ def main_cli(args):
     ty_group = parser.add_mutually_exclusive_group()
     ty_group.add_argument("--problems", action="store_true", help="Only show problems.")
     ty_group.add_argument("--tasks", action="store_true", help="Only show tasks.")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line (this buffers everything before writing, as the results are sorted).")
+    parser.add_argument("--limit", type=non_negative_int, help="The most results to show.")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="The number of results to skip (e.g. to get the next page).")
+    parser.add_argument("--rank", action="store_true", help="Order by relevance rather than by date (see `relevance.py`).")
+    parser.add_argument("-w", "--weight", action="append", dest="weights", type=parse_weight, help="Set a relevance weight as `name=value` (implies `--rank`).")
+    parser.add_argument("--columnar", action="store_true", help="Filter with NumPy arrays (needs `numpy`).")
 
     args = parser.parse_args(args)
     until = datetime.strptime(args.until, "%Y-%m-%d")
+    date = datetime.strptime(args.date, "%Y-%m-%d") if args.date else None
     time = validate_time(args.time, "INPUT") if args.time else None
     focus = validate_focus(args.focus, "INPUT") if args.focus else None
     ty = "problems" if args.problems else "tasks" if args.tasks else "all"
+    weights = full_weights(args.weights or []) if args.rank or args.weights else None
 
-    next_actions = load_json()
-    dump_json(filter_next_actions(next_actions, until, args.contexts or [], args.people or [], time, focus, ty))
+    # Surfacing depends on parents, and we sort, so this has to buffer everything
+    next_actions = list(load_json(args.ndjson))
+    if args.columnar:
+        next_actions = NextActionColumns(next_actions)
+    dump_json(filter_next_actions(next_actions, until, args.contexts or [], args.people or [], time, focus, ty, args.limit, args.offset, weights, date), args.ndjson)
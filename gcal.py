@@ -10,9 +10,25 @@ import jwt
 from datetime import datetime, timedelta, UTC
 from .daily_notes import daily_notes_to_cal
 from .utils import timestamp_to_datetime, load_json
+from .instrument import traced
+from .cassette import mount
 
 GOOGLE_SCOPE = "https://www.googleapis.com/auth/calendar"
 
+_session = None
+
+def get_session():
+    """
+    Gets the session every request to Google goes through, which can be recorded and replayed (see
+    `cassette.py`).
+    """
+
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        mount(_session)
+    return _session
+
 def get_access_token(service_account_info, scope, impersonate=None):
     """
     Uses the given service account details to get an ephemeral access token for the
@@ -41,7 +57,7 @@ def get_access_token(service_account_info, scope, impersonate=None):
         headers=header
     )
 
-    response = requests.post(service_account_info['token_uri'], data={
+    response = get_session().post(service_account_info['token_uri'], data={
         'grant_type': 'urn:ietf:params:oauth:grant-type:jwt-bearer',
         'assertion': jwt_token
     })
@@ -84,7 +100,7 @@ def push_to_google_calendar(entries, token, calendar):
             "end": end
         }
 
-        response = requests.post(
+        response = get_session().post(
             f"https://www.googleapis.com/calendar/v3/calendars/{calendar}/events",
             headers=headers,
             json=event
@@ -92,6 +108,7 @@ def push_to_google_calendar(entries, token, calendar):
         if response.status_code != 200:
             print(f'Failed to push event: {response.text}')
 
+@traced()
 def upload_to_gcal(cal_items, email="env:GOOGLE_EMAIL", calendar="primary", service_account_path="env:GOOGLE_CALENDAR_CREDS"):
     """
     Uploads the given calendar items to Google Calendar
@@ -118,10 +135,16 @@ def upload_to_gcal(cal_items, email="env:GOOGLE_EMAIL", calendar="primary", serv
     token = get_access_token(service_account_info, GOOGLE_SCOPE, impersonate=email)
     push_to_google_calendar(cal_items, token, calendar)
 
-def main_cli(_):
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Upload calendar items to Google Calendar.", prog="gcal")
+    parser.add_argument("--ndjson", action="store_true", help="Read one calendar item per line (the hybrid form with daily notes needs plain JSON).")
+
+    args = parser.parse_args(args)
+
     # We'll either have an array of calendar itemgs, or a hybrid stream with `calendar` and
     # `daily_notes` keys
-    json_data = load_json()
+    json_data = list(load_json(True)) if args.ndjson else load_json()
     if isinstance(json_data, dict):
         cal_items = json_data["calendar"]
         cal_items.extend(daily_notes_to_cal(json_data["daily_notes"]))
@@ -2,19 +2,69 @@
 # scripts. This also expands any repeating timestamps into multiple entries (which will have the
 # same ID), allowing later scripts to ignore that complexity.
 
-import requests
-import copy
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from .utils import dump_json, timestamp_to_datetime, STARLING_API
+from .utils import dump_json, datetime_to_epoch, parse_epoch, timestamp_to_epochs
+from .starling import starling_get
+from .cache import load_snapshot, save_snapshot, snapshot_is_fresh, conditional_headers
+from .repeater import local_repeater, nth_timestamp, repeats_to_reach
+from .instrument import count, span, timed_iter, traced
+
+# The default number of threads to expand repeats across. Almost every repeat is computed locally,
+# which threads only slow down, so this is opt-in with `-j` for vaults with many repeaters only the
+# server can compute
+DEFAULT_WORKERS = 1
+# How many items each thread can have in flight ahead of the caller
+WINDOW_PER_WORKER = 2
+# How many sets of normalised items the daemon memoises at once (each command asks for its own
+# range, so this stops them piling up)
+WARM_MEMO_SIZE = 8
+
+# When running as a daemon (see `serve.py`), this holds the raw action items for each set of request
+# options under `items`, and memoised normalised items under `normalised`, so commands can skip
+# fetching and expanding entirely. The daemon refreshes both in the background. Nothing here ever
+# mutates raw items, so they can be safely shared between commands.
+WARM = None
 
 def get_action_items(opts):
     """
-    Gets all action items from the Starling server, sending the provided extra arguments.
+    Gets all action items from the Starling server, sending the provided extra arguments. This will
+    use the daemon's warm copy if we're running in one, and otherwise the on-disk snapshot cache if
+    the server says it's still valid (or if it's within its TTL).
     """
 
-    response = requests.get(f"{STARLING_API}/index/action_items/nodes", json={"conn_format": "markdown", "metadata": True, "children": True, **(opts or {})})
-    if response.status_code == 200:
-        return response.json()
+    opts = {"conn_format": "markdown", "metadata": True, "children": True, **(opts or {})}
+    if WARM is not None:
+        # The daemon replaces these maps wholesale when it refreshes, so hold onto the one we check
+        warm_items = WARM["items"]
+        key = json.dumps(opts, sort_keys=True)
+        if key not in warm_items:
+            warm_items[key] = (opts, fetch_action_items(opts))
+        return warm_items[key][1]
+
+    return fetch_action_items(opts)
+
+def fetch_action_items(opts):
+    """
+    Fetches all action items from the Starling server with the given full request options, going
+    through the on-disk snapshot cache.
+    """
+
+    snapshot = load_snapshot(opts)
+    if snapshot and snapshot_is_fresh(snapshot):
+        count("snapshot_fresh")
+        return snapshot["data"]
+
+    response = starling_get("index/action_items/nodes", json=opts, headers=conditional_headers(snapshot))
+    if response.status_code == 304 and snapshot:
+        count("snapshot_revalidated")
+        return snapshot["data"]
+    elif response.status_code == 200:
+        data = response.json()
+        save_snapshot(opts, data, response.headers)
+        return data
     else:
         raise Exception(f"Failed to get action items: {response.text}")
 
@@ -24,7 +74,7 @@ def get_next_timestamp(timestamp):
     """
 
     # Send the timestamp as a JSON body (adding back `active`)
-    response = requests.get(f"{STARLING_API}/utils/next-timestamp", json={**timestamp, "active": True})
+    response = starling_get("utils/next-timestamp", json={**timestamp, "active": True})
     if response.status_code == 200:
         return response.json()
     else:
@@ -43,8 +93,9 @@ def has_ts_before(item, until):
     is used to check when we should stop computing the repeats of an item.
     """
 
+    until = datetime_to_epoch(until)
     if item["metadata"]["timestamp"]:
-        ts_start, _ = timestamp_to_datetime(item["metadata"]["timestamp"])
+        ts_start, _ = timestamp_to_epochs(item["metadata"]["timestamp"])
         if ts_start <= until:
             return True
 
@@ -52,54 +103,127 @@ def has_ts_before(item, until):
     deadline = item["metadata"]["deadline"]
     closed = item["metadata"]["closed"]
 
-    if scheduled and timestamp_to_datetime(scheduled)[0] <= until:
+    if scheduled and timestamp_to_epochs(scheduled)[0] <= until:
         return True
-    if deadline and timestamp_to_datetime(deadline)[0] <= until:
+    if deadline and timestamp_to_epochs(deadline)[0] <= until:
         return True
-    if closed and timestamp_to_datetime(closed)[0] <= until:
+    if closed and timestamp_to_epochs(closed)[0] <= until:
         return True
 
     return False
 
-def repeat_once(item):
+def has_ts_since(item, since):
+    """
+    Returns whether or not any timestamp on the given item ends at or after the given date. This is
+    the counterpart of `has_ts_before` for repeats skipped before `since`.
     """
-    Produces the next repeat of the given entry, if there is one, by attempting to repeat
-    all associated timestamps on their individual cadences.
+
+    since = datetime_to_epoch(since)
+    for key in ("timestamp", "scheduled", "deadline", "closed"):
+        ts = item["metadata"][key]
+        if ts:
+            ts_start, ts_end = timestamp_to_epochs(ts)
+            if (ts_end if ts_end is not None else ts_start) >= since:
+                return True
+
+    return False
+
+def make_occurrence(item, **timestamps):
+    """
+    Produces an occurrence of the given item with its own values for the given timestamps (any of
+    `timestamp`, `scheduled`, `deadline`, and `closed`). This is a thin overlay: only the top level
+    and the metadata are copied, and everything else (body, properties, etc.) is shared with the base
+    item, so nothing but those timestamps should be mutated on an occurrence. The list of all main
+    timestamps is dropped, as each occurrence has only one.
+    """
+
+    metadata = {key: value for key, value in item["metadata"].items() if key != "timestamps"}
+    metadata.update(timestamps)
+    return {**item, "metadata": metadata}
+
+def finalise_timestamp(ts):
+    """
+    Returns a copy of the given timestamp without its repeater, which is only needed while
+    expanding, and with the compact integer form of each side attached as `epoch` (see
+    `utils.parse_epoch`), so later scripts never need to parse it again. This copies rather than
+    mutating because timestamps can be shared between occurrences.
+    """
+
+    if not ts:
+        return ts
+
+    finalised = {key: value for key, value in ts.items() if key != "repeater"}
+    finalised["start"] = {**ts["start"], "epoch": parse_epoch(ts["start"]["date"], ts["start"]["time"])}
+    if ts["end"]:
+        finalised["end"] = {**ts["end"], "epoch": parse_epoch(ts["end"]["date"], ts["end"]["time"])}
+    return finalised
+
+def repeating_timestamps(item):
+    """
+    Gets the timestamps on the given entry that repeat, by their keys in its metadata.
+    """
+
+    repeating = {}
+    for key in ("timestamp", "scheduled", "deadline", "closed"):
+        ts = item["metadata"][key]
+        if ts and ts["repeater"] is not None:
+            repeating[key] = ts
+    return repeating
+
+def nth_repeat(item, n, previous, now=None):
+    """
+    Produces the `n`th repeat of the given entry, if there is one, by repeating all associated
+    timestamps on their individual cadences. Each timestamp is computed straight from the entry's
+    own (see `repeater.nth_timestamp`), so months and years never drift from clamping, except those
+    only the server can repeat, which are repeated from the given previous repeat. Repeaters that
+    depend on the current date are repeated as of the given current datetime (by default, now).
 
     Like `repeat_until`, this should be passed the modified, single-main-timestamp, version
     of the item, and only for active main timestamps.
     """
 
-    # Copy the whole entry and remove any timestamps, we'll add them back if they repeat
-    is_next_repeat = False
-    next_repeat = copy.deepcopy(item)
-    next_repeat["metadata"]["timestamp"] = None
-    next_repeat["metadata"]["scheduled"] = None
-    next_repeat["metadata"]["deadline"] = None
-    next_repeat["metadata"]["closed"] = None
+    repeating = repeating_timestamps(item)
+    if not repeating:
+        return None
 
-    # If there's a repeating main timestamp, preserve that
-    if item["metadata"]["timestamp"] and item["metadata"]["timestamp"]["repeater"] is not None:
-        is_next_repeat = True
-        next_repeat["metadata"]["timestamp"] = get_next_timestamp(item["metadata"]["timestamp"])
+    # Start with no timestamps, we'll add them back if they repeat
+    next_timestamps = {"timestamp": None, "scheduled": None, "deadline": None, "closed": None}
+    for key, ts in repeating.items():
+        next_ts = nth_timestamp(ts, n, now)
+        if next_ts is None:
+            count("repeats_from_server")
+            next_ts = get_next_timestamp(previous["metadata"][key])
+        else:
+            count("repeats_local")
+        next_timestamps[key] = next_ts
 
-    scheduled = item["metadata"]["scheduled"]
-    deadline = item["metadata"]["deadline"]
-    closed = item["metadata"]["closed"]
+    return make_occurrence(item, **next_timestamps)
+
+def repeats_locally(item):
+    """
+    Returns whether or not every repeating timestamp on the given entry can be repeated locally,
+    which is when `repeats_to_skip` can skip repeats before a date.
+    """
+
+    return all(local_repeater(ts) is not None for ts in repeating_timestamps(item).values())
 
-    if scheduled and scheduled["repeater"] is not None:
-        is_next_repeat = True
-        next_repeat["metadata"]["scheduled"] = get_next_timestamp(scheduled)
-    if deadline and deadline["repeater"] is not None:
-        is_next_repeat = True
-        next_repeat["metadata"]["deadline"] = get_next_timestamp(deadline)
-    if closed and closed["repeater"] is not None:
-        is_next_repeat = True
-        next_repeat["metadata"]["closed"] = get_next_timestamp(closed)
+def repeats_to_skip(item, since, now=None):
+    """
+    Works out the first repeat of the given entry (not counting the entry itself) that has a
+    timestamp ending at or after the given datetime, so expansion can jump straight there rather
+    than producing every repeat in between. If that can't be worked out locally, this is just the
+    next repeat.
+    """
 
-    return next_repeat if is_next_repeat else None
+    # All the timestamps have to be repeated the same number of times to stay in step, so the
+    # first repeat in the window is whichever one gets any timestamp there first
+    counts = [repeats_to_reach(ts, since, now) for ts in repeating_timestamps(item).values()]
+    if not counts or None in counts:
+        # We can't skip ahead with a repeater only the server understands, so just step through
+        return 1
+    return max(1, min(counts))
 
-def repeat_until(item, until):
+def repeat_until(item, until, since=None, now=None):
     """
     Tries to repeat the given action item until the given date. This will return the repeaterless
     action items, as many as could be repeated in the given timeframe. If there are no repeating
@@ -109,36 +233,44 @@ def repeat_until(item, until):
     timestamp (i.e. not planning, like deadline/scheduled). Items with multiple timestamps should
     thus have this function called multiple times on them so later scripts don't have to worry
     about items with multiple timestamps. This also simplifies repeating cadences.
+
+    If `since` is given, repeats which fall entirely before it will be skipped. The original item
+    is always kept though, so anything overdue will still be surfaced.
+
+    Repeaters that depend on the current date are repeated as of the given current datetime (by
+    default, now), which is fixed for every repeat of the item.
     """
     repeats = []
+    now = now or datetime.now()
 
     # While we loop, we need to keep repeater information for the next repeat
+    n = 0
     while True:
-        next_repeat = repeat_once(repeats[-1]) if len(repeats) > 0 else item
+        next_repeat = item if n == 0 else nth_repeat(item, n, repeats[-1], now)
         if next_repeat is None or not has_ts_before(next_repeat, until):
             break
         repeats.append(next_repeat)
+        n = repeats_to_skip(item, since, now) if n == 0 and since is not None else n + 1
 
     # Make sure we take account of items that don't repeat
     if len(repeats) == 0:
         repeats.append(item)
 
-    # But now we don't need repeater info anymore, so remove it
+    # But now we don't need repeater info anymore, so remove it, and pre-parse the timestamps (each
+    # occurrence has its own metadata, so we can replace these safely)
     for repeat in repeats:
-        if repeat["metadata"]["timestamp"]:
-            del repeat["metadata"]["timestamp"]["repeater"]
-        if repeat["metadata"]["scheduled"]:
-            del repeat["metadata"]["scheduled"]["repeater"]
-        if repeat["metadata"]["deadline"]:
-            del repeat["metadata"]["deadline"]["repeater"]
-        if repeat["metadata"]["closed"]:
-            del repeat["metadata"]["closed"]["repeater"]
+        metadata = repeat["metadata"]
+        metadata["timestamp"] = finalise_timestamp(metadata["timestamp"])
+        metadata["scheduled"] = finalise_timestamp(metadata["scheduled"])
+        metadata["deadline"] = finalise_timestamp(metadata["deadline"])
+        metadata["closed"] = finalise_timestamp(metadata["closed"])
 
     return repeats
 
 def prune_inactive_ts(ts):
     """
-    Removes the `active` key from active timestamps or returns `None` if they're inactive.
+    Returns a copy of the given timestamp without its `active` key if it's active, or `None` if
+    it's inactive.
     """
 
     if not ts:
@@ -146,23 +278,17 @@ def prune_inactive_ts(ts):
     elif not ts["active"]:
         return None
     else:
-        del ts["active"]
-        return ts
+        return {key: value for key, value in ts.items() if key != "active"}
 
-def get_normalised_action_items(until, opts=[]):
+@traced("split")
+def split_timestamps(items):
     """
-    Gets the list of action items from Starling, extracting and repeating any timestamps so the
-    caller doesn't have to worry about multiple or repeating timestamps. This will also entirely
-    remove inactive timestamps.
-
-    This will repeat timestamps until the given `until` date. This also takes an array of
-    parameters to set to `true` when getting the data from the server (e.g. `body`).
+    Normalises the given raw action items from Starling, splitting out each active main timestamp
+    into its own occurrence, ready to be repeated. Completed items and inactive timestamps are
+    removed entirely. The raw items are left untouched.
     """
 
-    items = get_action_items({key: True for key in opts})
-
-    # Expand every timestamp to avoid handling the complexities of repeats later
-    expanded_items = []
+    to_expand = []
     for item in items:
         # Skip completed items (still indexed!)
         keyword = item["metadata"]["keyword"]
@@ -170,37 +296,180 @@ def get_normalised_action_items(until, opts=[]):
             continue
 
         # Remove inactive planning timestamps
-        item["metadata"]["scheduled"] = prune_inactive_ts(item["metadata"]["scheduled"])
-        item["metadata"]["deadline"] = prune_inactive_ts(item["metadata"]["deadline"])
-        item["metadata"]["closed"] = prune_inactive_ts(item["metadata"]["closed"])
+        planning = {
+            "scheduled": prune_inactive_ts(item["metadata"]["scheduled"]),
+            "deadline": prune_inactive_ts(item["metadata"]["deadline"]),
+            "closed": prune_inactive_ts(item["metadata"]["closed"]),
+        }
 
         # Split out multiple timestamps into separate items
         for ts in item["metadata"]["timestamps"]:
             # Ignore any inactive main timestamps
             if not ts["active"]: continue
-            del ts["active"]
 
             # Use this active main timestamp to guide a potential repeat cadence
-            item_clone = copy.deepcopy(item)
-            del item_clone["metadata"]["timestamps"]
-            item_clone["metadata"]["timestamp"] = ts
-            expanded_items.extend(repeat_until(item_clone, until))
+            to_expand.append(make_occurrence(item, timestamp=prune_inactive_ts(ts), **planning))
 
         # Handle items with no main timestamps (they should still be accounted for)
         if not item["metadata"]["timestamps"]:
-            del item["metadata"]["timestamps"]
-            item["metadata"]["timestamp"] = None
-            expanded_items.extend(repeat_until(item, until))
+            to_expand.append(make_occurrence(item, timestamp=None, **planning))
+
+    return to_expand
+
+def iter_normalised_action_items(until, opts=[], since=None, workers=DEFAULT_WORKERS):
+    """
+    Streaming version of `get_normalised_action_items`, which returns an iterator over each
+    normalised occurrence, expanding each one only when it's asked for, rather than building the
+    whole list first. This is best for callers which only need a single pass over the items. The
+    action items are fetched straight away though, and only the time spent expanding them is
+    recorded as the `expand` span, not whatever the caller does between occurrences.
+    """
 
-    return expanded_items
+    if WARM is not None:
+        return iter(warm_normalised_action_items(until, opts, since, workers))
+
+    to_expand = fetch_split_action_items(opts)
+    return timed_iter("expand", expand_action_items(to_expand, until, since, workers), items_in=len(to_expand))
+
+def get_normalised_action_items(until, opts=[], since=None, workers=DEFAULT_WORKERS):
+    """
+    Gets the list of action items from Starling, extracting and repeating any timestamps so the
+    caller doesn't have to worry about multiple or repeating timestamps. This will also entirely
+    remove inactive timestamps.
+
+    This will repeat timestamps until the given `until` date. This also takes an array of
+    parameters to set to `true` when getting the data from the server (e.g. `body`). If `since` is
+    given, repeats entirely before that date will be skipped (see `repeat_until`).
+
+    Items are expanded across a pool of the given number of worker threads, though the output order
+    is always the same as expanding them one by one.
+    """
+
+    if WARM is not None:
+        return list(warm_normalised_action_items(until, opts, since, workers))
+    return collect_action_items(until, opts, since, workers)
+
+def warm_normalised_action_items(until, opts, since, workers):
+    """
+    Gets the daemon's list of normalised action items for the given arguments, from the repeats of
+    each item memoised until the next refresh. So that commands which default to the current time
+    can share them, these are expanded for whole days, from the start of the day of `since` until
+    the end of the day of `until`, and then clipped back to exactly what expanding for the given
+    range would give. The occurrences are shared, so they mustn't be changed.
+    """
+
+    normalised = WARM["normalised"]
+    day_until = datetime.combine(until.date(), datetime.max.time())
+    day_since = datetime.combine(since.date(), datetime.min.time()) if since is not None else None
+    key = (day_until, day_since, tuple(sorted(opts)))
+    if key not in normalised:
+        while len(normalised) >= WARM_MEMO_SIZE:
+            del normalised[next(iter(normalised))]
+        normalised[key] = collect_repeat_groups(day_until, opts, day_since, workers)
+    return clip_repeat_groups(normalised[key], until, since)
+
+def clip_repeat_groups(groups, until, since):
+    """
+    Flattens the given repeats of each item (from `collect_repeat_groups`, for a wider range) into
+    the occurrences `repeat_until` would give for the given range. Repeats move forward, so this
+    just drops those starting after `until`, and, where `repeat_until` would skip them, those
+    ending before `since`. The original item is always kept.
+    """
+
+    clipped = []
+    for skips, repeats in groups:
+        clipped.append(repeats[0])
+        for repeat in repeats[1:]:
+            if not has_ts_before(repeat, until):
+                break
+            if since is None or not skips or has_ts_since(repeat, since):
+                clipped.append(repeat)
+    return clipped
+
+def collect_repeat_groups(until, opts, since, workers):
+    """
+    Gets, splits, and expands all action items into a list of each one's repeats, along with
+    whether `repeat_until` skipped any before `since` for it (see `repeats_locally`), with the
+    expansion as the `expand` span.
+    """
+
+    to_expand = fetch_split_action_items(opts)
+    # Expanding strips repeaters, so this has to be worked out first
+    skips = [repeats_locally(item) for item in to_expand]
+    with span("expand", items_in=len(to_expand)) as span_args:
+        groups = list(zip(skips, expand_repeat_groups(to_expand, until, since, workers)))
+        span_args["items_out"] = sum(len(repeats) for _, repeats in groups)
+    return groups
+
+def collect_action_items(until, opts, since, workers):
+    """
+    Gets, splits, and expands all action items into a list, with the expansion as the `expand` span.
+    """
+
+    to_expand = fetch_split_action_items(opts)
+    with span("expand", items_in=len(to_expand)) as span_args:
+        expanded = list(expand_action_items(to_expand, until, since, workers))
+        span_args["items_out"] = len(expanded)
+    return expanded
+
+def fetch_split_action_items(opts):
+    """
+    Gets action items from Starling with the given parameters set to `true`, and splits them ready
+    to be expanded.
+    """
+
+    with span("fetch"):
+        items = get_action_items({key: True for key in opts})
+    return split_timestamps(items)
+
+def expand_action_items(to_expand, until, since, workers):
+    """
+    Expands the given split action items with `repeat_until`, yielding each occurrence as it's
+    ready.
+    """
+
+    for repeats in expand_repeat_groups(to_expand, until, since, workers):
+        yield from repeats
+
+def expand_repeat_groups(to_expand, until, since, workers):
+    """
+    Expands the given split action items with `repeat_until`, yielding the list of each one's
+    repeats as it's ready.
+    """
+
+    def expand(item):
+        return repeat_until(item, until, since)
+
+    if workers > 1 and len(to_expand) > 1:
+        # Results are yielded in the input order, so this is deterministic, and only a bounded window
+        # of items is expanded ahead of the caller, so a streaming caller never has every occurrence
+        # in memory at once
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for item in to_expand:
+                pending.append(pool.submit(expand, item))
+                if len(pending) >= workers * WINDOW_PER_WORKER:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    else:
+        for item in to_expand:
+            yield expand(item)
 
 def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Get action items from the Starling server.", prog="get")
     parser.add_argument("until", type=str, help="The date to expand timestamps up until.")
+    parser.add_argument("-s", "--since", type=str, help="The date to skip repeats before (the original item is always kept).")
     parser.add_argument("-o", action="append", dest="opts", help="Additional arguments to be set to true (e.g. body).")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="The number of threads to expand repeats across (default: 1).")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line, streaming where possible.")
 
     args = parser.parse_args(args)
     until = datetime.strptime(args.until, "%Y-%m-%d")
+    since = datetime.strptime(args.since, "%Y-%m-%d") if args.since else None
 
-    dump_json(get_normalised_action_items(until, args.opts or []))
+    if args.ndjson:
+        dump_json(iter_normalised_action_items(until, args.opts or [], since, args.workers), ndjson=True)
+    else:
+        dump_json(get_normalised_action_items(until, args.opts or [], since, args.workers))
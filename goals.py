@@ -4,9 +4,8 @@
 
 import os
 from pathlib import Path
-import requests
 from datetime import datetime, timedelta
-from .utils import STARLING_API
+from .starling import starling_get
 
 # Change this!
 DAILY_SURFACES_ID = "9a73deb2-e702-47d0-8967-dc82de424237"
@@ -19,7 +18,7 @@ def get_daily_surfaces():
     goes off a hardcoded ID.
     """
 
-    response = requests.get(f"{STARLING_API}/node/{DAILY_SURFACES_ID}", json={"conn_format": "markdown", "body": True})
+    response = starling_get(f"node/{DAILY_SURFACES_ID}", json={"conn_format": "markdown", "body": True})
     if response.status_code == 200:
         goals = response.json()["body"].strip()
         if goals == "-" or goals == "":
@@ -44,15 +43,15 @@ def get_journal_goals(date, heading):
     journal_path = Path(journal_path).relative_to(os.environ["ACE_MAIN_DIR"])
     journal_path_url = "%2F".join(journal_path.parts)
 
-    response = requests.get(f"{STARLING_API}/root-id/{journal_path_url}")
+    response = starling_get(f"root-id/{journal_path_url}")
     if response.status_code == 200:
         root_id = response.json()
 
-        response = requests.get(f"{STARLING_API}/node/{root_id}", json={"conn_format": "markdown", "children": True})
+        response = starling_get(f"node/{root_id}", json={"conn_format": "markdown", "children": True})
         if response.status_code == 200:
             for child in response.json()["children"]:
                 if child[1] == heading:
-                    response = requests.get(f"{STARLING_API}/node/{child[0]}", json={"conn_format": "markdown", "body": True})
+                    response = starling_get(f"node/{child[0]}", json={"conn_format": "markdown", "body": True})
                     if response.status_code == 200:
                         goals = response.json()["body"].strip()
                         if goals == "-" or goals == "":
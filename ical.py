@@ -6,7 +6,9 @@ import re
 from ics import Calendar, Event
 from .utils import load_json, timestamp_to_datetime
 from .daily_notes import daily_notes_to_cal
+from .instrument import traced
 
+@traced()
 def cal_to_ics(cal_items):
     """
     Converts the given list of action items to an ICS calendar string.
@@ -41,10 +43,16 @@ def cal_to_ics(cal_items):
 
     return ics_str
 
-def main_cli(_):
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert calendar items to an ICS file.", prog="ical")
+    parser.add_argument("--ndjson", action="store_true", help="Read one calendar item per line (the hybrid form with daily notes needs plain JSON).")
+
+    args = parser.parse_args(args)
+
     # We'll either have an array of calendar items, or a hybrid stream with `calendar` and
     # `daily_notes` keys
-    json_data = load_json()
+    json_data = list(load_json(True)) if args.ndjson else load_json()
     if isinstance(json_data, dict):
         cal_items = json_data["calendar"]
         cal_items.extend(daily_notes_to_cal(json_data["daily_notes"]))
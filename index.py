@@ -0,0 +1,277 @@
+# An index over normalised action items, built once per run so composites that apply several
+# filters to the same items don't each rescan the whole list (and rebuild their own maps). Every
+# filter over action items accepts either one of these or a plain list of items.
+
+from bisect import bisect_left, bisect_right
+from .utils import DEFAULT_PRIORITY, format_proj_body, parse_priority, timestamp_to_epochs
+
+# The `parent_tags` that mark special kinds of action items, which each have their own filter
+CATEGORIES = ("person_dates", "tickles", "daily_notes", "waiting")
+# Categories of items that have timestamps, but which don't belong in the calendar
+NON_CALENDAR_CATEGORIES = ("person_dates", "tickles", "daily_notes")
+
+class ItemIndex:
+    """
+    An index over the given normalised action items (which can be any iterable, and will be read
+    once). This holds a map of IDs to items (where repeats share an ID, the last one wins, as with
+    a plain dictionary), the items in each category and with any keyword, and the parsed main
+    timestamps of items which could go in the calendar. All the lists preserve the original order.
+    """
+
+    def __init__(self, action_items):
+        self.items = []
+        self.by_id = {}
+        self.by_category = {category: [] for category in CATEGORIES}
+        self.with_keyword = []
+        # Items with a main timestamp that aren't in a non-calendar category, as
+        # `(start, end, item)` in the compact form from `utils.parse_epoch`, where `end` is the
+        # same as `start` for single-point timestamps
+        self.timed = []
+        # Anything derived from the index by filters that's worth reusing between queries
+        self.derived = {}
+
+        for item in action_items:
+            self.items.append(item)
+            self.by_id[item["id"]] = item
+
+            for category in CATEGORIES:
+                if category in item["parent_tags"]:
+                    self.by_category[category].append(item)
+
+            if item["metadata"]["keyword"]:
+                self.with_keyword.append(item)
+
+            ts = item["metadata"]["timestamp"]
+            if ts and not any(category in item["parent_tags"] for category in NON_CALENDAR_CATEGORIES):
+                ts_start, ts_end = timestamp_to_epochs(ts)
+                self.timed.append((ts_start, ts_end or ts_start, item))
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def cached(self, name, build):
+        """
+        Gets the named structure derived from this index, building it with the given function the
+        first time it's asked for. This lets filters build things like interval indices lazily, and
+        then share them between every query in the same process.
+        """
+
+        if name not in self.derived:
+            self.derived[name] = build()
+        return self.derived[name]
+
+class IntervalIndex:
+    """
+    An index over `(start, end, value)` intervals (with comparable bounds, like the compact
+    timestamps from `utils.parse_epoch`), for finding those overlapping a given range in roughly
+    O(log n + k). Single-point intervals are kept in a sorted array searched with `bisect`, and
+    spans go in a static interval tree: an implicit balanced tree over the spans sorted by start,
+    which records the maximum end in each subtree, so whole subtrees that end before the range can
+    be skipped. Results always come back in the order the intervals were given in.
+    """
+
+    def __init__(self, intervals):
+        points = []
+        spans = []
+        for seq, (start, end, value) in enumerate(intervals):
+            if start == end:
+                points.append((start, seq, value))
+            else:
+                spans.append((start, end, seq, value))
+
+        points.sort(key=lambda point: point[0])
+        self.points = points
+        self.point_starts = [point[0] for point in points]
+
+        spans.sort(key=lambda span: span[0])
+        self.spans = spans
+        self.max_ends = [None] * len(spans)
+        self._build(0, len(spans))
+
+    def _build(self, lo, hi):
+        """
+        Fills in the maximum ends for the subtree over `spans[lo:hi]`, returning its maximum.
+        """
+
+        if lo >= hi:
+            return None
+
+        mid = (lo + hi) // 2
+        max_end = self.spans[mid][1]
+        for child_max in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child_max is not None and child_max > max_end:
+                max_end = child_max
+        self.max_ends[mid] = max_end
+        return max_end
+
+    def _query(self, lo, hi, start, end, found):
+        """
+        Adds `(seq, value)` for every span in the subtree over `spans[lo:hi]` overlapping the given
+        range to `found`.
+        """
+
+        if lo >= hi:
+            return
+
+        mid = (lo + hi) // 2
+        # Nothing in this subtree ends late enough
+        if start is not None and self.max_ends[mid] < start:
+            return
+
+        self._query(lo, mid, start, end, found)
+        span_start, span_end, seq, value = self.spans[mid]
+        # Everything to the right starts later, so only look there if this one starts in time
+        if span_start <= end:
+            if start is None or span_end >= start:
+                found.append((seq, value))
+            self._query(mid + 1, hi, start, end, found)
+
+    def overlapping(self, start, end):
+        """
+        Gets the values of all intervals overlapping the inclusive range from `start` to `end`. If
+        `start` is `None`, this gets everything starting before `end`.
+        """
+
+        lo = bisect_left(self.point_starts, start) if start is not None else 0
+        hi = bisect_right(self.point_starts, end)
+        found = [(seq, value) for _, seq, value in self.points[lo:hi]]
+        self._query(0, len(self.spans), start, end, found)
+
+        found.sort(key=lambda result: result[0])
+        return [value for _, value in found]
+
+class HierarchyIndex:
+    """
+    The tree structure of the given map of IDs to action items, built once so that looking up an
+    item's inherited priority or a project's tasks doesn't walk the tree again for every item.
+    A single top-down pass works out the priority each item inherits (the most important of its
+    own and all its ancestors'), and the tasks of every project are kept in the order the project
+    lists them, with project bodies built from them the first time they're asked for.
+    """
+
+    def __init__(self, by_id):
+        self.by_id = by_id
+        # Inherited priorities by ID, or the first invalid priority on the way up from an item,
+        # which is only reported if that item's priority is asked for (as walking up would)
+        self.priorities = {}
+        self.children = {}
+        self.project_bodies = {}
+
+        child_ids = {}
+        roots = []
+        for id, item in by_id.items():
+            if item["parent_id"] in by_id:
+                child_ids.setdefault(item["parent_id"], []).append(id)
+            else:
+                roots.append(id)
+
+            if item["metadata"]["keyword"] == "PROJ":
+                self.children[id] = [by_id[task_id] for task_id, _ in item["children"] if task_id in by_id]
+
+        stack = [(id, DEFAULT_PRIORITY) for id in roots]
+        while stack:
+            id, inherited = stack.pop()
+            priority = self.combine_priority(by_id[id], inherited)
+            self.priorities[id] = priority
+            stack.extend((child_id, priority) for child_id in child_ids.get(id, []))
+
+    @staticmethod
+    def combine_priority(item, inherited):
+        """
+        Combines the given item's own priority with the one it inherits.
+        """
+
+        try:
+            priority = parse_priority(item["metadata"]["priority"], item["id"])
+        except ValueError:
+            return item["metadata"]["priority"]
+        if isinstance(inherited, str):
+            return inherited
+        return min(priority, inherited)
+
+    def priority(self, item):
+        """
+        Gets the priority of the given item, inheriting any higher priorities from up the chain.
+        """
+
+        priority = self.priorities.get(item["id"])
+        if priority is None:
+            # Not in the tree, but its parent might be
+            parent = self.by_id.get(item["parent_id"])
+            priority = self.combine_priority(item, self.priority(parent) if parent else DEFAULT_PRIORITY)
+        if isinstance(priority, str):
+            raise ValueError(f"Invalid priority value on node '{item['id']}': {priority}")
+        return priority
+
+    def project_body(self, proj_item):
+        """
+        Gets the body for the given project, with its tasks formatted in (see
+        `utils.format_proj_body`).
+        """
+
+        id = proj_item["id"]
+        if id not in self.project_bodies:
+            tasks = self.children.get(id)
+            if tasks is None:
+                tasks = [self.by_id[task_id] for task_id, _ in proj_item["children"] if task_id in self.by_id]
+            self.project_bodies[id] = format_proj_body(proj_item, tasks)
+        return self.project_bodies[id]
+
+def hierarchy_index(action_items):
+    """
+    Gets the hierarchy of the given action items, building it only once for an index.
+    """
+
+    if isinstance(action_items, ItemIndex):
+        return action_items.cached("hierarchy", lambda: HierarchyIndex(action_items.by_id))
+    return HierarchyIndex(items_by_id(action_items))
+
+def items_by_id(action_items):
+    """
+    Gets a map of IDs to the given action items, using the index's if we have one.
+    """
+
+    if isinstance(action_items, ItemIndex):
+        return action_items.by_id
+    return {item["id"]: item for item in action_items}
+
+def items_in_category(action_items, category):
+    """
+    Gets the action items with the given category in their `parent_tags`, using the index if we
+    have one. For plain iterables, this is lazy.
+    """
+
+    if isinstance(action_items, ItemIndex):
+        return action_items.by_category[category]
+    return (item for item in action_items if category in item["parent_tags"])
+
+def items_with_keyword(action_items):
+    """
+    Gets the action items which have any keyword, using the index if we have one. For plain
+    iterables, this is lazy.
+    """
+
+    if isinstance(action_items, ItemIndex):
+        return action_items.with_keyword
+    return (item for item in action_items if item["metadata"]["keyword"])
+
+def timed_items(action_items):
+    """
+    Gets `(start, end, item)` for every action item with a main timestamp that could go in the
+    calendar, with the timestamps in the compact form from `utils.parse_epoch`. This uses the
+    index's pre-parsed timestamps if we have one.
+    """
+
+    if isinstance(action_items, ItemIndex):
+        return action_items.timed
+
+    timed = []
+    for item in action_items:
+        ts = item["metadata"]["timestamp"]
+        if ts and not any(category in item["parent_tags"] for category in NON_CALENDAR_CATEGORIES):
+            ts_start, ts_end = timestamp_to_epochs(ts)
+            timed.append((ts_start, ts_end or ts_start, item))
+    return timed
@@ -0,0 +1,319 @@
+# Lightweight spans and counters for working out where the time in a command goes (fetching,
+# expanding repeats, filtering, rendering, etc.). This is enabled with `main.py --profile`, which
+# prints a breakdown to stderr when the command finishes, or `main.py --profile=<path>`, which writes
+# a trace that can be opened in Chrome's trace viewer (`chrome://tracing`) or Perfetto. When it's
+# disabled (the default), spans and counters do almost nothing, so they can stay in hot paths.
+#
+# `main.py --memprofile` uses the same spans to track memory with `tracemalloc`: each span records
+# how much memory it left allocated and its peak, and each stage of the pipeline (every span directly
+# inside the command, like `fetch`, `expand`, the filters, and `render`) reports the lines that
+# allocated the memory it retained. Tracing allocations makes everything much slower, so times from
+# the same run aren't meaningful.
+
+import functools
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Whether spans and counters are being recorded, set with `main.py --profile` or `--memprofile`
+ENABLED = False
+# Whether to report times (`--profile`) and memory (`--memprofile`)
+TIMING = False
+MEMORY = False
+# Where to write a Chrome trace, if anywhere (otherwise a breakdown is printed to stderr)
+TRACE_PATH = None
+
+# Every finished span, as `(name, start, end, thread_id, args)`, with times from `time.perf_counter`
+SPANS = []
+COUNTERS = Counter()
+START = time.perf_counter()
+# How many allocation sites to report for each stage
+MEMORY_TOP_SITES = 5
+# Memory used by each stage, as `(name, retained_bytes, peak_bytes, top_sites)`, where `top_sites`
+# are `tracemalloc` statistics of what it retained by line
+STAGE_MEMORY = []
+
+_lock = threading.Lock()
+# For each open span on the main thread, `[allocated_at_start, peak_so_far, snapshot_at_start,
+# snapshot_size]`, which lets nested spans each get their own peak from `tracemalloc`'s single
+# global one
+_memory_stack = []
+
+def enable(trace_path=None):
+    """
+    Starts recording spans and counters, to be reported to stderr, or written as a Chrome trace to
+    the given path.
+    """
+
+    global ENABLED, TIMING, TRACE_PATH, START
+    ENABLED = True
+    TIMING = True
+    TRACE_PATH = trace_path
+    START = time.perf_counter()
+
+def enable_memory():
+    """
+    Starts tracking memory with `tracemalloc`, to be reported per span and per stage.
+    """
+
+    global ENABLED, MEMORY
+    ENABLED = True
+    MEMORY = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def count(name, n=1):
+    """
+    Adds the given amount to the named counter.
+    """
+
+    if ENABLED:
+        with _lock:
+            COUNTERS[name] += n
+
+def sized(data):
+    """
+    Gets the number of items in the given data, or `None` if it isn't a collection of items (e.g. a
+    generator, or a string of output).
+    """
+
+    if isinstance(data, (str, bytes)) or not hasattr(data, "__len__"):
+        return None
+    return len(data)
+
+@contextmanager
+def span(name, **args):
+    """
+    Records the time spent in the body of the `with` statement as a span with the given name and
+    arguments. This yields the arguments, so more can be added from inside (e.g. the number of
+    items produced, as `items_out`).
+    """
+
+    if not ENABLED:
+        yield args
+        return
+
+    # `tracemalloc` only has one peak, so we can only follow one stack of spans (and the pipeline
+    # stages are all on the main thread)
+    tracking = MEMORY and threading.current_thread() is threading.main_thread()
+    if tracking:
+        enter_memory()
+
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        end = time.perf_counter()
+        if tracking:
+            exit_memory(name, args)
+        SPANS.append((name, start, end, threading.get_ident(), args))
+
+def timed_iter(name, iterable, **args):
+    """
+    Yields everything from the given iterable, recording the time spent getting each item from it
+    (but not what the caller does with them in between, which has its own spans) as a span with the
+    given name and arguments, plus the number of items as `items_out`. As that time isn't
+    contiguous, the span starts when the first item is asked for, and lasts as long as all the time
+    spent in the iterable put together. Memory isn't tracked for these, as they interleave with
+    the caller's spans.
+    """
+
+    if not ENABLED:
+        yield from iterable
+        return
+
+    iterator = iter(iterable)
+    args["items_out"] = 0
+    first = time.perf_counter()
+    busy = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                busy += time.perf_counter() - start
+            args["items_out"] += 1
+            yield item
+    finally:
+        SPANS.append((name, first, first + busy, threading.get_ident(), args))
+
+def allocation_snapshot():
+    """
+    Takes a snapshot of where everything currently allocated was allocated, ignoring our own
+    bookkeeping.
+    """
+
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+
+def enter_memory():
+    """
+    Starts tracking memory for a new span.
+    """
+
+    current, peak = tracemalloc.get_traced_memory()
+    if _memory_stack:
+        _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+
+    # Stages (directly inside the command) compare snapshots from either side of them. The snapshot
+    # is itself traced, so we measure from after it's taken, and leave it out of the peak.
+    snapshot = None
+    snapshot_size = 0
+    if len(_memory_stack) == 1:
+        snapshot = allocation_snapshot()
+        snapshot_size = max(tracemalloc.get_traced_memory()[0] - current, 0)
+        current += snapshot_size
+
+    tracemalloc.reset_peak()
+    _memory_stack.append([current, current, snapshot, snapshot_size])
+
+def exit_memory(name, args):
+    """
+    Finishes tracking memory for the innermost span, adding how much it retained and its peak to
+    its arguments (in bytes).
+    """
+
+    current, peak = tracemalloc.get_traced_memory()
+    start, child_peak, snapshot, snapshot_size = _memory_stack.pop()
+    peak = max(peak, child_peak) - snapshot_size
+    if _memory_stack:
+        _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+
+    args["retained_bytes"] = current - start
+    args["peak_bytes"] = peak
+    if snapshot is not None:
+        sites = [stat for stat in allocation_snapshot().compare_to(snapshot, "lineno") if stat.size_diff > 0]
+        STAGE_MEMORY.append((name, current - start, peak, sites[:MEMORY_TOP_SITES]))
+        del snapshot
+    tracemalloc.reset_peak()
+
+def traced(name=None):
+    """
+    Decorates a pipeline stage to record each call as a span (named after the function by default),
+    with the number of items it was given (from its first argument) and the number it returned,
+    where those can be counted.
+    """
+
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+
+            with span(span_name) as span_args:
+                if args:
+                    span_args["items_in"] = sized(args[0])
+                result = fn(*args, **kwargs)
+                span_args["items_out"] = sized(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+def summarise_spans():
+    """
+    Groups the recorded spans by name, in the order each name was first seen, as a dictionary of
+    names to `{"calls", "total", "items_in", "items_out"}`. Times are inclusive of any spans nested
+    inside, and item counts are `None` if they were never known.
+    """
+
+    summary = {}
+    for name, start, end, _, args in sorted(SPANS, key=lambda span: span[1]):
+        entry = summary.setdefault(name, {"calls": 0, "total": 0.0, "items_in": None, "items_out": None})
+        entry["calls"] += 1
+        entry["total"] += end - start
+        for key in ("items_in", "items_out"):
+            if args.get(key) is not None:
+                entry[key] = (entry[key] or 0) + args[key]
+    return summary
+
+def print_report(file=None):
+    """
+    Prints a breakdown of the recorded spans and counters.
+    """
+
+    file = file or sys.stderr
+    print(f"Profile ({time.perf_counter() - START:.3f}s total, times include nested spans):", file=file)
+    print(f"  {'span':<32} {'calls':>6} {'total':>10} {'items in':>9} {'items out':>9}", file=file)
+    for name, entry in summarise_spans().items():
+        items_in = entry["items_in"] if entry["items_in"] is not None else "-"
+        items_out = entry["items_out"] if entry["items_out"] is not None else "-"
+        print(f"  {name:<32} {entry['calls']:>6} {entry['total'] * 1000:>8.1f}ms {items_in:>9} {items_out:>9}", file=file)
+
+    if COUNTERS:
+        print("Counters:", file=file)
+        for name, value in sorted(COUNTERS.items()):
+            print(f"  {name:<32} {value:>6}", file=file)
+
+def chrome_trace():
+    """
+    Produces the recorded spans and counters in Chrome's trace event format, with times in
+    microseconds since profiling started.
+    """
+
+    def micros(t):
+        return round((t - START) * 1e6, 1)
+
+    events = [
+        {"name": name, "ph": "X", "ts": micros(start), "dur": round((end - start) * 1e6, 1), "pid": 1, "tid": tid, "args": args}
+        for name, start, end, tid, args in SPANS
+    ]
+    # Counters only have their final values, so they go at the end
+    now = micros(time.perf_counter())
+    events.extend({"name": name, "ph": "C", "ts": now, "pid": 1, "args": {name: value}} for name, value in sorted(COUNTERS.items()))
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def format_bytes(size):
+    """
+    Formats the given number of bytes in KiB or MiB.
+    """
+
+    if abs(size) < 1024 * 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size / 1024 / 1024:.1f} MiB"
+
+def print_memory_report(file=None):
+    """
+    Prints how much memory each stage retained and peaked at, with the lines that allocated what it
+    retained.
+    """
+
+    file = file or sys.stderr
+    current, _ = tracemalloc.get_traced_memory()
+    peak = max((args["peak_bytes"] for *_, args in SPANS if "peak_bytes" in args), default=0)
+    print(f"Memory (peak {format_bytes(peak)}, {format_bytes(current)} still allocated):", file=file)
+    for name, retained, stage_peak, sites in STAGE_MEMORY:
+        sign = "+" if retained >= 0 else "-"
+        print(f"  {name}: retained {sign}{format_bytes(abs(retained))}, peak {format_bytes(stage_peak)}", file=file)
+        for stat in sites:
+            frame = stat.traceback[0]
+            print(f"      +{format_bytes(stat.size_diff):>10}  {frame.filename}:{frame.lineno}", file=file)
+
+def report():
+    """
+    Reports everything recorded: times as a breakdown on stderr or as a Chrome trace, and memory on
+    stderr.
+    """
+
+    if TIMING:
+        if TRACE_PATH:
+            with open(TRACE_PATH, "w") as f:
+                json.dump(chrome_trace(), f)
+            print(f"Wrote trace to {TRACE_PATH}", file=sys.stderr)
+        else:
+            print_report()
+    if MEMORY:
+        print_memory_report()
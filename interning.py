@@ -0,0 +1,81 @@
+# Interns the contexts and people next actions need to small integer IDs, so those of each next
+# action can be held as a bitmask, and checking them against what's available is a couple of
+# integer operations rather than a loop over names. The IDs are only meaningful within the process that
+# made them, so the bitmasks are never put on next actions themselves (which get written out as
+# JSON); instead, each table keeps the bitmask of every set of names it's seen, and next actions
+# look theirs up with `context_mask` and `people_mask`.
+
+class NameTable:
+    """
+    A table of names (e.g. contexts), each given the next free bit the first time it's seen.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        # The bitmask of every set of names asked for by `names_mask`, as a tuple in their original
+        # order
+        self.masks = {}
+
+    def intern(self, name):
+        """
+        Gets the ID of the given name, giving it one if it doesn't have one yet.
+        """
+
+        id = self.ids.get(name)
+        if id is None:
+            id = len(self.names)
+            self.ids[name] = id
+            self.names.append(name)
+        return id
+
+    def mask(self, names):
+        """
+        Gets the bitmask of the given names, interning any that are new. This is used for the names
+        available to a filter as well, so they line up with any items interned after them.
+        """
+
+        mask = 0
+        for name in names:
+            mask |= 1 << self.intern(name)
+        return mask
+
+    def names_mask(self, names):
+        """
+        Like `mask`, but for a list of names from a next action, which is remembered, so the names
+        of each distinct set only have to be interned once.
+        """
+
+        key = tuple(names)
+        mask = self.masks.get(key)
+        if mask is None:
+            mask = self.masks[key] = self.mask(key)
+        return mask
+
+CONTEXTS = NameTable()
+PEOPLE = NameTable()
+
+def context_mask(item):
+    """
+    Gets the bitmask of the contexts the given next action needs.
+    """
+
+    return CONTEXTS.names_mask(item["context"] or ())
+
+def people_mask(item):
+    """
+    Gets the bitmask of the people the given next action needs.
+    """
+
+    people = item["people"]
+    if not people:
+        return 0
+    return PEOPLE.names_mask(person for person, _ in people)
+
+def all_available(mask, available):
+    """
+    Checks that the given item bitmask is non-empty and only has names in the given available
+    bitmask. This is how an item's contexts (or people) are treated: as an AND list.
+    """
+
+    return mask != 0 and mask & ~available == 0
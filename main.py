@@ -2,66 +2,135 @@
 # Central entrypoint script.
 
 import sys
+from importlib import import_module
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from scheduling_scripts import cal, daily_notes, dates, filter, gcal, get, ical, next_actions, tickles, upcoming, urgent, waiting, actions_app, goals
-from scheduling_scripts.dashboards import actions as d_actions
-from scheduling_scripts.composites import cal as c_cal, actions as c_actions, upcoming as c_upcoming, urgent as c_urgent, waiting as c_waiting, tickles as c_tickles, dates as c_dates, day as c_day, past as c_past, week as c_week, prepapp as c_prepapp, digest as c_digest
+# These are needed for global flags and before every command, and only use the standard library
+from scheduling_scripts import cache, codec, instrument, utils
 
 # This script acts as the central script endpoint for everything in the scheduling scripts. It
 # can be executed with just `python main.py` due to the above `sys.path` modification, and it
-# will then import the `main_cli` functions from all the other files needed to support full
-# operation. We define those scripts below, and the sub-scripts as well, and then just iterate
-# through `sys.argv` as we make our way down a structure. Once we reach a function, the remaining
+# will then import the `main_cli` function of whichever other file is needed for the command it's
+# given. We define those scripts below, and the sub-scripts as well, and then just iterate
+# through `sys.argv` as we make our way down a structure. Once we reach a command, the remaining
 # arguments are passed to it. The only caveat of this approach is that `sys.argv[0]` no longer
 # represents the program name, so `argparse.ArgumentParser` needs to have `prog` specified.
 #
+# Commands are given as `module:function` within this package, and are only imported once they're
+# run, so simple commands (e.g. `raw filter`, which only needs `json`) don't pay for importing
+# `rich`, `ics`, `requests`, etc. This is what makes pipelines of `raw` commands cheap.
+#
 # This is generally a very good solution for personal Python repos with many binaries!
 
 ARGS = {
     "raw": {
-        "cal": cal.main_cli,
-        "daily_notes": daily_notes.main_cli,
-        "dates": dates.main_cli,
-        "filter": filter.main_cli,
-        "gcal": gcal.main_cli,
-        "get": get.main_cli,
-        "ical": ical.main_cli,
-        "next_actions": next_actions.main_cli,
-        "tickles": tickles.main_cli,
-        "upcoming": upcoming.main_cli,
-        "urgent": urgent.main_cli,
-        "waiting": waiting.main_cli,
-        "actions_app": actions_app.main_cli,
-        "goals": goals.main_cli,
+        "cal": "cal:main_cli",
+        "daily_notes": "daily_notes:main_cli",
+        "dates": "dates:main_cli",
+        "filter": "filter:main_cli",
+        "gcal": "gcal:main_cli",
+        "get": "get:main_cli",
+        "ical": "ical:main_cli",
+        "next_actions": "next_actions:main_cli",
+        "tickles": "tickles:main_cli",
+        "upcoming": "upcoming:main_cli",
+        "urgent": "urgent:main_cli",
+        "waiting": "waiting:main_cli",
+        "actions_app": "actions_app:main_cli",
+        "goals": "goals:main_cli",
 
         "dashboard": {
-            "actions": d_actions.main_cli,
+            "actions": "dashboards.actions:main_cli",
         }
     },
-    "cal": c_cal.main_cli,
-    "actions": c_actions.main_cli,
-    "upcoming": c_upcoming.main_cli,
-    "urgent": c_urgent.main_cli,
-    "waiting": c_waiting.main_cli,
-    "tickles": c_tickles.main_cli,
-    "dates": c_dates.main_cli,
-    "day": c_day.main_cli,
-    "past": c_past.main_cli,
-    "week": c_week.main_cli,
-    "prepapp": c_prepapp.main_cli,
-    "digest": c_digest.main_cli,
+    "cal": "composites.cal:main_cli",
+    "actions": "composites.actions:main_cli",
+    "upcoming": "composites.upcoming:main_cli",
+    "urgent": "composites.urgent:main_cli",
+    "waiting": "composites.waiting:main_cli",
+    "tickles": "composites.tickles:main_cli",
+    "dates": "composites.dates:main_cli",
+    "day": "composites.day:main_cli",
+    "past": "composites.past:main_cli",
+    "week": "composites.week:main_cli",
+    "prepapp": "composites.prepapp:main_cli",
+    "digest": "composites.digest:main_cli",
+    "cache": "cache:main_cli",
+    "serve": "serve:main_cli",
+    "bench_codecs": "codec:main_cli",
+    "pipe": "pipe:main_cli",
+    "bench": {
+        "vault": "bench.vault:main_cli",
+        "stub": "bench.stub:main_cli",
+        "run": "bench.run:main_cli",
+        "memory": "bench.memory:main_cli",
+        "filtering": "bench.filtering:main_cli",
+    },
 }
 
-if __name__ == "__main__":
+def load_command(command):
+    """
+    Imports the function for the given `module:function` command from `ARGS`.
+    """
+
+    module, function = command.split(":")
+    return getattr(import_module(f"scheduling_scripts.{module}"), function)
+
+def dispatch(argv):
+    """
+    Runs the command the given arguments lead to in `ARGS`, passing it the rest of them. This is
+    also used by the daemon in `serve.py` to run commands sent to it.
+    """
+
     argspace = ARGS
-    sys.argv.pop(0)
+    argv = list(argv)
     while isinstance(argspace, dict):
-        if not sys.argv:
+        if not argv:
             raise Exception("No command provided")
 
-        arg = sys.argv.pop(0)
+        arg = argv.pop(0)
         if arg in argspace:
             argspace = argspace[arg]
 
-    argspace(sys.argv)
+    utils.reset_warnings()
+    load_command(argspace)(argv)
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    # Global flags come before any commands
+    while argv and argv[0].startswith("--"):
+        flag = argv.pop(0)
+        if flag == "--no-cache":
+            cache.CACHE_ENABLED = False
+        elif flag == "--format":
+            if not argv:
+                raise Exception("No format provided to `--format`")
+            codec.set_output_format(argv.pop(0))
+        elif flag == "--profile" or flag.startswith("--profile="):
+            # A path writes a Chrome trace, otherwise a breakdown goes to stderr
+            instrument.enable(flag.partition("=")[2] or None)
+        elif flag == "--memprofile":
+            instrument.enable_memory()
+        elif flag in ("--record", "--replay", "--replay-latency"):
+            if not argv:
+                raise Exception(f"No argument provided to `{flag}`")
+            # Imported here, as this needs `requests`
+            from scheduling_scripts import cassette
+            if flag == "--record":
+                cassette.start_recording(argv.pop(0))
+            elif flag == "--replay":
+                cassette.start_replay(argv.pop(0))
+            else:
+                cassette.LATENCY = cassette.parse_latency(argv.pop(0))
+            # Snapshots would change which requests get made, so always go to the (real or recorded)
+            # server
+            cache.CACHE_ENABLED = False
+        else:
+            raise Exception(f"Unknown global flag: {flag}")
+
+    try:
+        with instrument.span("command", argv=argv):
+            dispatch(argv)
+    finally:
+        if instrument.ENABLED:
+            instrument.report()
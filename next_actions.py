@@ -1,76 +1,110 @@
 # Filters the given action items down to those which qualify as "next actions".
 
-from .utils import associated_people, body_for_proj, create_datetime, dump_json, load_json, validate_focus, validate_time, validate_planning_ts, get_priority
+from .utils import associated_people, ts_epoch, dump_json, load_json, validate_focus, validate_time, validate_planning_ts, surfacing_verdict, warn_missed_deadline
+from .index import hierarchy_index, items_with_keyword
+from .instrument import traced
 
+@traced()
 def filter_to_next_actions(action_items):
     """
     Filters the given action items down to those which qualify as "next actions". These will be any
-    projects with timestamps, and any tasks.
+    projects with timestamps, and any tasks. The action items can also be given as an `ItemIndex`.
     """
 
-    action_items_map = {item["id"]: item for item in action_items}
+    return list(iter_next_actions(action_items))
 
-    filtered = []
-    for item in action_items:
-        if item["metadata"]["keyword"]:
-            if item["metadata"]["keyword"] == "PROJ":
-                # Only include projects if they have scheduled/deadline timestamps that would make
-                # them appear (otherwise they're not really *next actions*). Alternately, they
-                # might have an actual timestamp or priority which will impact the scheduling of
-                # their children, so definitely include those!
-                if not item["metadata"]["scheduled"] and not item["metadata"]["deadline"] and not item["metadata"]["timestamp"] and not item["metadata"]["priority"]:
-                    continue
+def iter_next_actions(action_items):
+    """
+    Streaming version of `filter_to_next_actions`, which yields each next action as soon as it's
+    been made. The action items are read twice (once to map out parents), so they can't be a
+    one-shot stream.
+    """
+
+    hierarchy = hierarchy_index(action_items)
+
+    for item in items_with_keyword(action_items):
+        if item["metadata"]["keyword"] == "PROJ":
+            # Only include projects if they have scheduled/deadline timestamps that would make
+            # them appear (otherwise they're not really *next actions*). Alternately, they
+            # might have an actual timestamp or priority which will impact the scheduling of
+            # their children, so definitely include those!
+            if not item["metadata"]["scheduled"] and not item["metadata"]["deadline"] and not item["metadata"]["timestamp"] and not item["metadata"]["priority"]:
+                continue
+
+            body = hierarchy.project_body(item)
+            # Projects don't have these, tasks do
+            time = None
+            focus = None
+            people = None
+            context = None
+        elif item["metadata"]["keyword"] == "PROB":
+            # Problems are like tasks, but don't have time/focus
+            body = item["body"] or ""
+            time = None
+            focus = None
+            people = associated_people(item)
+            context = item["tags"]
+        else:
+            body = item["body"] or ""
+            time = validate_time(item["metadata"]["properties"].get("TIME"), item["id"])
+            focus = validate_focus(item["metadata"]["properties"].get("FOCUS"), item["id"])
+            people = associated_people(item)
+            context = item["tags"]
+
+        scheduled = validate_planning_ts(item["metadata"]["scheduled"], item["id"])
+        deadline = validate_planning_ts(item["metadata"]["deadline"], item["id"])
+        priority = hierarchy.priority(item)
 
-                body = body_for_proj(item, action_items_map)
-                # Projects don't have these, tasks do
-                time = None
-                focus = None
-                people = None
-                context = None
-            elif item["metadata"]["keyword"] == "PROB":
-                # Problems are like tasks, but don't have time/focus
-                body = item["body"] or ""
-                time = None
-                focus = None
-                people = associated_people(item)
-                context = item["tags"]
-            else:
-                body = item["body"] or ""
-                time = validate_time(item["metadata"]["properties"].get("TIME"), item["id"])
-                focus = validate_focus(item["metadata"]["properties"].get("FOCUS"), item["id"])
-                people = associated_people(item)
-                context = item["tags"]
+        # Sanity check that the scheduled date is before the deadline date
+        scheduled_dt = ts_epoch(scheduled) if scheduled else None
+        deadline_dt = ts_epoch(deadline) if deadline else None
+        if scheduled_dt and deadline_dt and scheduled_dt > deadline_dt:
+            raise ValueError(f"Item {item['id']} has a scheduled date after its deadline date")
 
-            scheduled = validate_planning_ts(item["metadata"]["scheduled"], item["id"])
-            deadline = validate_planning_ts(item["metadata"]["deadline"], item["id"])
-            priority = get_priority(item, action_items_map)
+        # Work out once whether this should be surfaced (see `utils.should_surface_item`), so later
+        # filters can just check the flag. Any parent with a keyword is a next action itself, and
+        # will have a timestamp if it's a project that matters.
+        ts = item["metadata"]["timestamp"]
+        if not ts:
+            parent = hierarchy.by_id.get(item["parent_id"])
+            if parent and parent["metadata"]["keyword"]:
+                ts = parent["metadata"]["timestamp"]
+        surface, meets_deadline = surfacing_verdict(ts, deadline)
+        if meets_deadline is False:
+            warn_missed_deadline(item["id"])
 
-            # Sanity check that the scheduled date is before the deadline date
-            scheduled_dt = create_datetime(scheduled["date"], scheduled["time"]) if scheduled else None
-            deadline_dt = create_datetime(deadline["date"], deadline["time"]) if deadline else None
-            if scheduled_dt and deadline_dt and scheduled_dt > deadline_dt:
-                raise ValueError(f"Item {item['id']} has a scheduled date after its deadline date")
+        next_action = {
+            "id": item["id"],
+            "parent_id": item["parent_id"],
+            "keyword": item["metadata"]["keyword"],
+            "title": item["title"][-1],
+            "body": body.strip(),
+            "scheduled": validate_planning_ts(item["metadata"]["scheduled"], item["id"]),
+            "deadline": validate_planning_ts(item["metadata"]["deadline"], item["id"]),
+            "timestamp": item["metadata"]["timestamp"],
+            "people": people,
+            "context": context,
+            "time": time,
+            "focus": focus,
+            "priority": priority,
+            # Whether this should be surfaced in the upcoming list and in the field, and, if both
+            # it (or its project) and it have a timestamp and deadline, whether they line up
+            "surface": surface,
+            "meets_deadline": meets_deadline,
+        }
 
-            next_action = {
-                "id": item["id"],
-                "parent_id": item["parent_id"],
-                "keyword": item["metadata"]["keyword"],
-                "title": item["title"][-1],
-                "body": body.strip(),
-                "scheduled": validate_planning_ts(item["metadata"]["scheduled"], item["id"]),
-                "deadline": validate_planning_ts(item["metadata"]["deadline"], item["id"]),
-                "timestamp": item["metadata"]["timestamp"],
-                "people": people,
-                "context": context,
-                "time": time,
-                "focus": focus,
-                "priority": priority,
-            }
+        yield next_action
 
-            filtered.append(next_action)
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Filter action items to next actions.", prog="next_actions")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line (this buffers the input, as surfacing depends on parents, but streams the output).")
 
-    return filtered
+    args = parser.parse_args(args)
 
-def main_cli(_):
-    action_items = load_json()
-    dump_json(filter_to_next_actions(action_items))
+    # We need to look up parents, so the input has to be buffered, but the output can stream
+    action_items = list(load_json(args.ndjson))
+    if args.ndjson:
+        dump_json(iter_next_actions(action_items), ndjson=True)
+    else:
+        dump_json(filter_to_next_actions(action_items))
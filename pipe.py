@@ -0,0 +1,63 @@
+# Runs a chain of raw scripts in a single process, as in `main.py pipe get 2025-01-01 : next_actions
+# : upcoming 2025-01-10`. This gives exactly the same output as piping the `raw` commands into each
+# other, but each stage hands its output straight to the next as Python objects, so there's no
+# process startup or serialisation between them. Each stage is run through its normal `main_cli`,
+# so it takes exactly the same arguments it would on its own.
+
+from . import codec
+
+# The argument that separates stages
+STAGE_SEPARATOR = ":"
+
+def split_stages(argv):
+    """
+    Splits the given arguments into the arguments for each stage.
+    """
+
+    stages = [[]]
+    for arg in argv:
+        if arg == STAGE_SEPARATOR:
+            stages.append([])
+        else:
+            stages[-1].append(arg)
+
+    if any(not stage for stage in stages):
+        raise Exception("Every stage in a pipe needs a command")
+    return stages
+
+def run_pipe(stages):
+    """
+    Runs the given stages (each a list of arguments to `main.py raw`), passing the output of each to
+    the next. The first stage reads from stdin (if it reads anything), and the last writes to
+    stdout as normal.
+    """
+
+    # Imported here because `main.py` refers to us
+    from .main import dispatch
+
+    previous = None
+    try:
+        for i, stage in enumerate(stages):
+            is_last = i == len(stages) - 1
+            codec.FUSED_INPUT = previous
+            codec.FUSED_OUTPUT = None
+            codec.FUSING = not is_last
+
+            dispatch(["raw", *stage])
+
+            if not is_last:
+                if codec.FUSED_OUTPUT is None:
+                    raise Exception(f"Stage '{' '.join(stage)}' didn't produce any data for the next stage")
+                previous = codec.FUSED_OUTPUT
+    finally:
+        codec.FUSING = False
+        codec.FUSED_INPUT = None
+        codec.FUSED_OUTPUT = None
+
+def main_cli(args):
+    # This can't use `argparse`, as everything after the first command belongs to the stages
+    if not args or args[0] in ("-h", "--help"):
+        print(f"usage: pipe <command> [args...] [{STAGE_SEPARATOR} <command> [args...]]...\n\nRun a chain of raw scripts in one process, passing data between them directly.")
+        return
+
+    run_pipe(split_stages(args))
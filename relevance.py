@@ -0,0 +1,106 @@
+# Ranks filtered next actions by how relevant they are right now, rather than purely by deadline,
+# scheduled date, priority, and title (as `sort.py` does). Each next action gets a score from a
+# weighted sum of components, each between 0 and 1:
+#
+# - `priority`: its inherited priority (1 is the most important, so scores 1)
+# - `deadline`: how close its deadline is, in days (anything due today or overdue scores 1)
+# - `slack`: how much of the time available (the maximum time filtered by) it would use
+# - `focus`: how much of the focus available (the maximum focus filtered by) it would use
+# - `match`: how many of the available contexts and people it needs
+#
+# Components that depend on a filter that wasn't given score 0. The weights can be set with
+# `--weight <name>=<value>`. This is mirrored exactly in the actions app's JavaScript (which ranks
+# the same way when the app is exported with weights), so changes here need to be made there too.
+
+import heapq
+from .interning import CONTEXTS, PEOPLE, context_mask, people_mask
+from .sort import action_sort_key
+from .utils import DEFAULT_PRIORITY, SECONDS_PER_DAY, ts_epoch
+from .instrument import traced
+
+DEFAULT_WEIGHTS = {
+    "priority": 1.0,
+    "deadline": 1.0,
+    "slack": 0.5,
+    "focus": 0.5,
+    "match": 0.5,
+}
+# The highest focus level (see `utils.validate_focus`)
+MAX_FOCUS = 3
+
+def parse_weight(spec):
+    """
+    Parses a relevance weight given on the command line as `name=value` into a `(name, value)`
+    tuple, for use as an `argparse` type (so a typo is reported as a usage error).
+    """
+
+    import argparse
+    name, _, value = spec.partition("=")
+    if name not in DEFAULT_WEIGHTS:
+        raise argparse.ArgumentTypeError(f"unknown relevance weight '{name}' (expected one of {', '.join(DEFAULT_WEIGHTS)})")
+    try:
+        return name, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid value for relevance weight '{name}': {value}")
+
+def full_weights(weights):
+    """
+    Gets a full set of weights from the given `(name, value)` tuples (from `parse_weight`), with
+    any not given taking their defaults.
+    """
+
+    return {**DEFAULT_WEIGHTS, **dict(weights)}
+
+def relevance_scorer(date, contexts, people, max_time, max_focus, weights):
+    """
+    Creates a function that scores next actions for the given current date (a datetime, only the
+    day of which is used, and which deadlines are scored against) and filters (as given to
+    `filter.filter_next_actions`), with the given weights. Higher scores are more relevant.
+    """
+
+    today = date.toordinal()
+    available_contexts = CONTEXTS.mask(contexts)
+    available_people = PEOPLE.mask(people)
+    available_count = len(set(contexts)) + len(set(people))
+
+    def score(item):
+        priority = 1 / max(item.get("priority") or DEFAULT_PRIORITY, 1)
+
+        deadline = 0
+        if item["deadline"]:
+            days = ts_epoch(item["deadline"]) // SECONDS_PER_DAY - today
+            deadline = 1 if days <= 0 else 1 / (1 + days)
+
+        slack = 0
+        if max_time and item["time"] is not None:
+            slack = item["time"] / max_time
+
+        focus = 0
+        if max_focus is not None and item["focus"] is not None:
+            focus = 1 - (max_focus - item["focus"]) / MAX_FOCUS
+
+        match = 0
+        if available_count:
+            matched = (context_mask(item) & available_contexts).bit_count() + (people_mask(item) & available_people).bit_count()
+            match = matched / available_count
+
+        return weights["priority"] * priority + weights["deadline"] * deadline + weights["slack"] * slack + weights["focus"] * focus + weights["match"] * match
+
+    return score
+
+@traced()
+def rank_actions(actions, date, contexts, people, max_time, max_focus, weights, limit=None, offset=0):
+    """
+    Orders the given next actions from most to least relevant (see `relevance_scorer`), breaking
+    ties with the usual sort order, and returns the page of them starting at the given offset, with
+    at most the given number of them (picked out with a heap, as in `sort.sort_actions`).
+    """
+
+    score = relevance_scorer(date, contexts, people, max_time, max_focus, weights)
+
+    def key(item):
+        return (-score(item), action_sort_key(item))
+
+    if limit is not None:
+        return heapq.nsmallest(offset + limit, actions, key=key)[offset:]
+    return sorted(actions, key=key)[offset:]
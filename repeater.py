@@ -0,0 +1,223 @@
+# An in-process implementation of Org-style timestamp repeaters. This lets us expand repeating
+# timestamps locally, rather than asking the Starling server for every single occurrence, which
+# was by far the slowest part of getting normalised action items.
+
+import calendar
+import re
+from datetime import datetime, timedelta
+
+# The three Org repeater kinds: `+` shifts by the interval once, `++` shifts by the interval until
+# the timestamp is in the future, and `.+` shifts from the current date
+REPEATER_KINDS = {"+": "cumulative", "++": "catch_up", ".+": "restart"}
+REPEATER_UNITS = {"h": "hour", "d": "day", "w": "week", "m": "month", "y": "year"}
+# Starling sends repeaters in their raw Org form (e.g. `.+2w`)
+REPEATER_PATTERN = re.compile(r"(\.\+|\+\+|\+)([1-9][0-9]*)([hdwmy])")
+
+def parse_repeater(repeater):
+    """
+    Parses the given repeater from Starling, in its raw Org form (e.g. `.+2w`), into a
+    `(kind, count, unit)` tuple. Anything else is an error, as it means Starling has sent something
+    we'd otherwise silently repeat wrongly.
+    """
+
+    match = REPEATER_PATTERN.fullmatch(repeater) if isinstance(repeater, str) else None
+    if match is None:
+        raise ValueError(f"Unsupported repeater from Starling: {repeater!r}")
+
+    kind, count, unit = match.groups()
+    return REPEATER_KINDS[kind], int(count), REPEATER_UNITS[unit]
+
+def add_interval(dt, count, unit):
+    """
+    Adds the given number of units to the given datetime. Months and years clamp to the last day of
+    the target month (so January 31st plus one month is the last day of February).
+    """
+
+    if unit == "hour":
+        return dt + timedelta(hours=count)
+    elif unit == "day":
+        return dt + timedelta(days=count)
+    elif unit == "week":
+        return dt + timedelta(weeks=count)
+
+    months = count if unit == "month" else count * 12
+    year, month = divmod(dt.month - 1 + months, 12)
+    year += dt.year
+    month += 1
+    day = min(dt.day, calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
+
+def parse_datetime(ts_part):
+    """
+    Parses one side of an Orgish timestamp into a datetime.
+    """
+
+    if ts_part["time"]:
+        return datetime.fromisoformat(f"{ts_part['date']}T{ts_part['time']}")
+    return datetime.fromisoformat(ts_part["date"])
+
+def format_datetime(dt, has_time):
+    """
+    Formats the given datetime back into one side of an Orgish timestamp.
+    """
+
+    return {
+        "date": dt.strftime("%Y-%m-%d"),
+        "time": dt.strftime("%H:%M:%S") if has_time else None,
+    }
+
+def local_repeater(timestamp):
+    """
+    Parses the repeater of the given timestamp, which must have one, returning `None` if it can't be
+    repeated locally (i.e. it uses hours on a timestamp without a time), in which case the caller
+    should ask the server instead.
+    """
+
+    repeater = parse_repeater(timestamp["repeater"])
+    if repeater[2] == "hour" and timestamp["start"]["time"] is None:
+        return None
+    return repeater
+
+def intervals_within(start, count, unit, target):
+    """
+    Gets how many intervals of the given size fit between the given start and target datetimes,
+    without ever overcounting (with months and years, this can be one short). This lets repeats be
+    counted up from near the target, rather than stepping there one interval at a time from the
+    start, which could be years ago.
+    """
+
+    if target <= start:
+        return 0
+    if unit == "month" or unit == "year":
+        months = (target.year - start.year) * 12 + target.month - start.month
+        return months // (count if unit == "month" else count * 12)
+    return (target - start) // (add_interval(start, count, unit) - start)
+
+def repeat_anchor(repeater, start, now):
+    """
+    Gets the datetime the repeats of a timestamp starting at the given datetime are counted from,
+    and how many intervals on from it the first repeat is, as of the given current datetime. The
+    `n`th repeat is always computed from this anchor in one step, rather than from the repeat before
+    it, so months and years only clamp once (e.g. January 31st repeating monthly gives the last day
+    of February, then March 31st).
+    """
+
+    kind, count, unit = repeater
+    if kind == "cumulative":
+        return start, 1
+    elif kind == "catch_up":
+        # Shift at least once, and then keep going until we're in the future (for hourly
+        # repeaters, that's the future in time, not just date)
+        if unit == "hour":
+            intervals = max(intervals_within(start, count, unit, now), 1)
+            while add_interval(start, intervals * count, unit) <= now:
+                intervals += 1
+        else:
+            today = now.date()
+            intervals = max(intervals_within(start, count, unit, datetime.combine(today, datetime.min.time())), 1)
+            while add_interval(start, intervals * count, unit).date() <= today:
+                intervals += 1
+        return start, intervals
+    else:
+        # Restart from the current date, keeping the time of day. If the timestamp is already
+        # ahead of today (e.g. we're expanding future repeats), we shift from it instead so
+        # expansion always moves forward
+        base = datetime.combine(now.date(), start.time())
+        if unit == "hour":
+            base = now.replace(microsecond=0)
+        return max(base, start), 1
+
+def next_timestamp(timestamp, now=None):
+    """
+    Computes the next repeat of the given timestamp, which must have a repeater, locally, as of the
+    given current datetime (by default, now). This is equivalent to Starling's
+    `/utils/next-timestamp` endpoint, and any end of the timestamp is shifted by the same amount as
+    its start, preserving the duration.
+
+    This will return `None` if the timestamp uses hours without a time, and the caller should then
+    ask the server instead.
+    """
+
+    return nth_timestamp(timestamp, 1, now)
+
+def fixed_interval(repeater):
+    """
+    Returns the interval of the given parsed repeater as a `timedelta` if it always shifts by the
+    same amount (i.e. it's cumulative and not in months or years), or `None` otherwise.
+    """
+
+    kind, count, unit = repeater
+    if kind != "cumulative":
+        return None
+    if unit == "hour":
+        return timedelta(hours=count)
+    elif unit == "day":
+        return timedelta(days=count)
+    elif unit == "week":
+        return timedelta(weeks=count)
+    else:
+        return None
+
+def shift_timestamp(timestamp, delta):
+    """
+    Shifts both sides of the given timestamp by the given `timedelta`.
+    """
+
+    start = parse_datetime(timestamp["start"])
+    shifted = {
+        **timestamp,
+        "start": format_datetime(start + delta, timestamp["start"]["time"] is not None),
+    }
+    if timestamp["end"]:
+        end = parse_datetime(timestamp["end"])
+        shifted["end"] = format_datetime(end + delta, timestamp["end"]["time"] is not None)
+
+    return shifted
+
+def nth_timestamp(timestamp, n, now=None):
+    """
+    Computes the `n`th repeat of the given timestamp (where the zeroth is the timestamp itself),
+    jumping there directly from the timestamp (see `repeat_anchor`). Like `next_timestamp`, this
+    returns `None` if the timestamp can't be repeated locally.
+    """
+
+    if n == 0:
+        return timestamp
+
+    repeater = local_repeater(timestamp)
+    if repeater is None:
+        return None
+    _, count, unit = repeater
+
+    start = parse_datetime(timestamp["start"])
+    anchor, first = repeat_anchor(repeater, start, now or datetime.now())
+    return shift_timestamp(timestamp, add_interval(anchor, (first + n - 1) * count, unit) - start)
+
+def repeats_to_reach(timestamp, since, now=None):
+    """
+    Computes how many times the given timestamp needs to be repeated (as of the given current
+    datetime) before it ends at or after the given datetime, returning `None` if it can't be
+    repeated locally.
+    """
+
+    repeater = local_repeater(timestamp)
+    if repeater is None:
+        return None
+
+    start = parse_datetime(timestamp["start"])
+    ts_end = parse_datetime(timestamp["end"] or timestamp["start"])
+    if ts_end >= since:
+        return 0
+
+    interval = fixed_interval(repeater)
+    if interval is not None:
+        # Ceiling division over whole seconds
+        return -(-int((since - ts_end).total_seconds()) // int(interval.total_seconds()))
+
+    _, count, unit = repeater
+    anchor, first = repeat_anchor(repeater, start, now or datetime.now())
+    duration = ts_end - start
+    n = max(intervals_within(anchor, count, unit, since - duration) - first + 1, 1)
+    while add_interval(anchor, (first + n - 1) * count, unit) + duration < since:
+        n += 1
+    return n
@@ -0,0 +1,235 @@
+# A daemon which keeps action items warm in memory and runs commands sent to it by `client.py` over
+# a local Unix socket, so interactive use doesn't pay for Python startup, imports, and a full fetch
+# and expansion of the vault every time. Raw action items are refreshed in the background, and
+# normalised items are memoised until they change (see `get.WARM`).
+
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import date
+from . import cache, codec, get
+from .client import default_socket_path, read_frame, write_frame, FRAME_REQUEST, FRAME_STDIN, FRAME_STDOUT, FRAME_STDERR, FRAME_EXIT
+
+# How often to refresh action items from Starling, in seconds
+DEFAULT_REFRESH = 30
+# The options every composite requests action items with, which we fetch on startup so the first
+# command is already warm
+WARM_OPTS = {"body": True}
+
+class FrameBuffer(io.RawIOBase):
+    """
+    A binary stream that sends everything written to it over the given socket as messages of the
+    given kind, so output reaches the client as it's produced.
+    """
+
+    def __init__(self, sock, kind):
+        self.sock = sock
+        self.kind = kind
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            write_frame(self.sock, self.kind, bytes(data))
+        return len(data)
+
+class FrameWriter(io.TextIOBase):
+    """
+    A text stream over a `FrameBuffer`, which is also exposed as its `buffer`, so binary formats can
+    be written to it too (see `codec.write_output`).
+    """
+
+    def __init__(self, sock, kind, tty):
+        self.buffer = FrameBuffer(sock, kind)
+        self.tty = tty
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self.tty
+
+    def write(self, text):
+        self.buffer.write(text.encode())
+        return len(text)
+
+def refresh_action_items(last_date):
+    """
+    Refetches every set of raw action items the daemon holds (through the snapshot cache, so this is
+    cheap if nothing has changed), and drops the memoised normalised items if anything has, or if
+    the day has changed since the last refresh (as that affects repeats). This returns the date of
+    this refresh.
+    """
+
+    changed = date.today() != last_date
+    fresh_items = {}
+    for key, (opts, items) in list(get.WARM["items"].items()):
+        fresh = get.fetch_action_items(opts)
+        if fresh != items:
+            changed = True
+            items = fresh
+        fresh_items[key] = (opts, items)
+
+    if changed:
+        # Replace the items before the normalised items, so anything normalised into the new map is
+        # always from the new items
+        get.WARM["items"] = fresh_items
+        get.WARM["normalised"] = {}
+
+    return date.today()
+
+def refresh_loop(interval):
+    """
+    Refreshes action items every given number of seconds, forever. Failures (e.g. Starling being
+    down) are reported and the old items kept.
+    """
+
+    last_date = date.today()
+    while True:
+        time.sleep(interval)
+        try:
+            last_date = refresh_action_items(last_date)
+        except Exception as err:
+            print(f"Warning: failed to refresh action items: {err}", file=sys.stderr)
+
+def handle_request(conn, dispatch):
+    """
+    Runs the command in the request on the given connection, sending back its output and exit code.
+    Commands are run one at a time, as their output is captured by redirecting the global streams.
+    """
+
+    import rich
+
+    frame = read_frame(conn)
+    if frame is None or frame[0] != FRAME_REQUEST:
+        return
+    request = json.loads(frame[1])
+    argv = request["argv"]
+    stdin = b""
+    if request["stdin"]:
+        frame = read_frame(conn)
+        if frame is None or frame[0] != FRAME_STDIN:
+            return
+        stdin = frame[1]
+
+    stdout = FrameWriter(conn, FRAME_STDOUT, request["tty"])
+    stderr = FrameWriter(conn, FRAME_STDERR, False)
+    # Render for the client's terminal, not ours
+    rich.reconfigure(file=stdout, width=request["width"], force_terminal=request["tty"])
+    # Binary, underneath, so the format can be detected as if it were piped in directly (see
+    # `codec.read_input`)
+    sys.stdin = io.TextIOWrapper(io.BufferedReader(io.BytesIO(stdin)), encoding="utf-8")
+
+    code = 0
+    cache_enabled = cache.CACHE_ENABLED
+    output_format = codec.OUTPUT_FORMAT
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            # These global flags (see `main.py`) only apply to this command
+            while argv and argv[0] in ("--no-cache", "--format"):
+                flag = argv.pop(0)
+                if flag == "--format":
+                    if not argv:
+                        raise Exception("No format provided to `--format`")
+                    codec.set_output_format(argv.pop(0))
+                else:
+                    # Without the cache, the command should see the latest action items, so refetch
+                    # them (straight from the server) first
+                    cache.CACHE_ENABLED = False
+                    refresh_action_items(date.today())
+            if argv and argv[0] == "serve":
+                raise Exception("The daemon can't be started from within itself")
+
+            dispatch(argv)
+        except SystemExit as err:
+            # From `argparse`, usually
+            if isinstance(err.code, int):
+                code = err.code
+            elif err.code is not None:
+                print(err.code, file=sys.stderr)
+                code = 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdin = sys.__stdin__
+            cache.CACHE_ENABLED = cache_enabled
+            codec.OUTPUT_FORMAT = output_format
+
+    write_frame(conn, FRAME_EXIT, str(code).encode())
+
+def command_paths(argspace):
+    """
+    Gets every `module:function` command in the given tree of commands from `main.py`.
+    """
+
+    if isinstance(argspace, dict):
+        return [command for sub in argspace.values() for command in command_paths(sub)]
+    return [argspace]
+
+def serve(socket_path, refresh):
+    """
+    Starts the daemon on the given socket, refreshing action items every given number of seconds.
+    This runs until interrupted.
+    """
+
+    # Imported here because `main.py` refers to us
+    from .main import ARGS, dispatch, load_command
+
+    # Import every command up front, as that's exactly the cost the daemon is meant to avoid
+    for command in command_paths(ARGS):
+        load_command(command)
+
+    # Make sure we're not about to steal another daemon's socket
+    if os.path.exists(socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(socket_path)
+                raise Exception(f"A daemon is already serving on {socket_path}")
+            except ConnectionRefusedError:
+                os.unlink(socket_path)
+
+    # Clean up the socket when we're stopped by a service manager too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    get.WARM = {"items": {}, "normalised": {}}
+    get.get_action_items(WARM_OPTS)
+    threading.Thread(target=refresh_loop, args=(refresh,), daemon=True).start()
+
+    os.makedirs(os.path.dirname(socket_path), mode=0o700, exist_ok=True)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(socket_path)
+        os.chmod(socket_path, 0o600)
+        server.listen()
+        print(f"Serving on {socket_path}", file=sys.stderr)
+
+        try:
+            while True:
+                conn, _ = server.accept()
+                with conn:
+                    try:
+                        handle_request(conn, dispatch)
+                    except OSError:
+                        # The client went away (e.g. it was interrupted)
+                        pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve commands from warm action items over a local socket (use `client.py` to run them).", prog="serve")
+    parser.add_argument("-s", "--socket", type=str, help="The path of the socket to listen on.")
+    parser.add_argument("-r", "--refresh", type=int, default=DEFAULT_REFRESH, help="How often to refresh action items, in seconds.")
+
+    args = parser.parse_args(args)
+    serve(args.socket or default_socket_path(), args.refresh)
@@ -1,21 +1,51 @@
-from datetime import datetime, timedelta
-
-from utils import DEFAULT_PRIORITY
-
-def sort_actions(actions):
-    critical_cutoff = datetime.now() + timedelta(days=1)
-    critical_cutoff.replace(hour=23, minute=59, second=59)
-    critical_cutoff = datetime.strftime(critical_cutoff, "%Y-%m-%d")
-
-    actions.sort(
-        key=lambda item:
-            (
-                item["deadline"]["date"] if item["deadline"] else "9999",
-                item["deadline"]["time"] or "9999" if item["deadline"] else "9999",
-                item["scheduled"]["date"] if item["scheduled"] else "9999",
-                item["scheduled"]["time"] or "9999" if item["scheduled"] else "9999",
-                item.get("priority") or DEFAULT_PRIORITY, # Lower is better
-                item["title"]
-            )
+import heapq
+
+from .utils import DEFAULT_PRIORITY, SECONDS_PER_DAY, ts_epoch
+from .instrument import traced
+
+# Sorts after every real date, like `9999` did when we sorted on the strings
+MISSING = float("inf")
+MISSING_KEY = (MISSING, MISSING)
+
+def planning_sort_key(ts):
+    """
+    Produces a sort key for the given planning timestamp from its pre-parsed form, ordering by
+    date and then time, with dates that have no time after all those that do on the same day.
+    """
+
+    if not ts:
+        return MISSING_KEY
+    epoch = ts_epoch(ts)
+    return (epoch // SECONDS_PER_DAY, epoch % SECONDS_PER_DAY if ts["time"] else SECONDS_PER_DAY)
+
+def action_sort_key(item):
+    """
+    Produces the key next actions are sorted by: deadline, then scheduled date, then priority, and
+    then title.
+    """
+
+    # Most next actions have neither, so we skip the call for them
+    deadline = item["deadline"]
+    scheduled = item["scheduled"]
+    return (
+        planning_sort_key(deadline) if deadline else MISSING_KEY,
+        planning_sort_key(scheduled) if scheduled else MISSING_KEY,
+        item.get("priority") or DEFAULT_PRIORITY, # Lower is better
+        item["title"]
     )
-    return actions
+
+@traced()
+def sort_actions(actions, limit=None, offset=0):
+    """
+    Sorts the given next actions (in place, if they're all needed), returning the page of them
+    starting at the given offset, with at most the given number of them. When there's a limit, the
+    page is picked out with a heap, which is far cheaper than sorting everything when only the
+    first screenful is needed, and gives exactly the same order.
+    """
+
+    if limit is not None:
+        # This is documented to be the same as `sorted(...)[:n]`, ties included
+        return heapq.nsmallest(offset + limit, actions, key=action_sort_key)[offset:]
+
+    actions.sort(key=action_sort_key)
+    return actions[offset:] if offset else actions
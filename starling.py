@@ -0,0 +1,83 @@
+# A shared HTTP client for the Starling server. Every call to Starling goes through the one
+# keep-alive session here, so we don't open a fresh connection for each request, and so the base
+# URL, timeouts, and retries are all configured in one place.
+
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .utils import starling_api
+from . import instrument
+from .instrument import count, span
+from .cassette import mount
+
+# These can be overridden with `$STARLING_TIMEOUT` (in seconds) and `$STARLING_RETRIES`
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 2
+POOL_SIZE = 16
+
+# Every call made in this process while profiling (see `instrument.py`), as `(method, path, status,
+# seconds)`
+CALL_TIMINGS = []
+
+_session = None
+# Commands can make their first requests from several threads at once, and they must all share the
+# one session
+_session_lock = threading.Lock()
+
+def starling_url(path):
+    """
+    Produces the full URL for the given path on the Starling server, which can be overridden with
+    `$STARLING_API`.
+    """
+
+    return f"{starling_api().rstrip('/')}/{path.lstrip('/')}"
+
+def get_session():
+    """
+    Gets the shared session, creating it on first use with connection pooling and retries on
+    connection failures and transient server errors.
+    """
+
+    global _session
+    if _session is not None:
+        return _session
+
+    with _session_lock:
+        if _session is None:
+            retries = Retry(
+                total=int(os.environ.get("STARLING_RETRIES", DEFAULT_RETRIES)),
+                backoff_factor=0.2,
+                status_forcelist=[502, 503, 504],
+                # Everything we send is a read, even with a JSON body
+                allowed_methods=None,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retries)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            mount(session)
+            _session = session
+
+    return _session
+
+def starling_get(path, **kwargs):
+    """
+    Makes a GET request to the given path on the Starling server through the shared session,
+    passing through any extra arguments to `requests` (e.g. `json`). This returns the raw response,
+    so callers can handle errors as they see fit.
+    """
+
+    kwargs.setdefault("timeout", float(os.environ.get("STARLING_TIMEOUT", DEFAULT_TIMEOUT)))
+
+    count("http_calls")
+    start = time.perf_counter()
+    with span("http", path=path):
+        response = get_session().get(starling_url(path), **kwargs)
+    if instrument.ENABLED:
+        CALL_TIMINGS.append(("GET", path, response.status_code, time.perf_counter() - start))
+
+    return response
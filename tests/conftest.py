@@ -0,0 +1,35 @@
+# The scripts are a package (`scheduling_scripts`) whose root is the repository itself, so this loads
+# it under that name before any tests import from it.
+
+import importlib.util
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+if "scheduling_scripts" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("scheduling_scripts", ROOT / "__init__.py", submodule_search_locations=[str(ROOT)])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["scheduling_scripts"] = package
+    spec.loader.exec_module(package)
+
+def run_main(tmp_path, *argv, python_args=(), env=None, stdin=None, text=True):
+    """
+    Runs `main.py` with the given arguments in a fresh interpreter (with the given extra arguments
+    to Python, environment variables, and stdin), returning the finished process. Its output is
+    captured as bytes unless `text` is set.
+    """
+
+    # The package has to be importable under its own name, which the checkout may not be
+    package_path = tmp_path / "package"
+    if not package_path.exists():
+        package_path.mkdir()
+        (package_path / "scheduling_scripts").symlink_to(ROOT)
+
+    env = {**os.environ, **(env or {}), "PYTHONPATH": str(package_path)}
+    return subprocess.run(
+        [sys.executable, *python_args, "-m", "scheduling_scripts.main", *argv],
+        env=env, cwd=tmp_path, stdin=stdin, capture_output=True, text=text, check=True,
+    )
@@ -0,0 +1,15 @@
+# Tests the on-disk snapshot cache's keys.
+
+from scheduling_scripts.cache import snapshot_path
+
+def test_snapshot_key_includes_server(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    opts = {"conn_format": "markdown", "metadata": True}
+
+    monkeypatch.setenv("STARLING_API", "http://localhost:3000/")
+    local = snapshot_path(opts)
+    monkeypatch.setenv("STARLING_API", "http://localhost:3000")
+    assert snapshot_path(opts) == local
+
+    monkeypatch.setenv("STARLING_API", "http://other:3000/")
+    assert snapshot_path(opts) != local
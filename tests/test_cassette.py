@@ -0,0 +1,51 @@
+# Tests recording requests to a cassette and replaying them, against the stub Starling server from
+# `bench/stub.py`.
+
+from datetime import date, datetime, timedelta
+import pytest
+from scheduling_scripts import cache, cassette, get, starling
+from scheduling_scripts.bench.stub import start_stub
+
+TODAY = date(2024, 3, 20)
+UNTIL = datetime.combine(TODAY + timedelta(days=14), datetime.max.time())
+TIMESTAMP = {"start": {"date": "2024-03-10", "time": None}, "end": None, "repeater": "+1w"}
+
+@pytest.fixture
+def fresh_session(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(starling, "_session", None)
+    yield
+    cassette.MODE = None
+    cassette.PATH = None
+
+def run_requests():
+    # Every cassette is mounted when the session is created
+    starling._session = None
+    return get.get_normalised_action_items(UNTIL, ["body"]), get.get_next_timestamp(TIMESTAMP)
+
+def test_round_trip(fresh_session, monkeypatch, tmp_path):
+    path = tmp_path / "cassette.json.gz"
+    server, _ = start_stub(200, TODAY, seed=2)
+    monkeypatch.setenv("STARLING_API", f"http://127.0.0.1:{server.server_port}/")
+    try:
+        cassette.start_recording(path)
+        recorded = run_requests()
+        cassette.save()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Nothing's listening now, so these can only come from the cassette
+    cassette.start_replay(path)
+    assert run_requests() == recorded
+    assert recorded[1]["start"]["date"] == "2024-03-17"
+
+def test_replay_without_recording_fails(fresh_session, monkeypatch, tmp_path):
+    path = tmp_path / "cassette.json.gz"
+    cassette.start_recording(path)
+    cassette.save()
+
+    monkeypatch.setenv("STARLING_API", "http://127.0.0.1:9/")
+    cassette.start_replay(path)
+    with pytest.raises(Exception, match="No recorded response"):
+        run_requests()
@@ -0,0 +1,134 @@
+# Tests reading and writing the different formats: that each binary format round-trips action items
+# (whole or streamed), that its header is detected on input, and that bad headers and missing
+# packages fail cleanly.
+
+import io
+import json
+import sys
+from datetime import date
+import pytest
+from conftest import run_main
+from scheduling_scripts import codec
+from scheduling_scripts.bench.vault import generate_vault
+from scheduling_scripts.get import split_timestamps
+from scheduling_scripts.next_actions import filter_to_next_actions
+
+ITEMS = [
+    {
+        "id": "a",
+        "title": "Renew passport",
+        "keyword": "TODO",
+        "priority": None,
+        "metadata": {
+            "timestamp": None,
+            "scheduled": {"start": {"date": "2024-03-20", "time": "09:30:00", "epoch": 63846523800}, "end": None},
+            "deadline": {"start": {"date": "2024-04-01", "time": None, "epoch": 63847584000}, "end": None},
+            "closed": None,
+            "properties": {"TIME": "1hr", "FOCUS": "low", "PEOPLE": ["Sam", "sam-id"]},
+            "tags": ["admin", "errands"],
+        },
+        "parent_tags": [],
+        "body": "Forms are in the étagère.",
+    },
+    {"id": "b", "title": "Nothing set", "keyword": "PROJ", "priority": 2, "metadata": {}, "parent_tags": None, "body": None},
+]
+
+class RecordingStdout(io.StringIO):
+    """
+    A text stream that records what had been written each time it was flushed.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.flushed = []
+
+    def flush(self):
+        self.flushed.append(self.getvalue())
+
+def binary_stdin(monkeypatch, data):
+    """
+    Points stdin at the given bytes, as if they'd been piped in.
+    """
+
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BufferedReader(io.BytesIO(data)), encoding="utf-8"))
+
+def write(monkeypatch, data, stream):
+    """
+    Writes the given data in the current output format, returning the bytes written.
+    """
+
+    stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    monkeypatch.setattr("sys.stdout", stdout)
+    codec.write_output(data, stream)
+    stdout.flush()
+    return stdout.buffer.getvalue()
+
+@pytest.fixture(params=list(codec.CODECS))
+def binary_format(request, monkeypatch):
+    try:
+        codec.CODECS[request.param]()
+    except Exception as err:
+        pytest.skip(str(err))
+    monkeypatch.setattr(codec, "OUTPUT_FORMAT", request.param)
+    return request.param
+
+def test_json_stream_flushes_each_line(monkeypatch):
+    stdout = RecordingStdout()
+    monkeypatch.setattr("sys.stdout", stdout)
+
+    codec.write_output(iter([{"id": "a"}, {"id": "b"}]), stream=True)
+    assert stdout.flushed == ['{"id": "a"}\n', '{"id": "a"}\n{"id": "b"}\n']
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_binary_round_trip(binary_format, monkeypatch, stream):
+    written = write(monkeypatch, iter(ITEMS) if stream else ITEMS, stream)
+    assert written.startswith(codec.MAGIC_PREFIX + binary_format.encode() + b"\n")
+
+    binary_stdin(monkeypatch, written)
+    read = codec.read_input(stream)
+    assert (list(read) if stream else read) == ITEMS
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_json_is_read_without_a_header(monkeypatch, stream):
+    data = "\n".join(json.dumps(item) for item in ITEMS) if stream else json.dumps(ITEMS)
+    binary_stdin(monkeypatch, data.encode())
+    read = codec.read_input(stream)
+    assert (list(read) if stream else read) == ITEMS
+
+@pytest.mark.parametrize("data,message", [
+    (codec.MAGIC_PREFIX + b"yaml\n{}", "unknown format: yaml"),
+    (b"\x00XX\n{}", "valid format header"),
+])
+def test_bad_headers_are_rejected(monkeypatch, data, message):
+    binary_stdin(monkeypatch, data)
+    with pytest.raises(ValueError, match=message):
+        codec.read_input()
+
+@pytest.mark.parametrize("name,package", [("msgpack", "msgpack"), ("cbor", "cbor2")])
+def test_missing_packages_are_named(monkeypatch, name, package):
+    monkeypatch.setitem(sys.modules, package, None)
+    binary_stdin(monkeypatch, codec.MAGIC_PREFIX + name.encode() + b"\n")
+    with pytest.raises(Exception, match=f"`{package}` package"):
+        codec.read_input()
+
+@pytest.mark.parametrize("ndjson", [False, True])
+def test_binary_between_stages(binary_format, tmp_path, ndjson):
+    items, _, _ = generate_vault(300, date(2024, 3, 20), seed=3)
+    next_actions = filter_to_next_actions(split_timestamps(items))
+    path = tmp_path / "next_actions.json"
+    path.write_text("\n".join(json.dumps(item) for item in next_actions) if ndjson else json.dumps(next_actions))
+    flags = ["--ndjson"] if ndjson else []
+
+    with open(path) as stdin:
+        expected = run_main(tmp_path, "raw", "filter", "-u", "2024-03-20", *flags, stdin=stdin).stdout
+    assert expected.strip()
+    with open(path) as stdin:
+        encoded = run_main(tmp_path, "--format", binary_format, "raw", "filter", "-u", "2024-03-20", *flags, stdin=stdin, text=False).stdout
+    assert encoded.startswith(codec.MAGIC_PREFIX)
+
+    # The next stage detects the format itself
+    binary = tmp_path / "filtered.bin"
+    binary.write_bytes(encoded)
+    with open(binary) as stdin:
+        decoded = run_main(tmp_path, "raw", "filter", "-u", "2024-03-20", *flags, stdin=stdin).stdout
+    assert decoded == expected
@@ -0,0 +1,87 @@
+# Tests filtering next actions from a synthetic vault: that NumPy columns give exactly the same
+# results as the plain loop, and that next actions filter the same after being written out as JSON
+# and read into another process (which interns contexts and people in its own order).
+
+import json
+from datetime import date
+import pytest
+from conftest import run_main
+from scheduling_scripts.actions_app import format_actions_for_app
+from scheduling_scripts.bench.filtering import filter_queries
+from scheduling_scripts.bench.vault import FOCUSES, generate_vault
+from scheduling_scripts.columnar import NextActionColumns
+from scheduling_scripts.filter import filter_next_actions
+from scheduling_scripts.get import split_timestamps
+from scheduling_scripts.next_actions import filter_to_next_actions
+
+TODAY = date(2024, 3, 20)
+
+@pytest.fixture
+def next_actions():
+    items, _, _ = generate_vault(1000, TODAY, seed=5)
+    return filter_to_next_actions(split_timestamps(items))
+
+def people_in(next_actions):
+    return sorted({person for item in next_actions for person, _ in item["people"] or []})
+
+def ids(actions):
+    return [item["id"] for item in actions]
+
+def test_columns_match_loop(next_actions):
+    pytest.importorskip("numpy")
+    columns = NextActionColumns(next_actions)
+
+    for query in filter_queries(TODAY, people_in(next_actions)[:10]):
+        assert ids(filter_next_actions(columns, *query)) == ids(filter_next_actions(next_actions, *query))
+
+def test_columns_match_loop_with_hundreds_of_people(next_actions):
+    pytest.importorskip("numpy")
+    # More people than fit in a byte, none of whom are available
+    crowded = next(item for item in next_actions if item["keyword"] == "TODO" and item["surface"])
+    crowded["people"] = [[f"Person {i}", f"person-{i}"] for i in range(256)]
+    columns = NextActionColumns(next_actions)
+
+    query = filter_queries(TODAY, ["Nobody"])[4]
+    expected = filter_next_actions(next_actions, *query)
+    assert crowded["id"] not in ids(expected)
+    assert ids(filter_next_actions(columns, *query)) == ids(expected)
+
+def test_json_carries_no_bitmasks(next_actions):
+    assert all(key not in item for item in next_actions for key in ("context_mask", "people_mask"))
+
+def test_app_keeps_each_actions_own_order(next_actions):
+    # Interned in the opposite order to how the action lists them, with a repeat
+    filter_next_actions(next_actions, *filter_queries(TODAY, ["Yan", "Xu"])[5])
+    action = next(item for item in next_actions if item["keyword"] == "TODO" and item["surface"])
+    action["context"] = ["phone", "home", "phone"]
+    action["people"] = [["Xu", "xu"], ["Yan", "yan"]]
+
+    contexts, people, formatted, _ = format_actions_for_app([action])
+    assert contexts == ["phone", "home"]
+    assert people == ["Xu", "Yan"]
+    assert formatted[0][3:5] == [[0, 1, 0], [0, 1]]
+
+def test_another_process_filters_the_same(next_actions, tmp_path):
+    people = people_in(next_actions)
+    # Intern in an order the other process won't
+    filter_next_actions(next_actions, *filter_queries(TODAY, people[::-1])[5])
+
+    path = tmp_path / "next_actions.json"
+    path.write_text(json.dumps(next_actions))
+    for query in filter_queries(TODAY, people[:10]):
+        until, contexts, people_filter, max_time, max_focus, ty = query
+        argv = ["raw", "filter", "-u", until.strftime("%Y-%m-%d")]
+        argv += [arg for context in contexts for arg in ("-c", context)]
+        argv += [arg for person in people_filter for arg in ("-p", person)]
+        if max_time is not None:
+            argv += ["-t", f"{max_time}m"]
+        if max_focus is not None:
+            argv += ["-f", FOCUSES[max_focus]]
+        if ty != "all":
+            argv.append(f"--{ty}")
+
+        with open(path) as stdin:
+            result = run_main(tmp_path, *argv, stdin=stdin)
+        # The command's `until` is the start of the day, not the end
+        expected = filter_next_actions(next_actions, until.replace(hour=0, minute=0, second=0, microsecond=0), *query[1:])
+        assert ids(json.loads(result.stdout)) == ids(expected)
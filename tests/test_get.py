@@ -0,0 +1,31 @@
+# Tests getting and expanding action items, on a synthetic vault from `bench/vault.py` in place of
+# the Starling server.
+
+from datetime import date, datetime, timedelta
+import pytest
+from scheduling_scripts import get
+from scheduling_scripts.bench.vault import generate_vault
+
+TODAY = date(2024, 3, 20)
+UNTIL = datetime.combine(TODAY + timedelta(days=14), datetime.max.time())
+
+@pytest.fixture
+def vault(monkeypatch):
+    items, _, _ = generate_vault(300, TODAY, seed=1)
+    monkeypatch.setattr(get, "get_action_items", lambda opts: items)
+    return items
+
+def test_threads_give_the_same_order(vault):
+    expected = get.get_normalised_action_items(UNTIL, workers=1)
+    assert get.get_normalised_action_items(UNTIL, workers=4) == expected
+
+def test_threads_only_expand_a_window_ahead(vault, monkeypatch):
+    expanded = []
+    monkeypatch.setattr(get, "repeat_until", lambda item, until, since: expanded.append(item) or [item])
+
+    workers = 3
+    consumed = 0
+    for _ in get.iter_normalised_action_items(UNTIL, workers=workers):
+        consumed += 1
+        assert len(expanded) <= consumed + workers * get.WINDOW_PER_WORKER
+    assert consumed == len(expanded)
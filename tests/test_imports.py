@@ -0,0 +1,34 @@
+# Checks that simple commands stay cheap to start, since pipelines of `raw` commands pay for Python's
+# startup and imports in every stage (see `main.py`).
+
+from conftest import run_main
+
+# The most all imports for `raw filter --help` can take, in microseconds (it's about 60ms)
+IMPORT_BUDGET_US = 250_000
+# Heavy optional packages only some commands need
+HEAVY_PACKAGES = ("requests", "rich", "numpy")
+
+def import_times(tmp_path, *argv):
+    """
+    Runs `main.py` with the given arguments under `python -X importtime`, returning a map of every
+    module it imported to how long that took by itself, in microseconds.
+    """
+
+    result = run_main(tmp_path, *argv, python_args=["-X", "importtime"])
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, module = line.removeprefix("import time:").split("|")
+        times[module.strip()] = int(self_us)
+    return times
+
+def test_raw_filter_imports(tmp_path):
+    times = import_times(tmp_path, "raw", "filter", "--help")
+    # Commands are imported with `importlib`, which isn't timed itself, but their imports are
+    assert "scheduling_scripts.sort" in times
+
+    heavy = [module for module in times if module.split(".")[0] in HEAVY_PACKAGES]
+    assert heavy == []
+    assert sum(times.values()) < IMPORT_BUDGET_US
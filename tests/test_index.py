@@ -0,0 +1,60 @@
+# Tests the hierarchy index against walking the tree for every item, on a synthetic vault from
+# `bench/vault.py`.
+
+from datetime import date, datetime, timedelta
+import pytest
+from scheduling_scripts import get
+from scheduling_scripts.bench.vault import generate_vault
+from scheduling_scripts.index import ItemIndex, hierarchy_index
+from scheduling_scripts.utils import format_proj_body, parse_priority
+
+TODAY = date(2024, 3, 20)
+UNTIL = datetime.combine(TODAY + timedelta(days=14), datetime.max.time())
+
+@pytest.fixture
+def items(monkeypatch):
+    items, _, _ = generate_vault(500, TODAY, seed=3)
+    monkeypatch.setattr(get, "get_action_items", lambda opts: items)
+    return get.get_normalised_action_items(UNTIL)
+
+def walked_priority(item, by_id):
+    """
+    Gets the given item's priority by walking up its parents, as the index replaces.
+    """
+
+    priority = parse_priority(item["metadata"]["priority"], item["id"])
+    parent = by_id.get(item["parent_id"])
+    while parent is not None:
+        priority = min(priority, parse_priority(parent["metadata"]["priority"], parent["id"]))
+        parent = by_id.get(parent["parent_id"])
+    return priority
+
+def test_priorities_match_walking_up(items):
+    index = ItemIndex(items)
+    hierarchy = hierarchy_index(index)
+    for item in items:
+        assert hierarchy.priority(item) == walked_priority(item, index.by_id)
+
+def test_project_bodies_list_their_tasks(items):
+    index = ItemIndex(items)
+    hierarchy = hierarchy_index(index)
+    projects = [item for item in items if item["metadata"]["keyword"] == "PROJ"]
+    assert projects
+
+    for proj in projects:
+        tasks = [index.by_id[id] for id, _ in proj["children"] if id in index.by_id]
+        assert hierarchy.project_body(proj) == format_proj_body(proj, tasks)
+    # Built once per set of items
+    assert hierarchy_index(index) is hierarchy
+
+def test_invalid_priority_is_reported_lazily(items):
+    items = [dict(item, metadata=dict(item["metadata"])) for item in items]
+    parent = next(item for item in items if any(other["parent_id"] == item["id"] for other in items))
+    parent["metadata"]["priority"] = "urgent"
+    hierarchy = hierarchy_index(ItemIndex(items))
+
+    child = next(item for item in items if item["parent_id"] == parent["id"])
+    with pytest.raises(ValueError, match="Invalid priority value"):
+        hierarchy.priority(child)
+    unrelated = next(item for item in items if item["parent_id"] is None and item is not parent)
+    hierarchy.priority(unrelated)
@@ -0,0 +1,23 @@
+# Tests the spans recorded for profiling.
+
+import time
+from scheduling_scripts import instrument
+
+def slow_items(n, delay):
+    for i in range(n):
+        time.sleep(delay)
+        yield i
+
+def test_timed_iter_excludes_the_caller(monkeypatch):
+    monkeypatch.setattr(instrument, "ENABLED", True)
+    monkeypatch.setattr(instrument, "SPANS", [])
+
+    with instrument.span("consume"):
+        for _ in instrument.timed_iter("produce", slow_items(3, 0.01), items_in=3):
+            time.sleep(0.03)
+
+    summary = instrument.summarise_spans()
+    assert summary["produce"]["items_in"] == 3
+    assert summary["produce"]["items_out"] == 3
+    assert 0.03 <= summary["produce"]["total"] < 0.06
+    assert summary["consume"]["total"] >= 0.12
@@ -0,0 +1,103 @@
+# Tests ranking next actions by relevance: that deadlines are scored against the current date rather
+# than the date filtered until, that bad weights are usage errors, and that the actions app's
+# JavaScript ranks exactly as `relevance.py` does (when `node` is installed to run it).
+
+import json
+import shutil
+import subprocess
+from datetime import date, datetime, timedelta
+import pytest
+from conftest import ROOT, run_main
+from scheduling_scripts.actions_app import format_actions_for_app
+from scheduling_scripts.bench.vault import CONTEXTS, generate_vault
+from scheduling_scripts.filter import filter_next_actions
+from scheduling_scripts.get import split_timestamps
+from scheduling_scripts.next_actions import filter_to_next_actions
+from scheduling_scripts.relevance import DEFAULT_WEIGHTS, rank_actions
+from scheduling_scripts.sort import sort_actions
+
+TODAY = date(2024, 3, 20)
+
+# Runs the app's filter (everything before the page is set up) on the data given on stdin, printing
+# the indices (which replace the HTML) of the actions it shows, in order
+JS_HARNESS = """
+const fs = require("fs");
+const [source, query] = process.argv.slice(2);
+const data = fs.readFileSync(0, "utf8");
+global.document = { getElementById: () => ({ textContent: data }) };
+const app = fs.readFileSync(source, "utf8").split("// Populate the context/people dropdowns")[0];
+const [year, month, day, contexts, people, time, focus] = JSON.parse(query);
+console.log(JSON.stringify(eval(app + "; filter(new Date(year, month - 1, day), contexts, people, time, focus, 'all')")));
+"""
+
+def action(title, deadline, priority):
+    return {
+        "id": title, "title": title, "keyword": "TODO", "surface": True, "scheduled": None,
+        "deadline": {"date": deadline.isoformat(), "time": None}, "priority": priority,
+        "context": None, "people": None, "time": None, "focus": None,
+    }
+
+def ids(actions):
+    return [item["id"] for item in actions]
+
+def test_deadlines_are_ranked_against_the_current_date():
+    # Against today, the imminent deadline outweighs the priority; were the deadline 10 days out
+    # scored against `until`, it would be due and win on priority too
+    next_actions = [action("later", TODAY + timedelta(days=10), 1), action("now", TODAY, 3)]
+    today = datetime.combine(TODAY, datetime.min.time())
+    until = today + timedelta(days=10)
+
+    ranked = filter_next_actions(next_actions, until, [], [], None, None, "all", weights=DEFAULT_WEIGHTS, date=today)
+    assert ids(ranked) == ["now", "later"]
+
+@pytest.mark.parametrize("weight", ["foo=1", "deadline=lots", "deadline"])
+def test_bad_weights_are_usage_errors(tmp_path, weight):
+    with pytest.raises(subprocess.CalledProcessError) as err:
+        run_main(tmp_path, "raw", "filter", "-u", "2024-03-20", "-w", weight, stdin=subprocess.DEVNULL)
+    assert err.value.returncode == 2
+    assert "relevance weight" in err.value.stderr
+    assert "Traceback" not in err.value.stderr
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs `node` to run the actions app")
+@pytest.mark.parametrize("contexts,people,time,focus", [
+    (None, None, None, None),
+    (CONTEXTS[:3], None, "1hr", 2),
+    (CONTEXTS, None, "30m", 1),
+    (None, "people", None, 3),
+])
+def test_app_ranks_like_python(tmp_path, contexts, people, time, focus):
+    items, _, _ = generate_vault(800, TODAY, seed=11)
+    next_actions = filter_to_next_actions(split_timestamps(items))
+    weights = {"priority": 1.0, "deadline": 2.0, "slack": 0.5, "focus": 0.25, "match": 0.75}
+    if people == "people":
+        people = sorted({person for item in next_actions for person, _ in item["people"] or []})[:5]
+    # Names an action lists twice still only match once
+    for item in next_actions[::7]:
+        if item["context"]:
+            item["context"] = [*item["context"], item["context"][0]]
+
+    data = format_actions_for_app(next_actions, weights)
+    for i, formatted in enumerate(data[2]):
+        formatted[0] = str(i)
+    # The app can only be given contexts and people it knows about
+    contexts = contexts and [context for context in contexts if context in data[0]]
+    people = people and [person for person in people if person in data[1]]
+
+    harness = tmp_path / "harness.js"
+    harness.write_text(JS_HARNESS)
+    query = json.dumps([TODAY.year, TODAY.month, TODAY.day, contexts, people, time, focus])
+    result = subprocess.run(
+        ["node", str(harness), str(ROOT / "actions_app" / "index.js"), query],
+        input=json.dumps(data), check=True, text=True, capture_output=True,
+    )
+    js_order = [int(i) for i in json.loads(result.stdout)]
+    assert js_order
+
+    # The app holds the same actions, in date order, so rank those it filtered to
+    ordered = sort_actions([item for item in next_actions if item["surface"] and item["keyword"] != "PROJ"])
+    max_time = {None: None, "1hr": 60, "30m": 30}[time]
+    ranked = rank_actions(
+        [ordered[i] for i in sorted(js_order)], datetime.combine(TODAY, datetime.min.time()),
+        contexts or [], people or [], max_time, focus, weights,
+    )
+    assert ids(ranked) == ids(ordered[i] for i in js_order)
@@ -0,0 +1,79 @@
+# Tests the local repeater implementation against the cases in `fixtures/next_timestamp.json`, which
+# are written out by hand from Org's repeater semantics in the shape of Starling's
+# `/utils/next-timestamp` endpoint (each with the current datetime it applies at), and checks that
+# repeats in months and years are computed from the original timestamp rather than drifting.
+
+import json
+from datetime import datetime
+from pathlib import Path
+import pytest
+from scheduling_scripts.get import repeat_until
+from scheduling_scripts.repeater import next_timestamp, nth_timestamp, parse_repeater, repeats_to_reach
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+with open(FIXTURES / "next_timestamp.json") as f:
+    CASES = json.load(f)["cases"]
+
+def timestamp(start, repeater, end=None):
+    return {"start": {"date": start, "time": None}, "end": end and {"date": end, "time": None}, "repeater": repeater}
+
+@pytest.mark.parametrize("case", CASES, ids=lambda case: f"{case['request']['repeater']}@{case['request']['start']['date']}")
+def test_next_timestamp_matches_org(case):
+    now = datetime.fromisoformat(case["now"])
+    request = {key: value for key, value in case["request"].items() if key != "active"}
+    expected = case["response"]
+
+    actual = next_timestamp(request, now)
+    assert actual["start"] == expected["start"]
+    assert actual["end"] == expected["end"]
+    assert actual["repeater"] == expected["repeater"]
+
+def test_cases_cover_every_kind_and_unit():
+    repeaters = {parse_repeater(case["request"]["repeater"]) for case in CASES}
+    kinds = {(kind, unit) for kind, _, unit in repeaters}
+    assert kinds >= {(kind, unit) for kind in ("cumulative", "catch_up", "restart") for unit in ("hour", "day", "week", "month", "year")}
+
+@pytest.mark.parametrize("repeater", ["+1x", "1d", "+0d", "+-1d", "+ 1d", "++", {"kind": "+", "count": 1, "unit": "d"}, None])
+def test_parse_repeater_rejects_unknown_shapes(repeater):
+    with pytest.raises(ValueError):
+        parse_repeater(repeater)
+
+def test_nth_timestamp_is_anchored_to_the_original():
+    ts = timestamp("2024-01-31", "+1m")
+    assert [nth_timestamp(ts, n)["start"]["date"] for n in (1, 2, 3, 13)] == ["2024-02-29", "2024-03-31", "2024-04-30", "2025-02-28"]
+
+def test_catch_up_repeats_are_anchored_to_the_original():
+    ts = timestamp("2024-01-31", "++1m")
+    now = datetime(2024, 2, 10, 12)
+    assert [nth_timestamp(ts, n, now)["start"]["date"] for n in (1, 2)] == ["2024-02-29", "2024-03-31"]
+
+@pytest.mark.parametrize("repeater,expected", [("++1d", "2024-03-21"), ("++3w", "2024-03-23"), ("++1m", "2024-03-31"), ("++2y", "2024-03-31")])
+def test_catch_up_from_long_ago(repeater, expected):
+    # Decades of repeats are jumped over, rather than stepped through
+    ts = timestamp("1990-03-31", repeater)
+    assert next_timestamp(ts, datetime(2024, 3, 20, 12))["start"]["date"] == expected
+
+@pytest.mark.parametrize("repeater", ["+1m", "++1m", ".+1m", "++2w", "+1y"])
+def test_repeats_to_reach_is_the_first_repeat_there(repeater):
+    ts = timestamp("2001-01-31", repeater)
+    now = datetime(2024, 3, 20, 12)
+    since = datetime(2024, 6, 1)
+    n = repeats_to_reach(ts, since, now)
+    assert datetime.fromisoformat(nth_timestamp(ts, n, now)["start"]["date"]) >= since
+    assert n == 1 or datetime.fromisoformat(nth_timestamp(ts, n - 1, now)["start"]["date"]) < since
+
+def test_repeats_to_reach_months():
+    ts = timestamp("2024-01-31", "+1m")
+    assert repeats_to_reach(ts, datetime(2024, 3, 31)) == 2
+    assert repeats_to_reach(ts, datetime(2024, 4, 1)) == 3
+
+def monthly_item():
+    return {"id": "a", "metadata": {"timestamp": timestamp("2024-01-31", "+1m"), "scheduled": None, "deadline": None, "closed": None}}
+
+def test_repeat_until_does_not_drift():
+    repeats = repeat_until(monthly_item(), datetime(2024, 5, 30), now=datetime(2024, 3, 20))
+    assert [repeat["metadata"]["timestamp"]["start"]["date"] for repeat in repeats] == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]
+
+    skipped = repeat_until(monthly_item(), datetime(2024, 5, 30), since=datetime(2024, 4, 1), now=datetime(2024, 3, 20))
+    assert [repeat["metadata"]["timestamp"]["start"]["date"] for repeat in skipped] == ["2024-01-31", "2024-04-30"]
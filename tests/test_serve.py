@@ -0,0 +1,119 @@
+# Tests the daemon's handling of requests and its memoised items.
+
+import io
+import copy
+import json
+import socket
+from datetime import date, datetime, timedelta
+import pytest
+import rich
+from scheduling_scripts import cache, codec, get, serve
+from scheduling_scripts.bench.vault import generate_vault
+from scheduling_scripts.client import FRAME_EXIT, FRAME_REQUEST, FRAME_STDIN, FRAME_STDOUT, read_frame, write_frame
+
+OPTS = {"conn_format": "markdown", "metadata": True, "children": True}
+
+@pytest.fixture
+def warm(monkeypatch):
+    monkeypatch.setattr(get, "WARM", {"items": {json.dumps(OPTS, sort_keys=True): (OPTS, ["old"])}, "normalised": {}})
+    return get.WARM
+
+def send_request(argv, dispatch, stdin=None):
+    """
+    Runs the given command through `serve.handle_request` (with the given bytes on stdin), returning
+    its exit code and what it wrote to stdout.
+    """
+
+    client, server = socket.socketpair()
+    stdout = b""
+    try:
+        with client, server:
+            write_frame(client, FRAME_REQUEST, json.dumps({"argv": argv, "tty": False, "width": 80, "stdin": stdin is not None}).encode())
+            if stdin is not None:
+                write_frame(client, FRAME_STDIN, stdin)
+            serve.handle_request(server, dispatch)
+            while True:
+                kind, payload = read_frame(client)
+                if kind == FRAME_STDOUT:
+                    stdout += payload
+                elif kind == FRAME_EXIT:
+                    return int(payload), stdout
+    finally:
+        # The daemon points `rich` at the client
+        rich.reconfigure()
+
+def test_no_cache_refetches_without_replacing_warm(warm, monkeypatch):
+    fetches = []
+    def fetch(opts):
+        fetches.append(cache.CACHE_ENABLED)
+        return ["new"]
+    monkeypatch.setattr(get, "fetch_action_items", fetch)
+
+    seen = []
+    def dispatch(argv):
+        seen.append((argv, cache.CACHE_ENABLED, get.get_action_items({})))
+
+    assert send_request(["--no-cache", "filter"], dispatch) == (0, b"")
+    assert fetches == [False]
+    assert seen == [(["filter"], False, ["new"])]
+    assert get.WARM is warm
+    assert cache.CACHE_ENABLED
+
+def test_memo_is_shared_within_a_day(warm, monkeypatch):
+    expansions = []
+    monkeypatch.setattr(get, "collect_repeat_groups", lambda until, opts, since, workers: expansions.append((until, since)) or [])
+
+    list(get.iter_normalised_action_items(datetime(2024, 3, 20, 9, 15, 1)))
+    list(get.iter_normalised_action_items(datetime(2024, 3, 20, 17, 40, 12)))
+    list(get.iter_normalised_action_items(datetime(2024, 3, 20, 23, 0), since=datetime(2024, 3, 18, 8, 0)))
+    list(get.iter_normalised_action_items(datetime(2024, 3, 20, 23, 59), since=datetime(2024, 3, 18, 20, 0)))
+    assert expansions == [
+        (datetime(2024, 3, 20, 23, 59, 59, 999999), None),
+        (datetime(2024, 3, 20, 23, 59, 59, 999999), datetime(2024, 3, 18)),
+    ]
+
+def test_memo_is_clipped_to_the_exact_range(monkeypatch):
+    # Centred on today, as some repeaters depend on it
+    today = datetime.combine(date.today(), datetime.min.time())
+    items, _, _ = generate_vault(400, today.date(), seed=2)
+    monkeypatch.setattr(get, "fetch_action_items", lambda opts: copy.deepcopy(items))
+
+    ranges = [
+        (today + timedelta(days=5, hours=13, minutes=30), today - timedelta(days=3) + timedelta(hours=10, minutes=15)),
+        (today + timedelta(days=5, hours=2), today - timedelta(days=3) + timedelta(hours=22)),
+        (today + timedelta(days=12, hours=9), None),
+    ]
+    monkeypatch.setattr(get, "WARM", None)
+    expected = [get.get_normalised_action_items(until, since=since) for until, since in ranges]
+
+    # The first two ranges share their expansion in the daemon
+    monkeypatch.setattr(get, "WARM", {"items": {}, "normalised": {}})
+    for (until, since), occurrences in zip(ranges, expected):
+        assert get.get_normalised_action_items(until, since=since) == occurrences
+        assert list(get.iter_normalised_action_items(until, since=since)) == occurrences
+    assert len(get.WARM["normalised"]) == 2
+
+def encode(name, items):
+    """
+    Encodes the given items as a stream in the given binary format, as a raw stage would write them.
+    """
+
+    f = io.BytesIO()
+    f.write(codec.MAGIC_PREFIX + name.encode() + b"\n")
+    codec.CODECS[name]()["dump_stream"](items, f)
+    return f.getvalue()
+
+@pytest.mark.parametrize("name,package", [("msgpack", "msgpack"), ("cbor", "cbor2")])
+def test_binary_formats_pass_through(name, package):
+    pytest.importorskip(package)
+    items = [{"id": "a", "metadata": {"deadline": None, "tags": ["x"]}}, {"id": "b", "metadata": {}}]
+
+    def dispatch(argv):
+        assert argv == ["echo"]
+        codec.write_output(codec.read_input(True), stream=True)
+
+    # The input's format is detected from its header, and `--format` applies to just this command
+    code, stdout = send_request(["--format", name, "echo"], dispatch, stdin=encode(name, items))
+    assert code == 0
+    assert stdout == encode(name, items)
+    assert codec.OUTPUT_FORMAT == "json"
@@ -0,0 +1,40 @@
+# Tests paging sorted next actions: a page picked out with a heap should be exactly the same as that
+# slice of the fully sorted list, however many items tie.
+
+import subprocess
+from datetime import date
+import pytest
+from conftest import run_main
+from scheduling_scripts.bench.vault import generate_vault
+from scheduling_scripts.get import split_timestamps
+from scheduling_scripts.next_actions import filter_to_next_actions
+from scheduling_scripts.sort import sort_actions
+
+@pytest.fixture
+def next_actions():
+    items, _, _ = generate_vault(500, date(2024, 3, 20), seed=8)
+    next_actions = filter_to_next_actions(split_timestamps(items))
+    # Plenty of exact ties, which only their original order separates
+    for i, item in enumerate(next_actions[::3]):
+        item["title"] = f"Tied {i % 4}"
+        item["deadline"] = None
+        item["scheduled"] = None
+        item["priority"] = None
+    return next_actions
+
+def ids(actions):
+    return [item["id"] for item in actions]
+
+@pytest.mark.parametrize("limit,offset", [(1, 0), (10, 0), (10, 25), (40, 100), (0, 5), (1000, 0), (5, 1000)])
+def test_page_is_slice_of_full_sort(next_actions, limit, offset):
+    expected = ids(sort_actions(list(next_actions))[offset:offset + limit])
+    assert ids(sort_actions(list(next_actions), limit, offset)) == expected
+
+def test_offset_without_limit(next_actions):
+    assert ids(sort_actions(list(next_actions), offset=30)) == ids(sort_actions(list(next_actions))[30:])
+
+@pytest.mark.parametrize("flag,value", [("--limit", "-1"), ("--offset", "-3"), ("--limit", "ten")])
+def test_negative_pages_are_rejected(tmp_path, flag, value):
+    with pytest.raises(subprocess.CalledProcessError) as err:
+        run_main(tmp_path, "raw", "filter", "-u", "2024-03-20", flag, value, stdin=subprocess.DEVNULL)
+    assert "non-negative integer" in err.value.stderr
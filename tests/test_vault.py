@@ -0,0 +1,18 @@
+# Tests that synthetic vaults from `bench/vault.py` are the same for the same arguments, including
+# across processes (where string hashing, and so set ordering, differs).
+
+import json
+from datetime import date
+from conftest import run_main
+from scheduling_scripts.bench.vault import generate_vault
+
+def test_same_seed_same_vault():
+    today = date(2024, 3, 20)
+    assert generate_vault(500, today, seed=3) == generate_vault(500, today, seed=3)
+    assert generate_vault(500, today, seed=3) != generate_vault(500, today, seed=4)
+
+def test_same_vault_across_processes(tmp_path):
+    argv = ["bench", "vault", "-n", "300", "-d", "2024-03-20", "-s", "7"]
+    outputs = [run_main(tmp_path, *argv, env={"PYTHONHASHSEED": str(hash_seed)}).stdout for hash_seed in (1, 2)]
+    assert outputs[0] == outputs[1]
+    assert len(json.loads(outputs[0])) >= 300
@@ -0,0 +1,37 @@
+# Tests that missed deadlines are warned about once per command, however many filters check them.
+
+from datetime import date, datetime
+import pytest
+from scheduling_scripts import main, utils
+from scheduling_scripts.bench.vault import generate_vault
+from scheduling_scripts.get import split_timestamps
+from scheduling_scripts.next_actions import filter_to_next_actions
+from scheduling_scripts.upcoming import filter_to_upcoming
+
+TODAY = date(2024, 3, 20)
+
+@pytest.fixture
+def action_items():
+    utils.reset_warnings()
+    items, _, _ = generate_vault(300, TODAY, seed=1)
+    return split_timestamps(items)
+
+def run_filters(action_items):
+    next_actions = filter_to_next_actions(action_items)
+    filter_to_upcoming(next_actions, datetime(2024, 4, 1), "all")
+    filter_to_upcoming(next_actions, datetime(2024, 4, 1), "tasks")
+
+def warned_ids(stderr):
+    return [line.split()[3] for line in stderr.splitlines() if line.startswith("Warning: Scheduled item")]
+
+def test_warned_once_per_command(action_items, capsys, monkeypatch):
+    run_filters(action_items)
+    run_filters(action_items)
+    first = warned_ids(capsys.readouterr().err)
+    assert first
+    assert len(first) == len(set(first))
+
+    # Each command the daemon runs starts afresh
+    monkeypatch.setattr(main, "load_command", lambda command: lambda argv: run_filters(action_items))
+    main.dispatch(["raw", "filter"])
+    assert warned_ids(capsys.readouterr().err) == first
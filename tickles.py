@@ -1,32 +1,37 @@
 # Returns the "tickles" with timestamps up until a given date.
 
 from datetime import datetime
-from .utils import dump_json, load_json
+from .utils import dump_json, load_json, datetime_to_epoch, ts_epoch
+from .index import items_in_category
+from .instrument import traced
 
+@traced()
 def filter_to_tickles(action_items, until):
     """
-    Filters the given action items to tickles with timestamps up until the given date.
+    Filters the given action items to tickles with timestamps up until the given date. The items
+    are only iterated over once, so they can be streamed from `iter_normalised_action_items`, or
+    they can be an `ItemIndex`.
     """
 
+    until = datetime_to_epoch(until)
+
     filtered = []
-    for item in action_items:
-        if "tickles" in item["parent_tags"]:
-            # Tickles should have a single-date timestamp, anything else is invalid
-            ts = item["metadata"]["timestamp"]
-            if ts and ts["end"]:
-                raise ValueError(f"Item {item['id']} has a tickle with an end timestamp")
-            elif ts and ts["start"]["time"]:
-                raise ValueError(f"Item {item['id']} has a tickle with a time")
-            elif ts:
-                date = datetime.strptime(ts["start"]["date"], "%Y-%m-%d")
-                if date <= until:
-                    tickle_item = {
-                        "id": item["id"],
-                        "title": item["title"][-1],
-                        "body": (item["body"] or "").strip(),
-                        "date": ts["start"]["date"],
-                    }
-                    filtered.append(tickle_item)
+    for item in items_in_category(action_items, "tickles"):
+        # Tickles should have a single-date timestamp, anything else is invalid
+        ts = item["metadata"]["timestamp"]
+        if ts and ts["end"]:
+            raise ValueError(f"Item {item['id']} has a tickle with an end timestamp")
+        elif ts and ts["start"]["time"]:
+            raise ValueError(f"Item {item['id']} has a tickle with a time")
+        elif ts:
+            if ts_epoch(ts["start"]) <= until:
+                tickle_item = {
+                    "id": item["id"],
+                    "title": item["title"][-1],
+                    "body": (item["body"] or "").strip(),
+                    "date": ts["start"]["date"],
+                }
+                filtered.append(tickle_item)
 
     # Sort by date
     filtered.sort(key=lambda x: (x["date"], x["title"]))
@@ -37,9 +42,10 @@ def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Extract tickles from action items, up until a given date.", prog="tickles")
     parser.add_argument("date", type=str, help="The date to extract tickles up until.")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line (this buffers everything before writing, as the results are sorted).")
 
     args = parser.parse_args(args)
     until = datetime.strptime(args.date, "%Y-%m-%d")
 
-    action_items = load_json()
-    dump_json(filter_to_tickles(action_items, until))
+    action_items = load_json(args.ndjson)
+    dump_json(filter_to_tickles(action_items, until), args.ndjson)
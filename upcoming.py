@@ -2,10 +2,12 @@
 
 from datetime import datetime
 
-from sort import sort_actions
-from .utils import create_datetime, dump_json, load_json, should_surface_item
+from .sort import sort_actions
+from .utils import datetime_to_epoch, dump_json, load_json, should_surface_item, surfacing_map, ts_epoch, non_negative_int
+from .instrument import traced
 
-def filter_to_upcoming(items, until, ty):
+@traced()
+def filter_to_upcoming(items, until, ty, limit=None, offset=0):
     """
     Filters the given next actions down to those which are upcoming with respect to the given date.
     Specifically, this will surface items with a scheduled date before the given cutoff, as well as
@@ -15,9 +17,13 @@ def filter_to_upcoming(items, until, ty):
 
     This can work with both next actions and waiting-for items; technically anything with `scheduled`
     and/or `deadline` dates.
+
+    If a limit and/or offset is given, only that page of the sorted results will be returned (see
+    `sort_actions`).
     """
 
-    items_map = {item["id"]: item for item in items}
+    items_map = surfacing_map(items)
+    until = datetime_to_epoch(until)
 
     filtered = []
     for item in items:
@@ -26,7 +32,7 @@ def filter_to_upcoming(items, until, ty):
 
         if item["scheduled"]:
             # This is guaranteed not to have an end datetime from the next actions filter
-            scheduled = create_datetime(item["scheduled"]["date"], item["scheduled"]["time"])
+            scheduled = ts_epoch(item["scheduled"])
 
             # Check timestamps and cross-reference with the deadline
             if not should_surface_item(item, items_map):
@@ -46,7 +52,7 @@ def filter_to_upcoming(items, until, ty):
             filtered.append(item)
 
     # Sort by scheduled/deadline date (whichever the item has, scheduled first), and then deadline
-    return sort_actions(filtered)
+    return sort_actions(filtered, limit, offset)
 
 def main_cli(args):
     import argparse
@@ -55,11 +61,15 @@ def main_cli(args):
     ty_group = parser.add_mutually_exclusive_group()
     ty_group.add_argument("--problems", action="store_true", help="Only show problems.")
     ty_group.add_argument("--tasks", action="store_true", help="Only show tasks.")
+    parser.add_argument("--limit", type=non_negative_int, help="The most results to show.")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="The number of results to skip (e.g. to get the next page).")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line (this buffers everything before writing, as the results are sorted).")
 
     args = parser.parse_args(args)
     until = datetime.strptime(args.date, "%Y-%m-%d")
     until.replace(hour=23, minute=59, second=59)
     ty = "problems" if args.problems else "tasks" if args.tasks else "all"
 
-    items = load_json()
-    dump_json(filter_to_upcoming(items, until, ty))
+    # Surfacing depends on parents, and we sort, so this has to buffer everything
+    items = list(load_json(args.ndjson))
+    dump_json(filter_to_upcoming(items, until, ty, args.limit, args.offset), args.ndjson)
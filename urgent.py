@@ -2,22 +2,38 @@
 # are urgent.
 
 from datetime import datetime, timedelta
-from .utils import create_datetime, dump_json, load_json
+from itertools import islice
+from .utils import datetime_to_epoch, dump_json, load_json, ts_epoch, non_negative_int
+from .instrument import traced
 
-def filter_to_urgent(upcoming, current_date, cutoff_date):
+@traced()
+def filter_to_urgent(upcoming, current_date, cutoff_date, limit=None, offset=0):
     """
     Filters the given next actions (which are expected to have gone through the upcoming filter)
     to those with deadlines before the given cutoff date, provided they've passed their scheduled
     date with respect to the given current date.
+
+    If a limit and/or offset is given, only that page of the results will be returned. The input
+    is already ordered, so this stops as soon as the page is full.
     """
 
-    filtered = []
+    return list(islice(iter_urgent(upcoming, current_date, cutoff_date), offset, offset + limit if limit is not None else None))
+
+def iter_urgent(upcoming, current_date, cutoff_date):
+    """
+    Streaming version of `filter_to_urgent`, which yields each urgent item as soon as it's been
+    found. As the input is already ordered, nothing needs to be buffered.
+    """
+
+    current_date = datetime_to_epoch(current_date)
+    cutoff_date = datetime_to_epoch(cutoff_date)
+
     for item in upcoming:
         # Anything without a deadline will never be urgent
         if not item["deadline"]: continue
 
-        deadline = create_datetime(item["deadline"]["date"], item["deadline"]["time"])
-        scheduled = create_datetime(item["scheduled"]["date"], item["scheduled"]["time"]) if item["scheduled"] else None
+        deadline = ts_epoch(item["deadline"])
+        scheduled = ts_epoch(item["scheduled"]) if item["scheduled"] else None
 
         # Skip anything we haven't reached the scheduled date for yet (next actions filter
         # guarantees the deadline is after it)
@@ -28,21 +44,26 @@ def filter_to_urgent(upcoming, current_date, cutoff_date):
         if deadline > cutoff_date:
             continue
 
-        filtered.append(item)
-
-    # The upcoming filter did the ordering by deadline/scheduled for us
-    return filtered
+        # The upcoming filter did the ordering by deadline/scheduled for us
+        yield item
 
 def main_cli(args):
     import argparse
     parser = argparse.ArgumentParser(description="Filter by deadline dates to urgent items.", prog="urgent")
     parser.add_argument("-d", "--date", type=str, required=True, help="The current date to filter by.")
     parser.add_argument("-p", "--proximity", type=int, required=True, help="The number of days into the future to consider.")
+    parser.add_argument("--limit", type=non_negative_int, help="The most results to show.")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="The number of results to skip (e.g. to get the next page).")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line, streaming where possible.")
 
     args = parser.parse_args(args)
     current_date = datetime.strptime(args.date, "%Y-%m-%d")
     cutoff_date = current_date + timedelta(days=args.proximity)
     cutoff_date.replace(hour=23, minute=59, second=59)
 
-    upcoming = load_json()
-    dump_json(filter_to_urgent(upcoming, current_date, cutoff_date))
+    upcoming = load_json(args.ndjson)
+    if args.ndjson:
+        urgent = iter_urgent(upcoming, current_date, cutoff_date)
+        dump_json(islice(urgent, args.offset, args.offset + args.limit if args.limit is not None else None), ndjson=True)
+    else:
+        dump_json(filter_to_urgent(upcoming, current_date, cutoff_date, args.limit, args.offset))
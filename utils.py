@@ -1,9 +1,23 @@
-from datetime import datetime
-import json
+from datetime import date, datetime
+import os
 import sys
+from .codec import read_input, write_output
+from .instrument import count
 
 STARLING_API="http://localhost:3000/"
 DEFAULT_PRIORITY = 10
+SECONDS_PER_DAY = 86400
+
+# Items we've already warned won't meet their deadlines in the current command (see
+# `reset_warnings`)
+_warned_deadlines = set()
+
+def starling_api():
+    """
+    Gets the base URL of the Starling server, which can be overridden with `$STARLING_API`.
+    """
+
+    return os.environ.get("STARLING_API") or STARLING_API
 
 def parse_range_str(range_str):
     """
@@ -20,30 +34,41 @@ def parse_range_str(range_str):
     # It's possible to provide a range like `:X` to get only data from before that date
     range_start = datetime.strptime(range_start, "%Y-%m-%d") if range_start else None
     range_end = datetime.strptime(range_end, "%Y-%m-%d")
+    count("strptime", 2 if range_start else 1)
     # Make the range end be at the *very* end of the day
     range_end = range_end.replace(hour=23, minute=59, second=59)
 
     return range_start, range_end
 
-def load_json():
+def load_json(ndjson=False):
     """
-    Loads JSON data from stdin to allow us to filter another script's output.
+    Loads JSON data from stdin to allow us to filter another script's output. This will also
+    detect and read any of the binary formats in `codec.py`.
+
+    If `ndjson` is set, this will instead lazily yield one object per line of stdin (or per object
+    in a binary stream), so a script can start on the first item before the previous one has
+    finished writing the rest.
     """
 
-    return json.loads(sys.stdin.read())
+    return read_input(ndjson)
 
-def dump_json(data):
+def dump_json(data, ndjson=False):
     """
-    Dumps the given JSON data to stdout so it caan be ingested by another script.
+    Dumps the given JSON data to stdout so it caan be ingested by another script. This is written
+    in whichever format is set in `codec.py` (JSON by default).
+
+    If `ndjson` is set, the data can be any iterable, and each element will be written on its own
+    line (or as its own object in a binary stream) as soon as it's produced.
     """
 
-    json.dump(data, sys.stdout, ensure_ascii=False)
+    write_output(data, ndjson)
 
 def create_datetime(date_str, time_str=None):
     """
     Creates Python datetimes from Orgish time and date strings.
     """
 
+    count("strptime")
     if time_str:
         return datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M:%S")
     return datetime.strptime(date_str, "%Y-%m-%d")
@@ -56,22 +81,57 @@ def timestamp_to_datetime(timestamp):
     ts_end = create_datetime(timestamp["end"]["date"], timestamp["end"]["time"]) if timestamp["end"] else None
     return ts_start, ts_end
 
-def body_for_proj(proj_item, action_items):
+def parse_epoch(date_str, time_str=None):
     """
-    Forms the body for a project by finding all its tasks and formatting them together for
-    at-a-glance reference in a calendar view.
+    Converts Orgish date and time strings into a compact integer form: the number of seconds since
+    the start of 0001-01-01 (naive, like all our other datetimes). These compare exactly like the
+    equivalent datetimes, but are far cheaper to produce and compare than `strptime` results.
+    """
+
+    epoch = date.fromisoformat(date_str).toordinal() * SECONDS_PER_DAY
+    if time_str:
+        epoch += int(time_str[0:2]) * 3600 + int(time_str[3:5]) * 60 + (int(time_str[6:8]) if len(time_str) > 5 else 0)
+    return epoch
+
+def datetime_to_epoch(dt):
+    """
+    Converts the given Python datetime into the compact integer form from `parse_epoch`.
+    """
+
+    return dt.toordinal() * SECONDS_PER_DAY + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+def ts_epoch(ts_part):
+    """
+    Gets the compact integer form of one side of a timestamp (or a planning timestamp), using the
+    one attached during normalisation if it's there. This lets us accept older JSON without it.
+    """
+
+    epoch = ts_part.get("epoch")
+    return epoch if epoch is not None else parse_epoch(ts_part["date"], ts_part["time"])
+
+def timestamp_to_epochs(timestamp):
+    """
+    Converts the given Orgish timestamp into compact integer start and end times (see
+    `parse_epoch`), where the end will be `None` if there isn't one.
+    """
+
+    ts_start = ts_epoch(timestamp["start"])
+    ts_end = ts_epoch(timestamp["end"]) if timestamp["end"] else None
+    return ts_start, ts_end
+
+def format_proj_body(proj_item, tasks):
+    """
+    Formats the body for a project from its own body and those of the given tasks, for at-a-glance
+    reference in a calendar view.
     """
 
     body = proj_item["body"] + "\n\n" if proj_item["body"] else ""
     task_parts = []
-    for task_id, _ in proj_item["children"]:
-        task = action_items.get(task_id)
-
-        if task:
-            task_part = f"# TODO {task['title'][-1]}"
-            if task["body"] and task["body"] != "":
-                task_part += f"\n{task['body']}"
-            task_parts.append(task_part)
+    for task in tasks:
+        task_part = f"# TODO {task['title'][-1]}"
+        if task["body"] and task["body"] != "":
+            task_part += f"\n{task['body']}"
+        task_parts.append(task_part)
     body += "\n\n".join(task_parts)
 
     return body
@@ -111,6 +171,21 @@ def validate_focus(focus_str, id):
     except ValueError:
         raise ValueError(f"Invalid focus value on node '{id}': {focus_str}")
 
+def non_negative_int(value):
+    """
+    Parses a whole number given on the command line that can't be negative (e.g. `--limit`), for use
+    as an `argparse` type.
+    """
+
+    import argparse
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"expected a non-negative integer, found '{value}'")
+    return number
+
 def validate_time(time_str, id):
     """
     Validates the time string on the given node and returns a numeric version.
@@ -175,6 +250,47 @@ def validate_planning_ts(ts, item_id):
 
     return ts["start"]
 
+def surfacing_verdict(ts, deadline):
+    """
+    Works out whether an item with the given timestamp (its own or its project parent's, see
+    `find_task_timestamp`) and deadline (a planning timestamp) should be surfaced in the upcoming
+    list, and whether that timestamp meets the deadline.
+
+    This returns `(surface, meets_deadline)`, where `meets_deadline` is `None` unless there's both
+    a timestamp and a deadline.
+    """
+
+    if ts and deadline:
+        # We have a timestamp and a deadline it needs to come before. Either way, the user has
+        # scheduled this, so it doesn't need to be surfaced (but they need to know if it's bad).
+        deadline = ts_epoch(deadline)
+        ts_start, ts_end = timestamp_to_epochs(ts)
+        # Deliberate `<` here; if the user starts *at* the deadline, that is pretty dumb
+        return False, ts_start < deadline and (ts_end is None or ts_end <= deadline)
+    # If there's no deadline date to adhere to, but we have slated this to work on at some stage,
+    # it doesn't need to be surfaced
+    return not ts, None
+
+def warn_missed_deadline(id):
+    """
+    Warns the user that the given item is scheduled such that it won't meet its deadline. This is
+    only written once per item in each command, however many filters check it.
+    """
+
+    if id in _warned_deadlines:
+        return
+    _warned_deadlines.add(id)
+    # stderr because stdout is for the JSON
+    sys.stderr.write(f"Warning: Scheduled item {id} has a deadline you won't meet under current schedule!\n")
+
+def reset_warnings():
+    """
+    Forgets which warnings have been written, so the next command (e.g. in the daemon) gets all of
+    its own.
+    """
+
+    _warned_deadlines.clear()
+
 def should_surface_item(item, items):
     """
     Checks if the given item, or its project parent (if it has one) has a timestamp that would
@@ -182,51 +298,41 @@ def should_surface_item(item, items):
     sure that timestamp makes sense with the item's deadline, if it has one.
 
     This returns `True` if the item should be surfaced, and `False` if it should not, and it
-    will write a warning to stderr if the timestamp would not meet the deadline.
+    will write a warning to stderr if the timestamp would not meet the deadline. Next actions
+    come with this worked out already (as `surface`), in which case `items` isn't used.
     """
 
+    surface = item.get("surface")
+    if surface is not None:
+        return surface
+
     ts = find_task_timestamp(item, items)
-    if ts and item["deadline"]:
-        # We have a timestamp and a deadline it needs to come before
-        deadline = create_datetime(item["deadline"]["date"], item["deadline"]["time"])
-        ts_start, ts_end = timestamp_to_datetime(ts)
-        # Deliberate `<` here; if the user starts *at* the deadline, that is pretty dumb
-        if ts_start < deadline and (ts_end is None or ts_end <= deadline):
-            # It does, the schedule is valid, we don't need to surface it
-            return False
-        else:
-            # Bad schedule, warn the user! (stderr because stdout is for the JSON)
-            sys.stderr.write(f"Warning: Scheduled item {item['id']} has a deadline you won't meet under current schedule!\n")
-            return False
-    elif ts:
-        # If there's no deadline date to adhere to, but we have slated this to work on at
-        # some stage, it doesn't need to be surfaced
-        return False
-    else:
-        return True
+    surface, meets_deadline = surfacing_verdict(ts, item["deadline"])
+    if meets_deadline is False:
+        warn_missed_deadline(item["id"])
+    return surface
 
-def get_priority(item, items):
+def surfacing_map(items):
     """
-    Gets the priority of the given item, inheriting any higher priorities from up the chain.
+    Gets a map of IDs to the given items for `should_surface_item` to look up project parents in.
+    This is only needed for next actions without a precomputed `surface` (i.e. from older JSON),
+    so it'll be empty if there aren't any.
     """
 
-    # Higher numbers are less important, so infinity is the default least
-    active_item = item
-    highest_priority = DEFAULT_PRIORITY
-    while True:
-        priority = active_item["metadata"]["priority"]
-        try:
-            priority = int(priority) if priority is not None else DEFAULT_PRIORITY
-        except ValueError:
-            raise ValueError(f"Invalid priority value on node '{item['id']}': {priority}")
-        if priority < highest_priority:
-            highest_priority = priority
+    if all("surface" in item or "timestamp" not in item for item in items):
+        return {}
+    return {item["id"]: item for item in items}
 
-        active_item = items.get(active_item["parent_id"])
-        if not active_item:
-            break
+def parse_priority(priority, id):
+    """
+    Parses the given value of an item's priority into a number, where items without one get the
+    least important priority.
+    """
 
-    return highest_priority
+    try:
+        return int(priority) if priority is not None else DEFAULT_PRIORITY
+    except ValueError:
+        raise ValueError(f"Invalid priority value on node '{id}': {priority}")
 
 def format_priority(priority_num):
     """
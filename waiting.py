@@ -1,41 +1,59 @@
 # Extract waiting-for items from the given list of action items. These can then be filtered to a
 # window of concern with the same upcoming filter used for next actions.
 
-from .utils import associated_people, create_datetime, dump_json, load_json, validate_planning_ts
+from .utils import associated_people, ts_epoch, dump_json, load_json, validate_planning_ts
+from .index import items_in_category
+from .instrument import traced
 
+@traced()
 def filter_to_waiting(action_items):
     """
-    Filters the given action items down to those which qualify as "waiting-for" items.
+    Filters the given action items down to those which qualify as "waiting-for" items. The action
+    items can be any iterable (e.g. a stream of them), as they're only read once, or an
+    `ItemIndex`.
     """
 
-    filtered = []
-    for item in action_items:
-        if "waiting" in item["parent_tags"]:
-            scheduled = validate_planning_ts(item["metadata"]["scheduled"], item["id"])
-            deadline = validate_planning_ts(item["metadata"]["deadline"], item["id"])
-
-            # Sanity check that the scheduled date is before the deadline date
-            scheduled_dt = create_datetime(scheduled["date"], scheduled["time"]) if scheduled else None
-            deadline_dt = create_datetime(deadline["date"], deadline["time"]) if deadline else None
-            if scheduled_dt and deadline_dt and scheduled_dt > deadline_dt:
-                raise ValueError(f"Item {item['id']} has a scheduled date after its deadline date")
-
-            if not "SENT" in item["metadata"]["properties"]:
-                raise ValueError(f"Item {item['id']} has no SENT property")
-
-            wait_item = {
-                "id": item["id"],
-                "title": item["title"][-1],
-                "body": item["body"],
-                "scheduled": scheduled,
-                "deadline": deadline,
-                "sent": item["metadata"]["properties"]["SENT"],
-                "people": associated_people(item),
-            }
-            filtered.append(wait_item)
-
-    return filtered
-
-def main_cli(_):
-    action_items = load_json()
-    dump_json(filter_to_waiting(action_items))
+    return list(iter_waiting(action_items))
+
+def iter_waiting(action_items):
+    """
+    Streaming version of `filter_to_waiting`, which yields each waiting-for item as soon as it's
+    been found.
+    """
+
+    for item in items_in_category(action_items, "waiting"):
+        scheduled = validate_planning_ts(item["metadata"]["scheduled"], item["id"])
+        deadline = validate_planning_ts(item["metadata"]["deadline"], item["id"])
+
+        # Sanity check that the scheduled date is before the deadline date
+        scheduled_dt = ts_epoch(scheduled) if scheduled else None
+        deadline_dt = ts_epoch(deadline) if deadline else None
+        if scheduled_dt and deadline_dt and scheduled_dt > deadline_dt:
+            raise ValueError(f"Item {item['id']} has a scheduled date after its deadline date")
+
+        if not "SENT" in item["metadata"]["properties"]:
+            raise ValueError(f"Item {item['id']} has no SENT property")
+
+        wait_item = {
+            "id": item["id"],
+            "title": item["title"][-1],
+            "body": item["body"],
+            "scheduled": scheduled,
+            "deadline": deadline,
+            "sent": item["metadata"]["properties"]["SENT"],
+            "people": associated_people(item),
+        }
+        yield wait_item
+
+def main_cli(args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Filter action items to waiting-for items.", prog="waiting")
+    parser.add_argument("--ndjson", action="store_true", help="Read and write one JSON object per line, streaming where possible.")
+
+    args = parser.parse_args(args)
+
+    action_items = load_json(args.ndjson)
+    if args.ndjson:
+        dump_json(iter_waiting(action_items), ndjson=True)
+    else:
+        dump_json(filter_to_waiting(action_items))